@@ -1,8 +1,16 @@
 import os
+import time
+import asyncio
+import hashlib
 import logging
+import threading
 import firebase_admin
+from cachetools import TLRUCache
 from firebase_admin import credentials, auth
+from firebase_admin import _token_gen
+from google.oauth2 import id_token
 from fastapi import HTTPException, Header, Depends
+from backend.air_quality_service.metrics import TOKEN_VERIFICATION_DURATION, register_cache
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +23,70 @@ FIREBASE_CREDENTIALS_PATH = (
 
 USING_EMULATOR = "FIREBASE_AUTH_EMULATOR_HOST" in os.environ
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
-    firebase_admin.initialize_app(cred)
+# Cache zweryfikowanych tokenów: rozmiar i margines przed `exp` (sekundy)
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE") or 1024)
+TOKEN_CACHE_SKEW = int(os.environ.get("TOKEN_CACHE_SKEW") or 30)
+# Co ile sekund odświeżać certyfikaty Google w tle
+CERT_REFRESH_INTERVAL = int(os.environ.get("CERT_REFRESH_INTERVAL") or 300)
+
+_firebase_lock = threading.Lock()
+
+def get_firebase_app():
+    """Initialize firebase_admin on first use, so importing this module needs no credentials"""
+    if not firebase_admin._apps:
+        with _firebase_lock:
+            if not firebase_admin._apps:
+                cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
+                firebase_admin.initialize_app(cred)
+                logger.info("Firebase Admin initialized")
+    return firebase_admin.get_app()
+
+def _token_expires_at(_key, claims, _now):
+    return claims["exp"] - TOKEN_CACHE_SKEW
+
+# Klucz to hash tokenu - surowe tokeny nie są trzymane w pamięci cache'u
+_token_cache = TLRUCache(maxsize=TOKEN_CACHE_SIZE, ttu=_token_expires_at, timer=time.time)
+_token_cache_lock = threading.Lock()
+_token_cache_stats = {"hits": 0, "misses": 0}
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _verify_token_cached(token: str) -> dict:
+    """Return decoded claims, verifying the signature only on a cache miss"""
+    started = time.perf_counter()
+    key = _token_key(token)
+    with _token_cache_lock:
+        decoded_token = _token_cache.get(key)
+        _token_cache_stats["hits" if decoded_token is not None else "misses"] += 1
+    if decoded_token is not None:
+        TOKEN_VERIFICATION_DURATION.observe(time.perf_counter() - started, cache="hit")
+        return decoded_token
+
+    try:
+        decoded_token = auth.verify_id_token(token, app=get_firebase_app(), clock_skew_seconds=5)
+    finally:
+        TOKEN_VERIFICATION_DURATION.observe(time.perf_counter() - started, cache="miss")
+    with _token_cache_lock:
+        _token_cache[key] = decoded_token
+    return decoded_token
+
+def cached_token_claims(token: str):
+    """Return claims of an already verified token without verifying it (None if unknown)"""
+    with _token_cache_lock:
+        return _token_cache.get(_token_key(token))
+
+def token_cache_stats() -> dict:
+    with _token_cache_lock:
+        lookups = _token_cache_stats["hits"] + _token_cache_stats["misses"]
+        return {
+            **_token_cache_stats,
+            "hit_rate": _token_cache_stats["hits"] / lookups if lookups else 0.0,
+            "size": len(_token_cache),
+            "maxsize": _token_cache.maxsize
+        }
+
+register_cache("token", token_cache_stats)
 
 def verify_firebase_token(authorization: str = Header(None)):
     """Verify Firebase ID token and return decoded user info"""
@@ -27,8 +96,8 @@ def verify_firebase_token(authorization: str = Header(None)):
 
     token = authorization.split(" ")[1]
     try:
-        decoded_token = auth.verify_id_token(token, clock_skew_seconds=5)
-        logger.info(f"Decoded Token: {decoded_token}")
+        decoded_token = _verify_token_cached(token)
+        logger.debug("Verified token for uid %s", decoded_token.get('uid'))
 
         return {
             "uid": decoded_token.get("uid"),
@@ -37,10 +106,39 @@ def verify_firebase_token(authorization: str = Header(None)):
             "token": token
         }
     except Exception as e:
-        logger.error(f"Token Verification Error: {e}")
+        logger.error("Token Verification Error: %s", e)
         raise HTTPException(status_code=401, detail=f"Invalid Firebase token: {e}")
 
 def admin_only(user=Depends(verify_firebase_token)):
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     return user
+
+def prefetch_certificates():
+    """Fetch Google's ID token signing certificates into firebase_admin's HTTP cache"""
+    request = auth._get_client(get_firebase_app())._token_verifier.request
+    id_token._fetch_certs(request, _token_gen.ID_TOKEN_CERT_URI)
+
+_cert_refresh_task = None
+
+async def _refresh_certificates():
+    while True:
+        try:
+            await asyncio.to_thread(prefetch_certificates)
+            logger.debug("Google signing certificates refreshed")
+        except Exception as e:
+            logger.warning("Failed to prefetch Google signing certificates: %s", e)
+        await asyncio.sleep(CERT_REFRESH_INTERVAL)
+
+def start_certificate_refresh():
+    """Keep signing certificates warm so token verification never waits on a fetch"""
+    global _cert_refresh_task
+    if USING_EMULATOR or _cert_refresh_task is not None:
+        return
+    _cert_refresh_task = asyncio.create_task(_refresh_certificates())
+
+async def stop_certificate_refresh():
+    global _cert_refresh_task
+    if _cert_refresh_task is not None:
+        _cert_refresh_task.cancel()
+        _cert_refresh_task = None
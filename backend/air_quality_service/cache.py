@@ -0,0 +1,72 @@
+import os
+import time
+import logging
+from cachetools import TTLCache
+from backend.air_quality_service.metrics import register_cache
+
+logger = logging.getLogger(__name__)
+
+# Rozmiar i czas życia cache'u odczytów AQI (sekundy)
+AIR_QUALITY_CACHE_SIZE = int(os.environ.get("AIR_QUALITY_CACHE_SIZE") or 256)
+AIR_QUALITY_CACHE_TTL = float(os.environ.get("AIR_QUALITY_CACHE_TTL") or 600)
+
+def normalize_location(location: str) -> str:
+    """Normalize a city name so 'warsaw ' and 'Warsaw' share a geocode entry"""
+    return " ".join(location.split()).casefold()
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache that counts LRU evictions (expired entries are not counted)"""
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        super().__init__(maxsize, ttl, timer=timer)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+class AirQualityCache:
+    """Bounded TTL + LRU cache of AQI history keyed by location.
+
+    Keys are the exact city document ids: 'Gdynia' and 'gdynia' are separate
+    documents, so they must not share an entry.
+    """
+
+    def __init__(self, maxsize: int = AIR_QUALITY_CACHE_SIZE, ttl: float = AIR_QUALITY_CACHE_TTL, timer=time.monotonic):
+        self._data = _CountingTTLCache(maxsize, ttl, timer=timer)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, location: str):
+        """Return cached history for location or None on a miss"""
+        history = self._data.get(location)
+        if history is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return history
+
+    def set(self, location: str, history: list):
+        self._data[location] = history
+
+    def invalidate(self, location: str):
+        self._data.pop(location, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self._data.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": self._data.currsize,
+            "maxsize": self._data.maxsize,
+            "ttl": self._data.ttl
+        }
+
+air_quality_cache = AirQualityCache()
+register_cache("air_quality", air_quality_cache.stats)
@@ -1,6 +1,8 @@
 import os
+import time
 import logging
-from google.cloud import firestore
+import threading
+from backend.air_quality_service.metrics import FIRESTORE_REQUESTS, FIRESTORE_REQUEST_DURATION
 
 logger = logging.getLogger(__name__)
 
@@ -12,25 +14,372 @@ FIRESTORE_CREDENTIALS_PATH = (
 )
 
 # ✅ Tworzymy klienta Firestore bez zmieniania globalnego środowiska
-db = firestore.Client.from_service_account_json(FIRESTORE_CREDENTIALS_PATH)
+# AsyncClient - zapytania nie blokują pętli zdarzeń uvicorna;
+# tworzony przy pierwszym użyciu, żeby import nie wymagał kluczy
+db = None
+_db_lock = threading.Lock()
+
+# Liczba ostatnich odczytów trzymanych w dokumencie miasta (ring buffer)
+HISTORY_SIZE = int(os.environ.get("HISTORY_SIZE") or 10)
+# Liczba odczytów zwracanych przez API
+READ_LIMIT = int(os.environ.get("READ_LIMIT") or 5)
+# Dodatkowy zapis każdego odczytu do podkolekcji history (archiwum)
+ARCHIVE_HISTORY = os.environ.get("ARCHIVE_HISTORY", "false").lower() == "true"
+# Maksymalna liczba zapisów w jednym WriteBatch (limit API Firestore)
+BATCH_LIMIT = 500
+# Indeks odwrotny subskrypcji: tracked_city_index/{city} z liczbą obserwujących
+TRACKED_INDEX_COLLECTION = "tracked_city_index"
 
 def get_firestore_client():
-    """Return Firestore client instance (for dependency injection in tests)"""
+    """Return async Firestore client instance (for dependency injection in tests).
+
+    The client (and the google.cloud.firestore import) is created on first
+    use; startup warm-up does it off the event loop.
+    """
+    global db
+    if db is None:
+        with _db_lock:
+            if db is None:
+                from google.cloud import firestore
+
+                db = instrument_firestore(firestore.AsyncClient.from_service_account_json(FIRESTORE_CREDENTIALS_PATH))
+                logger.info("Firestore client created")
     return db
 
-def get_air_quality_data(location: str):
-    """Retrieve air quality data from Firestore"""
+# RPCs answered with a stream are timed until the stream has been read
+_STREAMING_RPCS = {"batch_get_documents", "run_query", "run_aggregation_query", "list_documents", "list_collection_ids"}
+_UNARY_RPCS = {"commit", "begin_transaction", "rollback"}
+
+def _record_rpc(method: str, outcome: str, started: float):
+    FIRESTORE_REQUESTS.inc(method=method, outcome=outcome)
+    FIRESTORE_REQUEST_DURATION.observe(time.perf_counter() - started, method=method)
+
+async def _timed_stream(method: str, stream, started: float):
+    outcome = "ok"
     try:
-        logger.info(f"Fetching air quality data for {location}")
-        docs = db.collection("air_quality").document(location).collection("history").stream()
-        return [doc.to_dict() for doc in docs]
-    except Exception as e:
-        logger.error(f"Error fetching data: {e}")
+        async for item in stream:
+            yield item
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        _record_rpc(method, outcome, started)
+
+def _timed_rpc(method: str, rpc):
+    async def call(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await rpc(*args, **kwargs)
+        except Exception:
+            _record_rpc(method, "error", started)
+            raise
+        if method in _STREAMING_RPCS:
+            return _timed_stream(method, response, started)
+        _record_rpc(method, "ok", started)
+        return response
+    return call
+
+def instrument_firestore(client):
+    """Count and time every RPC the client sends (gets, queries, commits, transactions).
+
+    All document and query calls of the async client go through its GAPIC
+    API object, created on the first call; its RPC methods are wrapped there.
+    """
+    make_api = client._firestore_api_helper
+
+    def instrumented_api(*args, **kwargs):
+        api = make_api(*args, **kwargs)
+        if not getattr(api, "_metrics_instrumented", False):
+            for method in _STREAMING_RPCS | _UNARY_RPCS:
+                setattr(api, method, _timed_rpc(method, getattr(api, method)))
+            api._metrics_instrumented = True
+        return api
+
+    client._firestore_api_helper = instrumented_api
+    return client
+
+def city_document(db, location: str):
+    """Reference to the air_quality/{location} document"""
+    return db.collection("air_quality").document(location)
+
+def _forecast(forecaster, location: str, readings: list):
+    """forecaster(readings), or None when it fails; the readings are written either way"""
+    try:
+        return forecaster(readings)
+    except Exception:
+        logger.exception("Forecast for %s failed, storing the readings without one", location)
+        return None
+
+def _reading_sort_key(reading: dict):
+    return reading.get("last_update") or ""
+
+def _merge_readings(current: list, new_readings: list) -> list:
+    """Newest-first ring buffer of at most HISTORY_SIZE distinct readings"""
+    merged = []
+    for reading in sorted(current + new_readings, key=_reading_sort_key, reverse=True):
+        if reading not in merged:
+            merged.append(reading)
+        if len(merged) == HISTORY_SIZE:
+            break
+    return merged
+
+async def get_readings(db, location: str, limit: int = READ_LIMIT) -> list:
+    """Return the latest readings for a location with a single document read"""
+    doc = await city_document(db, location).get()
+    if not doc.exists:
+        return []
+    return (doc.to_dict().get("readings") or [])[:limit]
+
+async def get_forecast(db, location: str) -> dict:
+    """Return the forecast stored on a city document, None if there is none"""
+    doc = await city_document(db, location).get()
+    if not doc.exists:
         return None
+    return doc.to_dict().get("forecast")
+
+async def get_readings_many(db, locations, limit: int = READ_LIMIT) -> dict:
+    """Return {location: latest readings} for many locations in one round-trip"""
+    locations = list(dict.fromkeys(locations))
+    readings = {location: [] for location in locations}
+    if not locations:
+        return readings
+
+    refs = [city_document(db, location) for location in locations]
+    async for doc in db.get_all(refs):
+        if doc.exists:
+            readings[doc.id] = (doc.to_dict().get("readings") or [])[:limit]
+    return readings
+
+async def append_readings(db, location: str, new_readings: list, forecaster=None, archive: bool = True) -> list:
+    """Add readings to a city's ring buffer in one transaction and return the buffer.
+
+    The buffer keeps the newest HISTORY_SIZE readings; with ARCHIVE_HISTORY
+    every new reading is also appended to the history subcollection, unless
+    archive=False (readings that already come from the archive).
+    forecaster(readings) is called on the updated buffer and its result is
+    stored in the document's forecast field in the same write.
+    """
+    from google.cloud import firestore
+
+    city_ref = city_document(db, location)
+
+    @firestore.async_transactional
+    async def append(transaction):
+        snapshot = await city_ref.get(transaction=transaction)
+        current = (snapshot.to_dict().get("readings") or []) if snapshot.exists else []
+        readings = _merge_readings(current, new_readings)
+
+        data = {
+            "name": location,
+            "last_update": readings[0].get("last_update"),
+            "readings": readings
+        }
+        if forecaster is not None:
+            data["forecast"] = _forecast(forecaster, location, readings)
+        transaction.set(city_ref, data, merge=True)
+        if archive and ARCHIVE_HISTORY:
+            for reading in new_readings:
+                transaction.set(city_ref.collection("history").document(), reading)
+        return readings
+
+    return await append(db.transaction())
+
+async def write_in_batches(db, writes, merge: bool = False) -> int:
+    """Commit (reference, data) pairs with WriteBatch, BATCH_LIMIT writes per commit.
+
+    data=None deletes the document, merge=True merges data into existing
+    documents. Each chunk is applied atomically; returns the number of commits.
+    """
+    commits = 0
+    batch = db.batch()
+    pending = 0
+    for reference, data in writes:
+        if data is None:
+            batch.delete(reference)
+        else:
+            batch.set(reference, data, merge=merge)
+        pending += 1
+        if pending == BATCH_LIMIT:
+            await batch.commit()
+            commits += 1
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        await batch.commit()
+        commits += 1
+    return commits
+
+async def ingest_readings(db, readings_by_city: dict, forecaster=None) -> tuple:
+    """Merge many readings per city into the ring buffers with batched commits.
+
+    Current city documents are read in one get_all per BATCH_LIMIT cities,
+    retention (and forecaster) runs once per city and all city documents
+    (plus archive entries with ARCHIVE_HISTORY) are written with
+    write_in_batches. Meant for admin backfills: unlike append_readings it
+    is not transactional, a reading written concurrently may be overwritten.
+    Returns the number of commits and each city's new ring buffer.
+    """
+    commits = 0
+    buffers = {}
+    cities = list(readings_by_city)
+    for start in range(0, len(cities), BATCH_LIMIT):
+        chunk = cities[start:start + BATCH_LIMIT]
+        current = {}
+        async for doc in db.get_all([city_document(db, city) for city in chunk]):
+            if doc.exists:
+                current[doc.id] = doc.to_dict().get("readings") or []
+
+        writes = []
+        for city in chunk:
+            city_ref = city_document(db, city)
+            readings = _merge_readings(current.get(city, []), readings_by_city[city])
+            buffers[city] = readings
+            data = {
+                "name": city,
+                "last_update": readings[0].get("last_update"),
+                "readings": readings
+            }
+            if forecaster is not None:
+                data["forecast"] = _forecast(forecaster, city, readings)
+            writes.append((city_ref, data))
+            if ARCHIVE_HISTORY:
+                writes.extend((city_ref.collection("history").document(), reading) for reading in readings_by_city[city])
+
+        commits += await write_in_batches(db, writes, merge=True)
+    return commits, buffers
+
+async def delete_city(db, location: str) -> int:
+    """Delete a city document and its history archive in batched commits.
+
+    The city document goes in the first batch, so readers stop seeing the
+    city even if a later archive chunk fails. Returns deleted archive docs.
+    """
+    city_ref = city_document(db, location)
+    archive = [ref async for ref in city_ref.collection("history").list_documents()]
+    await write_in_batches(db, [(city_ref, None)] + [(ref, None) for ref in archive])
+    return len(archive)
+
+def tracked_city_document(db, uid: str, city: str):
+    """Reference to the user_preferences/{uid}/tracked_cities/{city} subscription"""
+    return db.collection("user_preferences").document(uid).collection("tracked_cities").document(city)
+
+def tracked_index_document(db, city: str):
+    """Reference to the subscriber count of a city"""
+    return db.collection(TRACKED_INDEX_COLLECTION).document(city)
+
+async def add_tracked_city(db, uid: str, city: str, data: dict) -> bool:
+    """Subscribe a user to a city and bump its subscriber count in one atomic commit.
+
+    The subscription is created with an exists=False precondition, so concurrent
+    requests cannot track a city twice or overwrite each other's cities.
+    Returns False when the user already tracks the city.
+    """
+    from google.cloud import firestore
+    from google.api_core.exceptions import AlreadyExists
+
+    batch = db.batch()
+    batch.create(tracked_city_document(db, uid, city), data)
+    batch.set(tracked_index_document(db, city), {"city": city, "subscribers": firestore.Increment(1)}, merge=True)
+    try:
+        await batch.commit()
+    except AlreadyExists:
+        return False
+    return True
+
+async def remove_tracked_city(db, uid: str, city: str) -> bool:
+    """Delete a subscription and decrement the city's subscriber count in one atomic commit.
+
+    Returns False when the user did not track the city (nothing is written).
+    """
+    from google.cloud import firestore
+    from google.api_core.exceptions import NotFound
+
+    batch = db.batch()
+    batch.delete(tracked_city_document(db, uid, city), option=db.write_option(exists=True))
+    batch.set(tracked_index_document(db, city), {"city": city, "subscribers": firestore.Increment(-1)}, merge=True)
+    try:
+        await batch.commit()
+    except NotFound:
+        return False
+    return True
+
+async def list_tracked_cities(db, uid: str) -> list:
+    """Return a user's subscriptions in the order they were added"""
+    query = db.collection("user_preferences").document(uid).collection("tracked_cities").order_by("added_at")
+    return [doc.to_dict() async for doc in query.stream()]
+
+async def tracked_city_counts(db) -> dict:
+    """Return {city: subscribers} for every city tracked by at least one user"""
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = db.collection(TRACKED_INDEX_COLLECTION).where(filter=FieldFilter("subscribers", ">", 0))
+    return {doc.id: doc.to_dict()["subscribers"] async for doc in query.stream()}
+
+async def rebuild_tracked_index(db) -> int:
+    """Recount every city's subscribers from the subscription documents.
+
+    Repairs tracked_city_index after a migration or manual edits; counts of
+    cities nobody tracks any more are set to 0. Run it while tracking is quiet,
+    a subscription written during the recount may be missed.
+    Returns the number of tracked cities.
+    """
+    counts = {}
+    async for doc in db.collection_group("tracked_cities").stream():
+        counts[doc.id] = counts.get(doc.id, 0) + 1
+
+    writes = [(tracked_index_document(db, city), {"city": city, "subscribers": count}) for city, count in counts.items()]
+    async for doc in db.collection(TRACKED_INDEX_COLLECTION).stream():
+        if doc.id not in counts:
+            writes.append((doc.reference, {"city": doc.id, "subscribers": 0}))
+    await write_in_batches(db, writes)
+    return len(counts)
+
+async def migrate_tracked_cities(db) -> int:
+    """One-shot migration of tracked_cities arrays into subscription documents.
+
+    Each user's array is moved to user_preferences/{uid}/tracked_cities and
+    removed from the preferences document in the same commit, then the
+    subscriber counts are rebuilt. Returns the number of migrated users.
+    """
+    from google.cloud import firestore
+
+    migrated = 0
+    async for user in db.collection("user_preferences").stream():
+        tracked_cities = user.to_dict().get("tracked_cities")
+        if tracked_cities is None:
+            continue
+
+        writes = [
+            (user.reference.collection("tracked_cities").document(tracked_city["city"]), tracked_city)
+            for tracked_city in tracked_cities
+        ]
+        writes.append((user.reference, {"tracked_cities": firestore.DELETE_FIELD}))
+        await write_in_batches(db, writes, merge=True)
+        migrated += 1
+        logger.info("Migrated %s tracked cities for user %s", len(tracked_cities), user.id)
+
+    await rebuild_tracked_index(db)
+    return migrated
+
+async def migrate_history(db) -> int:
+    """One-shot migration of history subcollections into the readings ring buffer.
+
+    The legacy history documents are left in place and act as the archive.
+    Returns the number of migrated cities.
+    """
+    migrated = 0
+    async for city in db.collection("air_quality").stream():
+        history_ref = city.reference.collection("history")
+        docs = [doc async for doc in history_ref.order_by("last_update", direction="DESCENDING")
+                   .limit(HISTORY_SIZE)
+                   .stream()]
+        if not docs:
+            continue
+
+        # The readings are read from the archive, so they are not archived again
+        await append_readings(db, city.id, [doc.to_dict() for doc in docs], archive=False)
+        migrated += 1
+        logger.info("Migrated %s history records for %s", len(docs), city.id)
 
-def save_air_quality_data(location: str, aqi: int, last_update: str):
-    """Save air quality data to Firestore"""
-    city_ref = db.collection("air_quality").document(location)
-    city_ref.set({"location": location}, merge=True)
-    doc_ref = city_ref.collection("history").document()
-    doc_ref.set({"AQI": aqi, "last_update": last_update})
+    return migrated
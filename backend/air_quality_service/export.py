@@ -0,0 +1,172 @@
+import os
+import io
+import csv
+import json
+import base64
+from backend.air_quality_service.database import city_document
+
+# Liczba miast czytanych jednym zapytaniem podczas eksportu
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE") or 200)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_COLUMNS = [
+    "location", "AQI", "last_update", "source",
+    "european_aqi", "us_aqi", "pm2_5", "pm10", "latitude", "longitude"
+]
+
+def encode_cursor(location: str, archive_after: str = None) -> str:
+    """Opaque token meaning 'resume after this city', or with archive_after
+    'resume after this history document of the (unfinished) city'"""
+    position = {"after": location}
+    if archive_after is not None:
+        position["archive_after"] = archive_after
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(token: str) -> tuple:
+    """Return (city, history document id or None) of a cursor token; ValueError for a malformed token"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return position["after"], position.get("archive_after")
+    except Exception as e:
+        raise ValueError(f"Invalid export cursor: {token}") from e
+
+def _row(location: str, reading: dict) -> dict:
+    raw_data = reading.get("raw_data") or {}
+    row = {
+        "location": location,
+        "AQI": reading.get("AQI"),
+        "last_update": reading.get("last_update"),
+        "source": reading.get("source"),
+    }
+    row.update({column: raw_data.get(column) for column in EXPORT_COLUMNS[4:]})
+    return row
+
+async def _archive_pages(db, location: str, page_size: int, last_id: str = None):
+    """(rows, last history document id) of a city's history subcollection, one page at a time"""
+    query = city_document(db, location).collection("history").order_by("__name__").limit(page_size)
+    while True:
+        page = query if last_id is None else query.start_after({"__name__": last_id})
+        docs = [doc async for doc in page.stream()]
+        if docs:
+            yield [_row(location, doc.to_dict()) for doc in docs], docs[-1].id
+        if len(docs) < page_size:
+            return
+        last_id = docs[-1].id
+
+async def export_pages(db, cursor: str = None, page_size: int = EXPORT_PAGE_SIZE, archive: bool = False):
+    """Yield (rows, next cursor token) for every page of cities, in document id order.
+
+    Rows are the readings kept on each city document, or with archive=True
+    the city's full history subcollection (yielded in pages as well). Only
+    one page is held in memory. Every token points right after the rows
+    yielded with it, also in the middle of a city's archive, so resuming
+    from it repeats no rows.
+    """
+    query = db.collection("air_quality").order_by("__name__").limit(page_size)
+    last_id, archive_after = decode_cursor(cursor) if cursor else (None, None)
+    if archive and archive_after is not None:
+        # Finish the city whose archive was interrupted, then continue after it
+        async for archive_rows, last_doc in _archive_pages(db, last_id, page_size, archive_after):
+            yield archive_rows, encode_cursor(last_id, last_doc)
+
+    while True:
+        page = query if last_id is None else query.start_after({"__name__": last_id})
+        docs = [doc async for doc in page.stream()]
+        if not docs:
+            return
+
+        rows = []
+        for doc in docs:
+            if archive:
+                async for archive_rows, last_doc in _archive_pages(db, doc.id, page_size):
+                    yield archive_rows, encode_cursor(doc.id, last_doc)
+                last_id = doc.id
+            else:
+                rows.extend(_row(doc.id, reading) for reading in doc.to_dict().get("readings") or [])
+
+        last_id = docs[-1].id
+        yield rows, encode_cursor(last_id)
+        if len(docs) < page_size:
+            return
+
+async def _ndjson(pages):
+    async for rows, cursor in pages:
+        yield "".join(json.dumps(row) + "\n" for row in rows).encode(), cursor
+
+async def _csv(pages, header: bool = True):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    if header:
+        writer.writeheader()
+    async for rows, cursor in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode(), cursor
+        buffer.seek(0)
+        buffer.truncate()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("location", pa.string()), ("AQI", pa.float64()), ("last_update", pa.string()), ("source", pa.string()),
+        ("european_aqi", pa.float64()), ("us_aqi", pa.float64()), ("pm2_5", pa.float64()),
+        ("pm10", pa.float64()), ("latitude", pa.float64()), ("longitude", pa.float64()),
+    ])
+
+async def _parquet(pages):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        # One row group per page of cities
+        async for rows, cursor in pages:
+            if rows:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain(), cursor
+    # Footer; the file is only readable once it has been written
+    yield sink.drain(), None
+
+def encode_export(pages, export_format: str, header: bool = True):
+    """Async generator of (encoded chunk, cursor token) for pages produced by export_pages.
+
+    The chunk of a page is complete once yielded, so its token can be saved
+    to resume later. header=False omits the CSV header (used when appending
+    to a resumed file).
+    """
+    if export_format == "ndjson":
+        return _ndjson(pages)
+    if export_format == "csv":
+        return _csv(pages, header)
+    if export_format == "parquet":
+        return _parquet(pages)
+    raise ValueError(f"Unsupported export format: {export_format}")
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import os
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, UTC
+from statistics import NormalDist
+
+logger = logging.getLogger(__name__)
+
+# Liczba ostatnich pomiarów używanych do prognozy
+PREDICTION_WINDOW = 5
+# Dopuszczalne wyjście prognozy poza zakres historii (20% rozpiętości)
+PREDICTION_MARGIN = 0.2
+
+def linear_forecast(histories) -> np.ndarray:
+    """Predict the next AQI for every row of a 2-D array in one vectorized pass.
+
+    Each row holds one city's measurements, newest first, with at least
+    PREDICTION_WINDOW values. A least-squares line is fitted in closed form
+    to the last PREDICTION_WINDOW values and extrapolated one step. The
+    result is bounded to the history range +/- 20% and to 0-500.
+    """
+    import numpy as np
+
+    values = np.asarray(histories, dtype=float)
+    window = values[:, :PREDICTION_WINDOW][:, ::-1]  # oldest first
+
+    time_points = np.arange(PREDICTION_WINDOW, dtype=float)
+    centered = time_points - time_points.mean()
+    mean = window.mean(axis=1)
+    slope = (window - mean[:, None]) @ centered / (centered @ centered)
+    predicted = mean + slope * (PREDICTION_WINDOW - time_points.mean())
+
+    # Bound the prediction within reasonable limits
+    low = window.min(axis=1)
+    high = window.max(axis=1)
+    margin = (high - low) * PREDICTION_MARGIN
+    predicted = np.clip(predicted, low - margin, high + margin)
+
+    # Ensure AQI is within valid range
+    return np.clip(np.round(predicted), 0, 500).astype(int)
+
+# --- Silnik prognoz wielohoryzontowych (liczony przy zapisie odczytu) ---
+
+# Horyzont i krok prognozy w godzinach
+FORECAST_HORIZON_HOURS = int(os.environ.get("FORECAST_HORIZON_HOURS") or 24)
+FORECAST_STEP_HOURS = int(os.environ.get("FORECAST_STEP_HOURS") or 1)
+# Modele liczone przy zapisie (kolejność bez znaczenia) i model domyślny odczytu
+FORECAST_MODEL_NAMES = [
+    name.strip()
+    for name in (os.environ.get("FORECAST_MODELS") or "linear,exponential_smoothing,seasonal_daily").split(",")
+    if name.strip()
+]
+FORECAST_DEFAULT_MODEL = os.environ.get("FORECAST_DEFAULT_MODEL") or "linear"
+# Współczynnik wygładzania wykładniczego (0-1)
+FORECAST_SMOOTHING = float(os.environ.get("FORECAST_SMOOTHING") or 0.5)
+# Szerokość przedziału prognozy (0.8 = 80%)
+FORECAST_INTERVAL = float(os.environ.get("FORECAST_INTERVAL") or 0.8)
+# Minimalna liczba pomiarów potrzebna do prognozy serii
+MIN_FORECAST_POINTS = 3
+
+# Forecasted series: AQI plus the pollutant concentrations from raw_data
+FORECAST_SERIES = {
+    "AQI": (0, 500),
+    "pm2_5": (0, None),
+    "pm10": (0, None),
+}
+
+class ForecastModel(ABC):
+    """Base class of the pluggable forecasting models.
+
+    fit_predict receives observation times (hours since epoch, oldest first),
+    their values and the target times; it returns in-sample fitted values
+    (used for residuals) and point forecasts for the targets.
+    """
+    name = None
+
+    @abstractmethod
+    def fit_predict(self, hours: np.ndarray, values: np.ndarray, targets: np.ndarray, hours_of_day: np.ndarray, target_hours_of_day: np.ndarray):
+        ...
+
+class LinearModel(ForecastModel):
+    """Least-squares trend over time, bounded to the history range +/- 20%"""
+    name = "linear"
+
+    def fit_predict(self, hours, values, targets, hours_of_day, target_hours_of_day):
+        import numpy as np
+
+        centered = hours - hours.mean()
+        denominator = centered @ centered
+        slope = (values - values.mean()) @ centered / denominator if denominator else 0.0
+        intercept = values.mean() - slope * hours.mean()
+
+        margin = (values.max() - values.min()) * PREDICTION_MARGIN
+        predicted = np.clip(intercept + slope * targets, values.min() - margin, values.max() + margin)
+        return intercept + slope * hours, predicted
+
+class ExponentialSmoothingModel(ForecastModel):
+    """Simple exponential smoothing; the forecast is the last smoothed level"""
+    name = "exponential_smoothing"
+
+    def __init__(self, alpha: float = FORECAST_SMOOTHING):
+        self.alpha = alpha
+
+    def smooth(self, values: np.ndarray):
+        """Return one-step-ahead fitted values and the final level"""
+        import numpy as np
+
+        fitted = np.empty_like(values)
+        level = values[0]
+        for i, value in enumerate(values):
+            fitted[i] = level
+            level = self.alpha * value + (1 - self.alpha) * level
+        return fitted, level
+
+    def fit_predict(self, hours, values, targets, hours_of_day, target_hours_of_day):
+        import numpy as np
+
+        fitted, level = self.smooth(values)
+        return fitted, np.full(len(targets), level)
+
+class SeasonalDailyModel(ExponentialSmoothingModel):
+    """Daily profile (mean deviation per block of hours) on top of a smoothed level"""
+    name = "seasonal_daily"
+
+    def __init__(self, alpha: float = FORECAST_SMOOTHING, block_hours: int = 6):
+        super().__init__(alpha)
+        self.block_hours = block_hours
+
+    def fit_predict(self, hours, values, targets, hours_of_day, target_hours_of_day):
+        import numpy as np
+
+        blocks = (hours_of_day // self.block_hours).astype(int)
+        target_blocks = (target_hours_of_day // self.block_hours).astype(int)
+
+        profile = np.zeros(24 // self.block_hours + 1)
+        for block in np.unique(blocks):
+            profile[block] = values[blocks == block].mean() - values.mean()
+
+        fitted, level = self.smooth(values - profile[blocks])
+        return fitted + profile[blocks], level + profile[target_blocks]
+
+FORECAST_MODELS = {}
+
+def register_model(model: ForecastModel):
+    """Make a model available to the forecasting engine under model.name"""
+    FORECAST_MODELS[model.name] = model
+    return model
+
+register_model(LinearModel())
+register_model(ExponentialSmoothingModel())
+register_model(SeasonalDailyModel())
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+def _confidence(sigma: float, points: int) -> str:
+    """Describe forecast quality from the residual spread of the AQI series"""
+    if points < PREDICTION_WINDOW or sigma > 25:
+        return "low"
+    if sigma > 10:
+        return "medium"
+    return "high"
+
+def _series(readings: list, name: str) -> list:
+    """(time, value) pairs of one series, oldest first"""
+    points = []
+    for reading in readings:
+        value = reading.get(name) if name == "AQI" else (reading.get("raw_data") or {}).get(name)
+        if value is None or not reading.get("last_update"):
+            continue
+        points.append((_parse_time(reading["last_update"]), float(value)))
+    return sorted(points, key=lambda point: point[0])
+
+def _forecast_series(model: ForecastModel, points: list, target_times: list, bounds) -> dict:
+    import numpy as np
+
+    times = [time for time, _ in points]
+    hours = np.array([time.timestamp() / 3600 for time in times])
+    values = np.array([value for _, value in points])
+    targets = np.array([time.timestamp() / 3600 for time in target_times])
+
+    fitted, predicted = model.fit_predict(
+        hours, values, targets,
+        np.array([time.hour for time in times], dtype=float),
+        np.array([time.hour for time in target_times], dtype=float)
+    )
+
+    # Interval from in-sample residuals, widening with the number of steps ahead
+    residuals = (values - fitted)[1:]
+    sigma = float(np.sqrt(np.mean(residuals ** 2))) if len(residuals) else 0.0
+    spacing = max(float(np.median(np.diff(hours))) if len(hours) > 1 else 0.0, FORECAST_STEP_HOURS)
+    steps = np.maximum((targets - hours[-1]) / spacing, 1.0)
+    half_width = NormalDist().inv_cdf(0.5 + FORECAST_INTERVAL / 2) * sigma * np.sqrt(steps)
+
+    low, high = bounds
+    clip = lambda array: np.round(np.clip(array, low, high), 1)
+    return {
+        "values": clip(predicted).tolist(),
+        "lower": clip(predicted - half_width).tolist(),
+        "upper": clip(predicted + half_width).tolist(),
+        "sigma": round(sigma, 2)
+    }
+
+def build_forecast(readings: list, models=None) -> dict:
+    """Compute multi-horizon forecasts from a city's stored readings.
+
+    Runs every selected model (FORECAST_MODEL_NAMES by default) on the AQI
+    and pm2_5/pm10 series for FORECAST_HORIZON_HOURS ahead of the newest
+    reading. Returns None when there is not enough data to forecast AQI.
+    The result only holds lists, numbers and strings so it can be stored on
+    the city document.
+    """
+    series = {name: _series(readings, name) for name in FORECAST_SERIES}
+    if len(series["AQI"]) < MIN_FORECAST_POINTS:
+        return None
+
+    newest = series["AQI"][-1][0]
+    target_times = [
+        newest + timedelta(hours=hours)
+        for hours in range(FORECAST_STEP_HOURS, FORECAST_HORIZON_HOURS + 1, FORECAST_STEP_HOURS)
+    ]
+
+    results = {}
+    for name in models or FORECAST_MODEL_NAMES:
+        model = FORECAST_MODELS.get(name)
+        if model is None:
+            logger.warning("Unknown forecast model: %s", name)
+            continue
+        results[name] = {
+            series_name: _forecast_series(model, points, target_times, FORECAST_SERIES[series_name])
+            for series_name, points in series.items()
+            if len(points) >= MIN_FORECAST_POINTS
+        }
+
+    return {
+        "generated_at": datetime.now(UTC).isoformat(),
+        "based_on": newest.isoformat(),
+        "timestamps": [time.isoformat() for time in target_times],
+        "confidence": {
+            name: _confidence(result["AQI"]["sigma"], len(series["AQI"]))
+            for name, result in results.items()
+        },
+        "models": results
+    }
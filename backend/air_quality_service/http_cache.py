@@ -0,0 +1,72 @@
+import os
+import hashlib
+from datetime import datetime, UTC
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+
+# Czas (sekundy), przez jaki nginx/CDN i przeglądarki mogą trzymać odczyty miast
+AIR_QUALITY_MAX_AGE = int(os.environ.get("AIR_QUALITY_MAX_AGE") or 60)
+
+PUBLIC_CACHE_CONTROL = f"public, max-age={AIR_QUALITY_MAX_AGE}"
+# Per-user responses: always revalidated, never stored by shared caches
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    """Weak ETag derived from the values that identify a response version"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def latest_update(timestamps) -> datetime:
+    """Newest of the ISO last_update values (naive ones are UTC), None if there are none"""
+    latest = None
+    for timestamp in timestamps:
+        try:
+            parsed = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            continue
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=UTC)
+        if latest is None or parsed > latest:
+            latest = parsed
+    return latest
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" identify the same version
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime = None) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the current version"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=UTC)
+        # HTTP dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def conditional_response(request: Request, response: Response, etag: str, last_modified: datetime = None, cache_control: str = PUBLIC_CACHE_CONTROL):
+    """Set validators and Cache-Control on response.
+
+    Returns a 304 response to send instead of the body when the client
+    already has this version, otherwise None.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(UTC), usegmt=True)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
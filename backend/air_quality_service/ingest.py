@@ -0,0 +1,62 @@
+import os
+import json
+from pydantic import ValidationError
+from backend.air_quality_service.models import BulkAirQualityData
+
+# Maksymalna liczba wierszy w jednym uploadzie
+BULK_MAX_ROWS = int(os.environ.get("BULK_MAX_ROWS") or 100000)
+
+def _raw_rows(body: bytes, content_type: str):
+    """Yield (row number, decoded row or JSON error) from an NDJSON or JSON-array body"""
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, e
+        return
+
+    rows = json.loads(text)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of readings")
+    yield from enumerate(rows, start=1)
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+def parse_bulk_rows(body: bytes, content_type: str = "application/json"):
+    """Validate an admin upload row by row.
+
+    Accepts NDJSON (application/x-ndjson) or a JSON array of
+    {location, AQI, last_update}. Returns ({location: [readings]}, accepted
+    row count, errors) where errors lists {"row", "error"} per rejected row
+    (numbered from 1). Raises ValueError when the body as a whole is unusable.
+    """
+    readings_by_city = {}
+    accepted = 0
+    errors = []
+    for number, row in _raw_rows(body, content_type):
+        if number > BULK_MAX_ROWS:
+            raise ValueError(f"At most {BULK_MAX_ROWS} rows per upload")
+        if isinstance(row, Exception):
+            errors.append({"row": number, "error": f"Invalid JSON: {row}"})
+            continue
+        try:
+            data = BulkAirQualityData.model_validate(row)
+        except ValidationError as e:
+            errors.append({"row": number, "error": _describe(e)})
+            continue
+
+        readings_by_city.setdefault(data.location, []).append({
+            "AQI": data.AQI,
+            "last_update": data.last_update
+        })
+        accepted += 1
+
+    return readings_by_city, accepted, errors
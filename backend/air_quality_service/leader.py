@@ -0,0 +1,187 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta, UTC
+from backend.air_quality_service.database import get_firestore_client
+
+logger = logging.getLogger(__name__)
+
+# firestore - dzierżawa w dokumencie Firestore (wiele replik); local - tylko w procesie (testy, dev)
+LEADER_ELECTION = os.environ.get("LEADER_ELECTION") or "firestore"
+# Czas życia dzierżawy i co ile sekund jest odnawiana (heartbeat < TTL)
+LEADER_LEASE_TTL = float(os.environ.get("LEADER_LEASE_TTL") or 30)
+LEADER_HEARTBEAT = float(os.environ.get("LEADER_HEARTBEAT") or 10)
+LEADER_LEASE_COLLECTION = os.environ.get("LEADER_LEASE_COLLECTION") or "leases"
+
+def holder_identity() -> str:
+    """Unique id of this process (pod hostname + pid)"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+class LocalLease:
+    """In-process lease with the same semantics as FirestoreLease (tests and single-process runs)"""
+
+    _leases = {}
+
+    def __init__(self, name: str, holder: str, ttl: float = LEADER_LEASE_TTL, timer=time.time):
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+        self._timer = timer
+
+    async def try_acquire(self) -> bool:
+        """Take the lease if it is free or expired, or renew it if we hold it"""
+        now = self._timer()
+        current = self._leases.get(self.name)
+        if current is None or current["holder"] == self.holder or current["expires_at"] <= now:
+            self._leases[self.name] = {"holder": self.holder, "expires_at": now + self.ttl}
+            return True
+        return False
+
+    async def release(self):
+        if self._leases.get(self.name, {}).get("holder") == self.holder:
+            del self._leases[self.name]
+
+class FirestoreLease:
+    """Lease stored in {LEADER_LEASE_COLLECTION}/{name}, taken and renewed in a transaction.
+
+    Expiry uses the replicas' clocks, so they should be NTP-synced to well
+    under the TTL. Without a db the shared client is used, created on the
+    first campaign.
+    """
+
+    def __init__(self, db, name: str, holder: str, ttl: float = LEADER_LEASE_TTL):
+        self.db = db
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+
+    async def _client(self):
+        if self.db is not None:
+            return self.db
+        # The first call creates the shared client, which is blocking
+        return await asyncio.to_thread(get_firestore_client)
+
+    async def try_acquire(self) -> bool:
+        from google.cloud import firestore
+
+        db = await self._client()
+        lease_ref = db.collection(LEADER_LEASE_COLLECTION).document(self.name)
+
+        @firestore.async_transactional
+        async def acquire(transaction):
+            snapshot = await lease_ref.get(transaction=transaction)
+            now = datetime.now(UTC)
+            if snapshot.exists:
+                lease = snapshot.to_dict()
+                if lease.get("holder") != self.holder and lease.get("expires_at") > now.isoformat():
+                    return False
+            transaction.set(lease_ref, {
+                "holder": self.holder,
+                "expires_at": (now + timedelta(seconds=self.ttl)).isoformat(),
+                "renewed_at": now.isoformat()
+            })
+            return True
+
+        return await acquire(db.transaction())
+
+    async def release(self):
+        from google.cloud import firestore
+
+        db = await self._client()
+        lease_ref = db.collection(LEADER_LEASE_COLLECTION).document(self.name)
+
+        @firestore.async_transactional
+        async def release(transaction):
+            snapshot = await lease_ref.get(transaction=transaction)
+            if snapshot.exists and snapshot.to_dict().get("holder") == self.holder:
+                transaction.delete(lease_ref)
+
+        await release(db.transaction())
+
+class LeaderElector:
+    """Keeps trying to hold a lease; is_leader is True while it is held.
+
+    Leadership is given up on its own when renewals fail for longer than the
+    TTL, so another replica can take over after a crash or partition.
+    """
+
+    def __init__(self, lease, heartbeat: float = LEADER_HEARTBEAT, timer=time.monotonic):
+        self.lease = lease
+        self.heartbeat = heartbeat
+        self._timer = timer
+        self._valid_until = 0.0
+        self._task = None
+        self._stopping = False
+
+    @property
+    def is_leader(self) -> bool:
+        return self._timer() < self._valid_until
+
+    async def campaign(self) -> bool:
+        """One acquire/renew attempt; returns whether this process leads"""
+        was_leader = self.is_leader
+        attempted_at = self._timer()
+        try:
+            acquired = await self.lease.try_acquire()
+        except Exception as e:
+            logger.warning("[LEADER] Lease renewal for %s failed: %s", self.lease.name, e)
+            acquired = None
+
+        if acquired:
+            # Counted from before the call, so we never outlive the stored lease
+            self._valid_until = attempted_at + self.lease.ttl
+        elif acquired is False:
+            self._valid_until = 0.0
+
+        if self.is_leader != was_leader:
+            logger.info("[LEADER] %s %s leadership of %s", self.lease.holder, 'acquired' if self.is_leader else 'lost', self.lease.name)
+        return self.is_leader
+
+    async def _run(self):
+        # A flag as well as cancel(): a transaction interrupted by cancel()
+        # can surface as an ordinary error that campaign() swallows
+        while True:
+            await self.campaign()
+            if self._stopping:
+                return
+            await asyncio.sleep(self.heartbeat)
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop campaigning and hand the lease over right away"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.is_leader:
+            try:
+                await self.lease.release()
+            except Exception as e:
+                logger.warning("[LEADER] Failed to release lease %s: %s", self.lease.name, e)
+        self._valid_until = 0.0
+
+    def status(self) -> dict:
+        return {
+            "lease": self.lease.name,
+            "holder": self.lease.holder,
+            "is_leader": self.is_leader,
+            "backend": type(self.lease).__name__
+        }
+
+def create_elector(name: str, db=None, backend: str = LEADER_ELECTION) -> LeaderElector:
+    holder = holder_identity()
+    if backend == "local":
+        return LeaderElector(LocalLease(name, holder))
+    return LeaderElector(FirestoreLease(db, name, holder))
@@ -0,0 +1,39 @@
+import os
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from starlette.requests import Request
+from backend.air_quality_service.auth import cached_token_claims
+
+# Wspólny limiter dla całej aplikacji.
+# memory:// - lokalnie i w testach, redis://host:6379 - współdzielony między replikami
+RATE_LIMIT_STORAGE_URI = os.environ.get("RATE_LIMIT_STORAGE_URI") or "memory://"
+# Sliding window counter - stały koszt sprawdzenia (dwa liczniki na klucz)
+RATE_LIMIT_STRATEGY = os.environ.get("RATE_LIMIT_STRATEGY") or "sliding-window-counter"
+# Liczba wpisów X-Forwarded-For dopisywanych przez zaufane proxy (0 = nagłówek ignorowany).
+# Load balancer GCE dopisuje "<klient>, <adres LB>", więc na GKE ustawiamy 2.
+TRUSTED_PROXY_COUNT = int(os.environ.get("TRUSTED_PROXY_COUNT") or 0)
+
+def client_ip(request: Request) -> str:
+    """Client address as seen by the outermost trusted proxy"""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and TRUSTED_PROXY_COUNT > 0:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[max(len(hops) - TRUSTED_PROXY_COUNT, 0)]
+    return get_remote_address(request)
+
+def rate_limit_key(request: Request) -> str:
+    """Rate limit per user when the token was already verified, otherwise per client IP"""
+    authorization = request.headers.get("authorization")
+    if authorization and authorization.startswith("Bearer "):
+        claims = cached_token_claims(authorization.split(" ")[1])
+        if claims and claims.get("uid"):
+            return f"user:{claims['uid']}"
+    return f"ip:{client_ip(request)}"
+
+limiter = Limiter(
+    key_func=rate_limit_key,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    in_memory_fallback_enabled=True
+)
@@ -0,0 +1,234 @@
+import os
+import re
+import sys
+import copy
+import json
+import uuid
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+import logging.handlers
+from datetime import datetime, timezone
+from backend.air_quality_service.metrics import LOG_RECORDS_DROPPED
+
+# Poziom logowania dla całego serwisu
+LOG_LEVEL = (os.environ.get("LOG_LEVEL") or "INFO").upper()
+# Poziomy poszczególnych loggerów, np. "httpx=WARNING,backend.air_quality_service.auth=DEBUG"
+LOG_LEVELS = os.environ.get("LOG_LEVELS") or ""
+# Format wyjścia: json (domyślnie) albo text
+LOG_FORMAT = (os.environ.get("LOG_FORMAT") or "json").lower()
+# Z komunikatów oznaczonych jako SAMPLED zapisywany jest co N-ty (1 wyłącza próbkowanie)
+LOG_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY") or 10)
+# Maksymalna liczba rekordów czekających na zapis; nadmiar jest odrzucany
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE") or 10000)
+
+# Biblioteki, które na poziomie INFO logują każde zapytanie lub każde uruchomienie zadania
+DEFAULT_LOG_LEVELS = {"httpx": "WARNING", "httpcore": "WARNING", "apscheduler": "WARNING"}
+
+# Pass as extra= on per-request INFO/DEBUG lines to log only every LOG_SAMPLE_EVERY-th one
+SAMPLED = {"sample": True}
+
+REQUEST_ID_HEADER = "x-request-id"
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# Credentials in query strings (e.g. in uvicorn's access lines) are masked before writing
+_SECRET_QUERY_PATTERN = re.compile(r"([?&](?:token|id_token|access_token|key)=)[^&\s\"']+", re.IGNORECASE)
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Atrybuty LogRecord, które nie trafiają do JSON jako pola dodatkowe
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "sample", "sampled", "taskName", "color_message"
+}
+
+def parse_levels(spec: str) -> dict:
+    """"name=LEVEL,other=LEVEL" -> {name: LEVEL}; entries without "=" are ignored"""
+    levels = {}
+    for entry in spec.split(","):
+        name, sep, level = entry.partition("=")
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def redact(message: str) -> str:
+    """Mask token=... style query parameters in a log message"""
+    if "=" not in message:
+        return message
+    return _SECRET_QUERY_PATTERN.sub(r"\1[REDACTED]", message)
+
+class RequestIdFilter(logging.Filter):
+    """Adds the id of the request being served (or None) to every record"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keeps the first and then every N-th record of each sampled message template.
+
+    Only records logged with extra=SAMPLED at INFO or below are sampled; the
+    count is per template (record.msg), so a rare sampled line still shows up.
+    Kept records carry sampled=N, i.e. each one stands for N occurrences.
+    """
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.every == 1 or not getattr(record, "sample", False) or record.levelno > logging.INFO:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every:
+            LOG_RECORDS_DROPPED.inc(reason="sampled")
+            return False
+        record.sampled = self.every
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request_id and extras"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "sampled", None):
+            entry["sampled"] = record.sampled
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return super().format(record)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread; formatting and I/O happen there.
+
+    Only the message itself is interpolated here (its arguments may change
+    once the call returns) and query-string credentials are masked. A full
+    queue drops the record instead of blocking the event loop.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = redact(record.getMessage())
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+def create_formatter(log_format: str = LOG_FORMAT) -> logging.Formatter:
+    return TextFormatter() if log_format == "text" else JsonFormatter()
+
+def setup_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, log_format: str = LOG_FORMAT,
+                  sample_every: int = LOG_SAMPLE_EVERY, stream=None):
+    """Route all logging through a queue to a background thread writing to stderr.
+
+    Safe to call more than once: the root handler and listener are installed once.
+    uvicorn's own loggers are redirected here too, so access logs get request ids.
+    """
+    global _listener, _handler
+    with _lock:
+        root = logging.getLogger()
+        root.setLevel(level.upper())
+        for name, logger_level in {**DEFAULT_LOG_LEVELS, **parse_levels(levels)}.items():
+            logging.getLogger(name).setLevel(logger_level)
+
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(create_formatter(log_format))
+
+        _handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _handler.addFilter(SamplingFilter(sample_every))
+        _handler.addFilter(RequestIdFilter())
+        root.addHandler(_handler)
+
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+        _listener = logging.handlers.QueueListener(_handler.queue, output)
+        _listener.start()
+        atexit.register(stop_logging)
+
+def stop_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener, _handler
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _listener = None
+        _handler = None
+
+class RequestIdMiddleware:
+    """ASGI middleware binding a request id to the logs of each request.
+
+    A well-formed X-Request-ID from the proxy is reused, otherwise a new id is
+    generated; HTTP responses echo it back in the same header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = [(name, value) for name, value in message.get("headers", ()) if name != REQUEST_ID_HEADER.encode()]
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -1,18 +1,21 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
+from fastapi.responses import JSONResponse, Response
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
 from backend.air_quality_service.routes import air_quality, protected
 from backend.air_quality_service.prediction import router as prediction_router
-import logging
+from backend.air_quality_service.auth import start_certificate_refresh, stop_certificate_refresh, get_firebase_app
+from backend.air_quality_service.database import get_firestore_client
+from backend.air_quality_service.readiness import readiness
+from backend.air_quality_service.metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware
+from backend.air_quality_service.logging_setup import setup_logging, RequestIdMiddleware
+from backend.air_quality_service.limiter import limiter
+import importlib
+
+# JSON logs written by a background thread; levels from LOG_LEVEL / LOG_LEVELS
+setup_logging()
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-# Create limiter instance
-limiter = Limiter(key_func=get_remote_address)
 app = FastAPI(
     title="Your API Title",
     description="API Description",
@@ -22,7 +25,7 @@ app = FastAPI(
     openapi_url="/openapi.json"  # Ensure this matches what Swagger UI expects
 )
 
-# Add limiter to app
+# Add shared limiter to app
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -36,13 +39,55 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Request id for logs, taken from X-Request-ID or generated, echoed in the response
+app.add_middleware(RequestIdMiddleware)
+
+# Per-route latency and status counts; added last so it is the outermost
+# middleware and its timings include CORS and the request id handling
+app.add_middleware(MetricsMiddleware)
+
 # Apply rate limiting to routes
 @app.get("/")
 @limiter.limit("5/minute")
 async def root(request: Request):
     return {"message": "Air Quality Service Running"}
 
+# Readiness probe: 503 until clients are created and heavy modules imported
+@app.get("/ready")
+async def ready():
+    status = readiness.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Prometheus scrape endpoint (not proxied by nginx)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # Include routers
 app.include_router(air_quality.router)
 app.include_router(protected.router)
-app.include_router(prediction_router, prefix="/prediction")
\ No newline at end of file
+app.include_router(prediction_router, prefix="/prediction")
+
+# Keep Google signing certificates warm for token verification
+@app.on_event("startup")
+async def start_auth_certificates():
+    start_certificate_refresh()
+
+@app.on_event("shutdown")
+async def stop_auth_certificates():
+    await stop_certificate_refresh()
+
+# Cloud clients, the Open-Meteo HTTP pool and numpy are set up in the background after
+# startup, so the server listens at once and turns ready when warm
+readiness.add_step("firestore", get_firestore_client)
+readiness.add_step("firebase", get_firebase_app)
+readiness.add_step("numpy", lambda: importlib.import_module("numpy"))
+readiness.add_step("weather_api", air_quality.weather_api.start)
+
+@app.on_event("startup")
+async def start_warm_up():
+    readiness.start()
+
+@app.on_event("shutdown")
+async def stop_warm_up():
+    await readiness.stop()
\ No newline at end of file
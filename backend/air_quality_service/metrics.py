@@ -0,0 +1,234 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Granice kubełków histogramów czasu (sekundy)
+METRICS_BUCKETS = [
+    float(bucket)
+    for bucket in (os.environ.get("METRICS_BUCKETS") or "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10").split(",")
+]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class Metric:
+    """A metric family with a fixed set of label names (Prometheus text format).
+
+    Updates are thread-safe: token verification runs in the threadpool.
+    A value can also be computed at scrape time with set_function.
+    """
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def set_function(self, func, **labels):
+        """Report func() for these labels whenever metrics are collected"""
+        self._functions[self._key(labels)] = func
+
+    def value(self, **labels):
+        key = self._key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def samples(self):
+        """(suffix, labels, value) for every label set"""
+        with self._lock:
+            values = dict(self._values)
+        for key, func in self._functions.items():
+            try:
+                values[key] = float(func())
+            except Exception:
+                # A failing callback must not break the whole scrape
+                continue
+        for key, value in sorted(values.items()):
+            yield "", dict(zip(self.labelnames, key)), value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=METRICS_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = sorted(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block (also when it raises)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def value(self, **labels):
+        """(count, sum) of the observations with these labels"""
+        with self._lock:
+            counts, total = self._values.get(self._key(labels)) or ([0], 0.0)
+        return sum(counts), total
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + [float("inf")], counts):
+                cumulative += count
+                yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield "_sum", labels, total
+            yield "_count", labels, cumulative
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name, documentation, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name, documentation, labelnames=()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+def histogram(name, documentation, labelnames=(), buckets=METRICS_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+# --- Metryki serwisu ---
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route template and status", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = histogram("http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"])
+HTTP_REQUESTS_IN_PROGRESS = gauge("http_requests_in_progress", "HTTP requests being served")
+
+FIRESTORE_REQUESTS = counter("firestore_requests_total", "Firestore RPCs by method and outcome", ["method", "outcome"])
+FIRESTORE_REQUEST_DURATION = histogram("firestore_request_duration_seconds", "Firestore RPC latency, streams until fully read", ["method"])
+
+UPSTREAM_REQUESTS = counter("upstream_requests_total", "Open-Meteo requests by endpoint and status", ["endpoint", "status"])
+UPSTREAM_REQUEST_DURATION = histogram("upstream_request_duration_seconds", "Open-Meteo request latency", ["endpoint"])
+
+TOKEN_VERIFICATION_DURATION = histogram("auth_token_verification_seconds", "Firebase ID token verification time", ["cache"])
+
+SCHEDULER_RUNS = counter("scheduler_runs_total", "Scheduled refresh ticks by result", ["result"])
+SCHEDULER_LAST_RUN = gauge("scheduler_last_run_timestamp_seconds", "Unix time of the last refresh tick that did work")
+SCHEDULER_LAST_RUN_DURATION = gauge("scheduler_last_run_duration_seconds", "Duration of the last refresh tick")
+SCHEDULER_LAST_RUN_CITIES = gauge("scheduler_last_run_cities", "Cities handled by the last refresh tick", ["result"])
+SCHEDULER_IS_LEADER = gauge("scheduler_is_leader", "1 when this replica holds the refresh scheduler lease")
+
+CACHE_REQUESTS = counter("cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+CACHE_HIT_RATIO = gauge("cache_hit_ratio", "Share of cache lookups that were hits", ["cache"])
+CACHE_ENTRIES = gauge("cache_entries", "Entries held by a cache", ["cache"])
+
+LOG_RECORDS_DROPPED = counter("log_records_dropped_total", "Log records not written, by reason", ["reason"])
+
+def register_cache(name: str, stats):
+    """Report a cache whose stats() returns hits, misses, hit_rate and size"""
+    CACHE_REQUESTS.set_function(lambda: stats()["hits"], cache=name, result="hit")
+    CACHE_REQUESTS.set_function(lambda: stats()["misses"], cache=name, result="miss")
+    CACHE_HIT_RATIO.set_function(lambda: stats()["hit_rate"], cache=name)
+    CACHE_ENTRIES.set_function(lambda: stats()["size"], cache=name)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status of every HTTP request.
+
+    Requests are labelled with the matched route template (/air-quality/{location}),
+    so the label set stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", "unmatched")}
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, **labels)
+            HTTP_REQUESTS.inc(**labels, status=str(status))
@@ -4,15 +4,25 @@ from typing import Optional, List
 
 class AirQualityData(BaseModel):
     AQI: int = Field(..., ge=0, le=500, description="Air Quality Index must be between 0 and 500")
-    last_update: Optional[str] = None
+    last_update: Optional[str] = Field(default=None, validate_default=True)
 
     @field_validator("last_update", mode="before")
     @classmethod
     def set_last_update(cls, value):
         if not value:
             return datetime.now(UTC).isoformat()
+        # Readings are sorted and forecast by this timestamp, so it must be ISO 8601
+        if isinstance(value, str):
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"last_update must be an ISO 8601 timestamp, got {value!r}")
         return value
 
+class BulkAirQualityData(AirQualityData):
+    """One row of an admin bulk upload"""
+    location: str = Field(..., min_length=1)
+
 class TrackedCity(BaseModel):
     city: str
     added_at: str = Field(default_factory=lambda: datetime.now(UTC).isoformat())
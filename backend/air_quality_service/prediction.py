@@ -1,16 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sklearn.linear_model import LinearRegression
-import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Query
+from cachetools import LRUCache
+from datetime import datetime
+import os
 from .auth import verify_firebase_token as verify_token
+from .database import get_firestore_client, get_readings, get_forecast, HISTORY_SIZE
+from .forecasting import (
+    linear_forecast, build_forecast, PREDICTION_WINDOW, MIN_FORECAST_POINTS,
+    FORECAST_MODELS, FORECAST_DEFAULT_MODEL, FORECAST_HORIZON_HOURS
+)
 import logging
 from pydantic import BaseModel
 
 class PredictionRequest(BaseModel):
     history: list[float]
 
+class BatchPredictionRequest(BaseModel):
+    cities: list[str]
+    histories: list[list[float]]  # One row per city, newest measurement first
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Liczba miast z zapamiętaną prognozą
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE") or 512)
+
+# city -> (last_update of the newest reading, forecast computed from it);
+# only used for city documents stored without a precomputed forecast
+_forecast_cache = LRUCache(maxsize=PREDICTION_CACHE_SIZE)
+
 @router.post("/predict/{city}")
 async def predict_aqi(
     city: str,
@@ -18,37 +35,15 @@ async def predict_aqi(
     current_user=Depends(verify_token)
 ):
     try:
-        if len(request.history) < 5:
+        if len(request.history) < PREDICTION_WINDOW:
             raise HTTPException(
                 status_code=400, 
                 detail="Need at least 5 measurements for prediction"
             )
 
-        # Prepare data for prediction - reverse to have oldest first
-        history = request.history[:5][::-1]  # Get last 5 values and reverse
-        values = np.array(history).reshape(-1, 1)
-        time_points = np.array(range(len(values))).reshape(-1, 1)
-        
-        # Train simple linear model
-        model = LinearRegression()
-        model.fit(time_points, values)
-        
-        # Predict next value and ensure it's reasonable
-        predicted = model.predict([[5]])[0]
-        
-        # Get min and max from history for bounds
-        min_history = min(history)
-        max_history = max(history)
-        margin = (max_history - min_history) * 0.2  # Allow 20% deviation
+        predicted_aqi = int(linear_forecast([request.history[:PREDICTION_WINDOW]])[0])
         
-        # Bound the prediction within reasonable limits
-        predicted = max(min_history - margin, min(max_history + margin, predicted))
-        predicted_aqi = round(float(predicted))
-        
-        # Ensure AQI is within valid range
-        predicted_aqi = max(0, min(500, predicted_aqi))
-        
-        logger.debug(f"History: {history}, Predicted: {predicted_aqi}")
+        logger.debug("History: %s, Predicted: %s", request.history[:PREDICTION_WINDOW], predicted_aqi)
         
         return {
             "city": city,
@@ -56,9 +51,126 @@ async def predict_aqi(
             "confidence": "low"
         }
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Prediction error for %s: %s", city, e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Prediction failed: {str(e)}"
+        )
+
+@router.post("/predict-batch")
+async def predict_aqi_batch(
+    request: BatchPredictionRequest,
+    current_user=Depends(verify_token)
+):
+    """Forecast many cities at once from a 2-D array of histories"""
+    if len(request.cities) != len(request.histories):
+        raise HTTPException(status_code=400, detail="Number of cities and histories must match")
+    if not request.cities:
+        return {"predictions": []}
+
+    histories = [history[:PREDICTION_WINDOW] for history in request.histories]
+    if any(len(history) < PREDICTION_WINDOW for history in histories):
+        raise HTTPException(
+            status_code=400,
+            detail="Need at least 5 measurements for prediction"
+        )
+
+    try:
+        predicted = linear_forecast(histories)
+    except Exception as e:
+        logger.error("Batch prediction error: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Prediction failed: {str(e)}"
+        )
+
+    return {
+        "predictions": [
+            {"city": city, "predicted_aqi": int(aqi), "confidence": "low"}
+            for city, aqi in zip(request.cities, predicted)
+        ]
+    }
+
+@router.get("/{city}")
+async def predict_stored_aqi(
+    city: str,
+    model: str = Query(None, description="Forecast model, FORECAST_DEFAULT_MODEL when omitted"),
+    hours: int = Query(FORECAST_HORIZON_HOURS, ge=1, le=FORECAST_HORIZON_HOURS),
+    current_user=Depends(verify_token),
+    db=Depends(get_firestore_client)
+):
+    """Return the forecast precomputed for a city when its data was last written.
+
+    Cities stored before forecasts were precomputed get one computed from
+    their readings, memoized per city until a newer reading lands.
+    """
+    model = model or FORECAST_DEFAULT_MODEL
+    if model not in FORECAST_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown forecast model: {model}")
+
+    try:
+        forecast = await get_forecast(db, city)
+        if forecast is None or model not in forecast["models"]:
+            forecast = await _compute_forecast(db, city)
+
+        if forecast is None or model not in forecast["models"]:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Need at least {MIN_FORECAST_POINTS} stored measurements for {city}"
+            )
+
+        steps = sum(1 for timestamp in forecast["timestamps"] if _hours_ahead(forecast, timestamp) <= hours)
+        series = forecast["models"][model]
+        return {
+            "city": city,
+            "predicted_aqi": int(series["AQI"]["values"][0]),
+            "confidence": forecast["confidence"][model],
+            "last_update": forecast["based_on"],
+            "model": model,
+            "generated_at": forecast["generated_at"],
+            "forecast": [
+                {
+                    "timestamp": timestamp,
+                    **{
+                        name: {
+                            "value": values["values"][i],
+                            "lower": values["lower"][i],
+                            "upper": values["upper"][i]
+                        }
+                        for name, values in series.items()
+                    }
+                }
+                for i, timestamp in enumerate(forecast["timestamps"][:steps])
+            ]
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Prediction error for {city}: {e}")
+        logger.error("Prediction error for %s: %s", city, e)
         raise HTTPException(
             status_code=500,
             detail=f"Prediction failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+def _hours_ahead(forecast: dict, timestamp: str) -> float:
+    delta = datetime.fromisoformat(timestamp) - datetime.fromisoformat(forecast["based_on"])
+    return delta.total_seconds() / 3600
+
+async def _compute_forecast(db, city: str) -> dict:
+    """Forecast from stored readings for documents without a precomputed one"""
+    readings = await get_readings(db, city, limit=HISTORY_SIZE)
+    if not readings:
+        return None
+
+    last_update = readings[0].get("last_update")
+    cached = _forecast_cache.get(city)
+    if cached is not None and cached[0] == last_update:
+        return cached[1]
+
+    forecast = build_forecast(readings, models=list(FORECAST_MODELS))
+    _forecast_cache[city] = (last_update, forecast)
+    return forecast
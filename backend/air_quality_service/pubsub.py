@@ -0,0 +1,154 @@
+import os
+import json
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# memory:// - tylko w obrębie procesu; redis://host:port - wspólny kanał dla wszystkich replik
+PUBSUB_URL = os.environ.get("PUBSUB_URL") or "memory://"
+PUBSUB_CHANNEL = os.environ.get("PUBSUB_CHANNEL") or "aqi-updates"
+# Maksymalna liczba zaległych zdarzeń na subskrybenta (najstarsze są odrzucane)
+PUBSUB_QUEUE_SIZE = int(os.environ.get("PUBSUB_QUEUE_SIZE") or 100)
+
+class Subscription:
+    """Queue of AQI updates for a set of locations"""
+
+    def __init__(self, hub, locations, maxsize: int = PUBSUB_QUEUE_SIZE):
+        self.hub = hub
+        self.locations = set(locations)
+        self.dropped = 0
+        self._queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, message: dict):
+        # A slow client loses its oldest updates instead of blocking publishers
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(message)
+
+    async def get(self, timeout: float = None):
+        """Next update, or None when nothing arrived within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PubSubHub:
+    """In-process fan-out of AQI updates to subscribers of a location"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self.published = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def subscribe(self, locations) -> Subscription:
+        subscription = Subscription(self, locations)
+        for location in subscription.locations:
+            self._subscribers.setdefault(location, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for location in subscription.locations:
+            subscribers = self._subscribers.get(location)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[location]
+
+    async def publish(self, location: str, reading: dict):
+        """Send a new reading to everyone subscribed to location"""
+        self.published += 1
+        self._deliver({"location": location, "reading": reading})
+
+    def _deliver(self, message: dict):
+        for subscription in list(self._subscribers.get(message["location"], ())):
+            subscription.deliver(message)
+
+    def stats(self) -> dict:
+        return {
+            "locations": len(self._subscribers),
+            "subscriptions": len({s for subscribers in self._subscribers.values() for s in subscribers}),
+            "published": self.published
+        }
+
+class RedisPubSubHub(PubSubHub):
+    """Hub that relays updates through a Redis channel so every replica sees them.
+
+    Each replica publishes to the channel and delivers what it receives from
+    it to its own subscribers, its own updates included.
+    """
+
+    def __init__(self, url: str, channel: str = PUBSUB_CHANNEL):
+        super().__init__()
+        import redis.asyncio as redis
+
+        self.channel = channel
+        self._redis = redis.from_url(url)
+        self._pubsub = None
+        self._listener = None
+
+    async def start(self):
+        if self._listener is not None:
+            return
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen())
+        logger.info("Listening for AQI updates on Redis channel %s", self.channel)
+
+    async def stop(self):
+        if self._listener is None:
+            return
+        self._listener.cancel()
+        try:
+            await self._listener
+        except asyncio.CancelledError:
+            pass
+        self._listener = None
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+    async def publish(self, location: str, reading: dict):
+        self.published += 1
+        message = {"location": location, "reading": reading}
+        try:
+            await self._redis.publish(self.channel, json.dumps(message, default=str))
+        except Exception as e:
+            # Other replicas miss this update, local subscribers still get it
+            logger.warning("Failed to publish AQI update for %s to Redis: %s", location, e)
+            self._deliver(message)
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] == "message":
+                        self._deliver(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Redis AQI update listener failed, retrying: %s", e)
+                await asyncio.sleep(1)
+
+def create_hub(url: str = PUBSUB_URL) -> PubSubHub:
+    """Hub for PUBSUB_URL: in-process for memory://, Redis-backed otherwise"""
+    if url.startswith("memory://"):
+        return PubSubHub()
+    return RedisPubSubHub(url)
+
+aqi_updates = create_hub()
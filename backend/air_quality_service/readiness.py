@@ -0,0 +1,81 @@
+import os
+import time
+import asyncio
+import inspect
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Odstęp (sekundy) między ponownymi próbami nieudanych kroków rozgrzewki
+WARMUP_RETRY_DELAY = float(os.environ.get("WARMUP_RETRY_DELAY") or 5)
+
+class Readiness:
+    """Warm-up run in the background after startup; the service is ready once every step succeeded.
+
+    Steps are blocking callables (run in a thread) or coroutine functions.
+    Startup itself does not wait for them, so the server accepts connections
+    right away and /ready tells the load balancer when to send traffic.
+    """
+
+    def __init__(self, retry_delay: float = WARMUP_RETRY_DELAY, timer=time.monotonic):
+        self.retry_delay = retry_delay
+        self._timer = timer
+        self._steps = {}
+        self._results = {}
+        self._task = None
+        self.created_at = timer()
+        self.ready_at = None
+
+    def add_step(self, name: str, func):
+        self._steps[name] = func
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    async def _run_step(self, name: str, func):
+        started_at = self._timer()
+        try:
+            if inspect.iscoroutinefunction(func):
+                await func()
+            else:
+                await asyncio.to_thread(func)
+        except Exception as e:
+            self._results[name] = {"done": False, "error": str(e)}
+            logger.warning("[READY] Warm-up step %s failed: %s", name, e)
+            return
+        self._results[name] = {"done": True, "seconds": round(self._timer() - started_at, 3)}
+
+    async def warm_up(self):
+        """Run the steps concurrently, retrying failed ones until all of them succeeded"""
+        while True:
+            pending = [name for name in self._steps if not self._results.get(name, {}).get("done")]
+            await asyncio.gather(*(self._run_step(name, self._steps[name]) for name in pending))
+            if all(self._results[name]["done"] for name in self._steps):
+                break
+            await asyncio.sleep(self.retry_delay)
+
+        self.ready_at = self._timer()
+        logger.info("[READY] Warm-up finished in %.3fs", self.ready_at - self.created_at)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.warm_up())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "warmup_seconds": round(self.ready_at - self.created_at, 3) if self.ready else None,
+            "steps": {name: self._results.get(name, {"done": False}) for name in self._steps}
+        }
+
+readiness = Readiness()
@@ -0,0 +1,60 @@
+import os
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Ustawienia odświeżania miast (równoległość, timeout, ponowienia)
+REFRESH_CONCURRENCY = int(os.environ.get("REFRESH_CONCURRENCY") or 10)
+REFRESH_CITY_TIMEOUT = float(os.environ.get("REFRESH_CITY_TIMEOUT") or 30)
+REFRESH_MAX_RETRIES = int(os.environ.get("REFRESH_MAX_RETRIES") or 2)
+REFRESH_BACKOFF = float(os.environ.get("REFRESH_BACKOFF") or 1.0)
+
+async def refresh_cities(
+    cities,
+    update,
+    concurrency: int = REFRESH_CONCURRENCY,
+    timeout: float = REFRESH_CITY_TIMEOUT,
+    retries: int = REFRESH_MAX_RETRIES,
+    backoff: float = REFRESH_BACKOFF
+) -> dict:
+    """Run `await update(city)` for every city with bounded concurrency.
+
+    A city counts as refreshed when update returns a truthy value. Failed or
+    timed out attempts are retried with exponential backoff (the concurrency
+    slot is released while waiting). Returns a summary of the run.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+
+    async def refresh_city(city):
+        for attempt in range(retries + 1):
+            async with semaphore:
+                try:
+                    if await asyncio.wait_for(update(city), timeout):
+                        return True
+                    logger.warning("[REFRESH] Attempt %s for %s returned no data", attempt + 1, city)
+                except asyncio.TimeoutError:
+                    logger.warning("[REFRESH] Attempt %s for %s timed out after %ss", attempt + 1, city, timeout)
+                except Exception as e:
+                    logger.warning("[REFRESH] Attempt %s for %s failed: %s", attempt + 1, city, e)
+            if attempt < retries:
+                await asyncio.sleep(backoff * 2 ** attempt)
+        return False
+
+    cities = list(cities)
+    results = await asyncio.gather(*(refresh_city(city) for city in cities))
+
+    failed = [city for city, ok in zip(cities, results) if not ok]
+    summary = {
+        "total": len(cities),
+        "succeeded": len(cities) - len(failed),
+        "failed": failed,
+        "duration_seconds": round(time.monotonic() - started, 3)
+    }
+    logger.info(
+        "[REFRESH] Refreshed %s/%s cities in %ss, failed: %s",
+        summary['succeeded'], summary['total'], summary['duration_seconds'], failed
+    )
+    return summary
@@ -0,0 +1,181 @@
+import os
+import math
+import time
+import random
+import logging
+from collections import Counter
+from datetime import datetime, UTC
+from backend.air_quality_service.database import HISTORY_SIZE, get_readings_many, tracked_city_counts
+
+logger = logging.getLogger(__name__)
+
+# Co ile sekund planista sprawdza, które miasta trzeba odświeżyć (+/- jitter)
+REFRESH_TICK = int(os.environ.get("REFRESH_TICK") or 300)
+REFRESH_TICK_JITTER = int(os.environ.get("REFRESH_TICK_JITTER") or 30)
+# Maksymalna liczba miast pobieranych z Open-Meteo w jednym przebiegu
+REFRESH_BUDGET = int(os.environ.get("REFRESH_BUDGET") or 100)
+# Granice odstępu między odświeżeniami (sekundy); IDLE - miasta, których nikt nie śledzi ani nie czyta
+REFRESH_MIN_INTERVAL = int(os.environ.get("REFRESH_MIN_INTERVAL") or 1800)
+REFRESH_MAX_INTERVAL = int(os.environ.get("REFRESH_MAX_INTERVAL") or 6 * 3600)
+REFRESH_IDLE_INTERVAL = int(os.environ.get("REFRESH_IDLE_INTERVAL") or 24 * 3600)
+# Losowe rozrzucenie terminów (+/- 10%), żeby miasta nie odświeżały się falami
+REFRESH_JITTER = float(os.environ.get("REFRESH_JITTER") or 0.1)
+# Co ile sekund stan miast i liczby obserwujących są wczytywane od nowa z Firestore
+REFRESH_RELOAD_INTERVAL = int(os.environ.get("REFRESH_RELOAD_INTERVAL") or 3600)
+# Stała czasowa licznika odczytów (sekundy) i skala zmienności AQI
+READ_RATE_WINDOW = 3600
+# Poniżej tylu odczytów na godzinę nieśledzone miasto uznawane jest za porzucone
+IDLE_READ_RATE = 0.01
+VOLATILITY_SCALE = 20.0
+
+def _timestamp(value: str):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=UTC)
+    return parsed.timestamp()
+
+def volatility(readings: list) -> float:
+    """Standard deviation of AQI changes between consecutive stored readings"""
+    values = [reading["AQI"] for reading in readings if reading.get("AQI") is not None]
+    changes = [newer - older for newer, older in zip(values, values[1:])]
+    if not changes:
+        return 0.0
+    mean = sum(changes) / len(changes)
+    return math.sqrt(sum((change - mean) ** 2 for change in changes) / len(changes))
+
+class RefreshPlanner:
+    """Plans each city's next refresh from its trackers, reads and AQI volatility.
+
+    Only tracked cities (from the subscriber index) and cities read recently
+    on this replica are planned, so refresh work grows with demand rather
+    than with every city ever stored. State is loaded from Firestore every
+    REFRESH_RELOAD_INTERVAL seconds and kept current in between by the
+    record_* hooks called from the routes.
+
+    Every replica keeps its own planner, but only the scheduler leader plans
+    refreshes. Read counts (_reads) are per replica and never shared, so the
+    leader ranks cities by the reads it served itself; reads served by other
+    replicas only count once their cities are tracked.
+    """
+
+    def __init__(self, timer=time.time):
+        self._timer = timer
+        self._cities = {}
+        self._trackers = Counter()
+        self._reads = {}
+        self._retry_after = {}
+        self.loaded_at = None
+        self.last_run = None
+
+    def needs_reload(self) -> bool:
+        return self.loaded_at is None or self._timer() - self.loaded_at > REFRESH_RELOAD_INTERVAL
+
+    async def reload(self, db):
+        """Load subscriber counts from the index and readings of tracked and recently read cities"""
+        trackers = Counter(await tracked_city_counts(db))
+        self._reads = {city: read for city, read in self._reads.items() if self.reads_per_hour(city) >= IDLE_READ_RATE}
+        histories = await get_readings_many(db, list(trackers) + list(self._reads), limit=HISTORY_SIZE)
+
+        # Read-only cities without stored data (e.g. unknown upstream) are not planned
+        self._cities = {
+            city: self._city_state(readings)
+            for city, readings in histories.items() if readings or city in trackers
+        }
+        self._trackers = trackers
+        self.loaded_at = self._timer()
+        logger.info("[PLANNER] Loaded %s cities, %s tracked", len(self._cities), len(trackers))
+
+    @staticmethod
+    def _city_state(readings: list) -> dict:
+        return {
+            "last_update": _timestamp(readings[0].get("last_update")) if readings else None,
+            "volatility": volatility(readings)
+        }
+
+    def record_update(self, city: str, readings: list):
+        """A city's ring buffer was written (readings newest first)"""
+        self._cities[city] = self._city_state(readings)
+        self._retry_after.pop(city, None)
+
+    def record_failure(self, city: str):
+        """Upstream had no data: do not spend budget on the city for a while"""
+        self._retry_after[city] = self._timer() + REFRESH_MIN_INTERVAL
+
+    def backing_off(self, city: str) -> bool:
+        """True while a recent failed refresh of the city should not be retried"""
+        return self._retry_after.get(city, 0) > self._timer()
+
+    def record_read(self, city: str):
+        now = self._timer()
+        count, seen = self._reads.get(city, (0.0, now))
+        self._reads[city] = (count * math.exp((seen - now) / READ_RATE_WINDOW) + 1, now)
+
+    def add_tracker(self, city: str, delta: int = 1):
+        self._trackers[city] = max(0, self._trackers[city] + delta)
+
+    def forget(self, city: str):
+        self._cities.pop(city, None)
+        self._retry_after.pop(city, None)
+
+    def reads_per_hour(self, city: str) -> float:
+        count, seen = self._reads.get(city, (0.0, self._timer()))
+        return count * math.exp((seen - self._timer()) / READ_RATE_WINDOW) * 3600 / READ_RATE_WINDOW
+
+    def interval(self, city: str) -> float:
+        """Seconds between refreshes: shorter for tracked, read and volatile cities"""
+        trackers = self._trackers[city]
+        reads = self.reads_per_hour(city)
+        if trackers == 0 and reads < IDLE_READ_RATE:
+            return REFRESH_IDLE_INTERVAL
+
+        score = 1 + math.log1p(trackers) + math.log1p(reads) + self._cities.get(city, {}).get("volatility", 0.0) / VOLATILITY_SCALE
+        return min(REFRESH_MAX_INTERVAL, max(REFRESH_MIN_INTERVAL, REFRESH_MAX_INTERVAL / score))
+
+    def next_refresh(self, city: str) -> float:
+        state = self._cities.get(city, {})
+        if state.get("last_update") is None:
+            return self._timer()
+        # Stable per reading, so the due time does not move between runs
+        jitter = random.Random(f"{city}:{state['last_update']}").uniform(-REFRESH_JITTER, REFRESH_JITTER)
+        due = state["last_update"] + self.interval(city) * (1 + jitter)
+        return max(due, self._retry_after.get(city, 0))
+
+    def plan(self) -> list:
+        """All known cities ordered by priority (most overdue relative to their interval first)"""
+        now = self._timer()
+        entries = []
+        for city in self._cities:
+            interval = self.interval(city)
+            due = self.next_refresh(city)
+            entries.append({
+                "city": city,
+                "trackers": self._trackers[city],
+                "reads_per_hour": round(self.reads_per_hour(city), 2),
+                "volatility": round(self._cities[city]["volatility"], 2),
+                "interval_seconds": round(interval),
+                "next_refresh": datetime.fromtimestamp(due, UTC).isoformat(),
+                "overdue_seconds": round(now - due),
+                "priority": round((now - due) / interval, 3)
+            })
+        return sorted(entries, key=lambda entry: entry["priority"], reverse=True)
+
+    def due(self, budget: int = REFRESH_BUDGET) -> list:
+        """Cities whose refresh is due, highest priority first, at most budget of them"""
+        return [entry["city"] for entry in self.plan() if entry["overdue_seconds"] >= 0][:budget]
+
+    def snapshot(self, limit: int = 50) -> dict:
+        plan = self.plan()
+        return {
+            "cities": len(plan),
+            "due": sum(1 for entry in plan if entry["overdue_seconds"] >= 0),
+            "budget": REFRESH_BUDGET,
+            "tick_seconds": REFRESH_TICK,
+            "loaded_at": datetime.fromtimestamp(self.loaded_at, UTC).isoformat() if self.loaded_at else None,
+            "last_run": self.last_run,
+            "queue": plan[:limit]
+        }
+
+refresh_planner = RefreshPlanner()
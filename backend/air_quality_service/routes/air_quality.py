@@ -1,22 +1,64 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, BackgroundTasks
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, BackgroundTasks, WebSocket, WebSocketDisconnect, Query, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, UTC
 import asyncio
+import json
 import logging
-from backend.air_quality_service.database import db, get_firestore_client
+import time
+import os
+from backend.air_quality_service.database import (
+    get_firestore_client, get_readings, get_readings_many, append_readings, delete_city, ingest_readings,
+    add_tracked_city, remove_tracked_city, list_tracked_cities
+)
 from backend.air_quality_service.models import AirQualityData, TrackedCity
 from backend.air_quality_service.auth import admin_only, verify_firebase_token as verify_token
-from backend.air_quality_service.weather_api import WeatherAPI
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from backend.air_quality_service.weather_api import WeatherAPI, GeocodeCache
+from backend.air_quality_service.cache import air_quality_cache
+from backend.air_quality_service.refresh import refresh_cities
+from backend.air_quality_service.refresh_planner import (
+    refresh_planner, REFRESH_TICK, REFRESH_TICK_JITTER, REFRESH_BUDGET, REFRESH_JITTER
+)
+from backend.air_quality_service.forecasting import build_forecast
+from backend.air_quality_service.singleflight import SingleFlight
+from backend.air_quality_service.pubsub import aqi_updates
+from backend.air_quality_service.ingest import parse_bulk_rows
+from backend.air_quality_service.export import export_pages, encode_export, decode_cursor, EXPORT_FORMATS
+from backend.air_quality_service.leader import create_elector
+from backend.air_quality_service.http_cache import (
+    conditional_response, make_etag, latest_update, PRIVATE_CACHE_CONTROL
+)
+from backend.air_quality_service.limiter import limiter
+from backend.air_quality_service.logging_setup import SAMPLED
+from backend.air_quality_service.metrics import (
+    SCHEDULER_RUNS, SCHEDULER_LAST_RUN, SCHEDULER_LAST_RUN_DURATION, SCHEDULER_LAST_RUN_CITIES, SCHEDULER_IS_LEADER
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
 
-# Initialize WeatherAPI
-weather_api = WeatherAPI()
+# Initialize WeatherAPI (coordinates are persisted in Firestore; the client
+# is only created on first use, the HTTP pool on startup)
+weather_api = WeatherAPI(geocode_cache=GeocodeCache(db_factory=get_firestore_client))
+
+# Stale-while-revalidate: starszy odczyt jest zwracany od razu,
+# a odświeżenie z Open-Meteo startuje w tle (próg w sekundach).
+# 0 = dopiero gdy planista spóźnia się z odświeżeniem miasta (odstęp + jitter + tick)
+STALE_WHILE_REVALIDATE = os.environ.get("STALE_WHILE_REVALIDATE", "true").lower() == "true"
+STALE_AFTER = float(os.environ.get("STALE_AFTER") or 0)
+
+# One upstream fetch/refresh per location at a time
+upstream_flights = SingleFlight()
+
+# Co ile sekund strumień aktualizacji wysyła keep-alive
+STREAM_HEARTBEAT = float(os.environ.get("STREAM_HEARTBEAT") or 15)
+# Czas (sekundy) na przesłanie tokenu w pierwszej wiadomości WebSocketu
+WS_AUTH_TIMEOUT = float(os.environ.get("WS_AUTH_TIMEOUT") or 10)
+
+# Only the replica holding this lease runs the scheduled refreshes
+scheduler_leader = create_elector("refresh-scheduler")
+SCHEDULER_IS_LEADER.set_function(lambda: scheduler_leader.is_leader)
 
 # Initialize scheduler as a singleton
 _scheduler = None
@@ -24,74 +66,182 @@ _scheduler = None
 def get_scheduler():
     global _scheduler
     if _scheduler is None:
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
         _scheduler = AsyncIOScheduler()
     return _scheduler
 
-async def update_city_aqi(city: str, db=None):
-    """Background task to update AQI data for a city"""
+async def _read_history_many(db, locations) -> dict:
+    """Return {location: history} for many locations.
+
+    Locations in the read cache are served from it, the rest are read from
+    their city documents in a single round-trip.
+    """
+    histories = {}
+    misses = []
+    for location in dict.fromkeys(locations):
+        cached = air_quality_cache.get(location)
+        if cached is not None:
+            histories[location] = cached
+        else:
+            misses.append(location)
+
+    results = await get_readings_many(db, misses) if misses else {}
+    for location, data in results.items():
+        histories[location] = data
+        if data:
+            air_quality_cache.set(location, data)
+    return histories
+
+async def _read_history(db, location: str) -> list:
+    """Return the 5 most recent readings for a location, served from the read cache when possible"""
+    cached = air_quality_cache.get(location)
+    if cached is not None:
+        return cached
+
+    data = await get_readings(db, location)
+    if data:
+        air_quality_cache.set(location, data)
+    return data
+
+async def _save_new_reading(db, location: str, weather_data: dict):
+    """Store the first reading for a location fetched from Open-Meteo"""
+    readings = await append_readings(db, location, [weather_data])
+    air_quality_cache.set(location, [weather_data])
+    refresh_planner.record_update(location, readings)
+
+async def _fetch_new_reading(db, location: str) -> dict:
+    """Fetch and store the first reading for a location (run once per location at a time)"""
+    weather_data = await weather_api.get_air_quality(location)
+    if weather_data:
+        await _save_new_reading(db, location, weather_data)
+        logger.info("Saved new AQI data for %s", location, extra=SAMPLED)
+    return weather_data
+
+def _stale_after(location: str) -> float:
+    """Age after which a read refreshes the location itself.
+
+    By default this is later than the leader's planned refresh could happen,
+    so reads on any replica only step in when the scheduled refresh was
+    missed, instead of refreshing outside the lease and REFRESH_BUDGET.
+    """
+    if STALE_AFTER:
+        return STALE_AFTER
+    return refresh_planner.interval(location) * (1 + REFRESH_JITTER) + REFRESH_TICK + REFRESH_TICK_JITTER
+
+def _is_stale(history: list, max_age: float) -> bool:
+    """True when the newest reading is older than max_age seconds"""
     try:
-        logger.info(f"[UPDATE] Updating AQI data for {city}")
+        last_update = datetime.fromisoformat(history[0]["last_update"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    if last_update.tzinfo is None:
+        last_update = last_update.replace(tzinfo=UTC)
+    return (datetime.now(UTC) - last_update).total_seconds() > max_age
+
+def _history_response(request: Request, response: Response, location: str, history: list):
+    """Body for a city read, or 304 when the client's validators match the returned readings.
+
+    response is None when the route is called directly from another route;
+    no headers are set then.
+    """
+    body = {"location": location, "history": history}
+    if response is None:
+        return body
+
+    # Every returned reading counts: a backfilled older reading changes the body
+    # without changing the newest timestamp or the number of readings
+    etag = make_etag(location, *((reading.get("last_update"), reading.get("AQI")) for reading in history))
+    last_modified = latest_update(reading.get("last_update") for reading in history)
+    return conditional_response(request, response, etag, last_modified) or body
+
+def _revalidate(db, location: str):
+    """Refresh a location in the background; concurrent triggers share one refresh.
+
+    After a failed refresh the location is left alone until the planner's backoff ends.
+    """
+    if refresh_planner.backing_off(location):
+        return
+    upstream_flights.start(("refresh", location), lambda: update_city_aqi(location, db))
+
+async def update_city_aqi(city: str, db=None, weather_data: dict = None) -> bool:
+    """Background task to update AQI data for a city, returns True on success.
+
+    weather_data can be passed in when it was already fetched in bulk.
+    """
+    try:
+        logger.debug("[UPDATE] Updating AQI data for %s", city)
         
         if db is None:
             db = get_firestore_client()
             
         # Fetch new data from API
-        weather_data = await weather_api.get_air_quality(city)
+        if weather_data is None:
+            weather_data = await weather_api.get_air_quality(city)
         if not weather_data:
-            logger.error(f"[UPDATE] Failed to fetch new AQI data for {city}")
-            return
+            logger.error("[UPDATE] Failed to fetch new AQI data for %s", city)
+            refresh_planner.record_failure(city)
+            return False
 
-        # Get reference to city's history collection
-        city_ref = db.collection("air_quality").document(city)
-        history_ref = city_ref.collection("history")
-        
-        # Get all records ordered by timestamp
-        all_docs = list(history_ref.order_by("last_update", direction="DESCENDING").stream())
-        
-        if len(all_docs) >= 5:
-            # Update the oldest record instead of creating a new one
-            oldest_doc = all_docs[-1]  # Last document is the oldest
-            oldest_doc.reference.set(weather_data)
-            logger.info(f"[UPDATE] Updated oldest record for {city}")
-        else:
-            # If we have less than 5 records, create a new one
-            new_doc = history_ref.document()
-            new_doc.set(weather_data)
-            logger.info(f"[UPDATE] Created new record for {city}")
-        
-        # Update city document
-        city_ref.set({
-            "name": city,
-            "last_update": weather_data["last_update"]
-        }, merge=True)
+        # Push the reading into the city's ring buffer (oldest one drops out)
+        # and precompute its forecasts so reads are a lookup
+        readings = await append_readings(db, city, [weather_data], forecaster=build_forecast)
+        air_quality_cache.invalidate(city)
+        refresh_planner.record_update(city, readings)
+        await aqi_updates.publish(city, weather_data)
                 
-        logger.info(f"[UPDATE] Successfully updated AQI data for {city}")
+        logger.info("[UPDATE] Successfully updated AQI data for %s", city, extra=SAMPLED)
+        return True
         
     except Exception as e:
-        logger.error(f"[UPDATE] Error updating AQI for {city}: {e}")
+        logger.error("[UPDATE] Error updating AQI for %s: %s", city, e)
+        refresh_planner.record_failure(city)
+        return False
+
+async def refresh_due_cities():
+    """Scheduled job: refresh the cities the planner marks as due, within the upstream budget"""
+    if not scheduler_leader.is_leader:
+        logger.debug("[UPDATE] Not the scheduler leader, skipping refresh")
+        SCHEDULER_RUNS.inc(result="skipped")
+        return None
 
-async def update_all_cities():
-    """Update AQI data for all cities in the database"""
     try:
         db = get_firestore_client()
-        cities = db.collection("air_quality").stream()
-        
-        # Get unique city names
-        city_names = set(city.id for city in cities)
-        
-        # Update each city
-        for city in city_names:
-            await update_city_aqi(city, db)
-            
+        if refresh_planner.needs_reload():
+            await refresh_planner.reload(db)
+
+        cities = refresh_planner.due(REFRESH_BUDGET)
+        started_at = datetime.now(UTC).isoformat()
+        if cities:
+            # Fetch fresh readings in a few multi-location requests
+            readings = await weather_api.get_air_quality_many(cities)
+            summary = await refresh_cities(
+                cities,
+                lambda city: update_city_aqi(city, db, readings.get(city))
+            )
+        else:
+            summary = {"total": 0, "succeeded": 0, "failed": [], "duration_seconds": 0.0}
+
+        refresh_planner.last_run = {"started_at": started_at, **summary}
+        SCHEDULER_RUNS.inc(result="ok" if cities else "idle")
+        if cities:
+            SCHEDULER_LAST_RUN.set(time.time())
+            SCHEDULER_LAST_RUN_DURATION.set(summary["duration_seconds"])
+            SCHEDULER_LAST_RUN_CITIES.set(summary["succeeded"], result="succeeded")
+            SCHEDULER_LAST_RUN_CITIES.set(len(summary["failed"]), result="failed")
+        return summary
+
     except Exception as e:
-        logger.error(f"[UPDATE] Error in update_all_cities: {e}")
+        logger.error("[UPDATE] Error in refresh_due_cities: %s", e)
+        SCHEDULER_RUNS.inc(result="error")
 
 # Start the scheduler when the application starts
 @router.on_event("startup")
 async def start_scheduler():
     scheduler = get_scheduler()
     if not scheduler.running:
-        scheduler.add_job(update_all_cities, 'interval', hours=6)
+        # Frequent ticks; each refreshes only the cities that are due
+        scheduler.add_job(refresh_due_cities, 'interval', seconds=REFRESH_TICK, jitter=REFRESH_TICK_JITTER)
         scheduler.start()
         logger.info("Scheduler started successfully")
 
@@ -103,90 +253,93 @@ async def stop_scheduler():
         scheduler.shutdown()
         logger.info("Scheduler shut down successfully")
 
+# The pooled Open-Meteo client is opened by the startup warm-up (main.py)
+@router.on_event("shutdown")
+async def stop_weather_api():
+    await weather_api.close()
+
+# Leader election for the scheduled refresh (every replica campaigns, one runs it)
+@router.on_event("startup")
+async def start_leader_election():
+    await scheduler_leader.start()
+
+@router.on_event("shutdown")
+async def stop_leader_election():
+    await scheduler_leader.stop()
+
+# Live AQI updates hub (Redis listener when PUBSUB_URL points to Redis)
+@router.on_event("startup")
+async def start_aqi_updates():
+    await aqi_updates.start()
+
+@router.on_event("shutdown")
+async def stop_aqi_updates():
+    await aqi_updates.stop()
+
 @router.post("/user/tracked-cities/{city}")
 @limiter.limit("5/minute")
 async def track_city(request: Request, city: str, user=Depends(verify_token), db=Depends(get_firestore_client)):
     try:
-        logger.info(f"[TRACK] Starting track_city for {city}")
-        logger.info(f"[TRACK] User {user['email']} is tracking city {city}")
+        logger.debug("[TRACK] Starting track_city for %s", city)
+        logger.info("[TRACK] User %s is tracking city %s", user['email'], city, extra=SAMPLED)
         
         # First check if the city exists by trying to get its data
         try:
-            logger.info(f"[TRACK] Calling get_air_quality for {city}")
+            logger.debug("[TRACK] Calling get_air_quality for %s", city)
             result = await get_air_quality(request, city, db)
-            logger.info(f"[TRACK] get_air_quality returned data for {city}: {result is not None}")
+            logger.debug("[TRACK] get_air_quality returned data for %s: %s", city, result is not None)
         except HTTPException as he:
-            logger.error(f"[TRACK] get_air_quality failed for {city}: {he.detail}")
+            logger.error("[TRACK] get_air_quality failed for %s: %s", city, he.detail)
             raise he
         
         # If we get here, the city exists and has data
         # Add to user's tracked cities
-        user_ref = db.collection("user_preferences").document(user["uid"])
-        doc = user_ref.get()
-        tracked_cities = []
-        if doc.exists:
-            tracked_cities = doc.to_dict().get("tracked_cities", [])
-            if any(tc.get("city") == city for tc in tracked_cities):
-                return {"message": f"City {city} is already being tracked"}
-        
-        # Add new city to tracked cities
-        tracked_city = TrackedCity(city=city).model_dump()
-        tracked_cities.append(tracked_city)
-        user_ref.set({"tracked_cities": tracked_cities}, merge=True)
+        # The subscription and the city's subscriber count are written atomically
+        if not await add_tracked_city(db, user["uid"], city, TrackedCity(city=city).model_dump()):
+            return {"message": f"City {city} is already being tracked"}
+        refresh_planner.add_tracker(city)
 
         return {"message": f"Now tracking {city}"}
         
     except Exception as e:
-        logger.error(f"Error tracking city: {e}")
+        logger.error("Error tracking city: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/air-quality/{location}")
 @limiter.limit("10/minute")
-async def get_air_quality(request: Request, location: str, db=Depends(get_firestore_client)):
+async def get_air_quality(request: Request, location: str, db=Depends(get_firestore_client), response: Response = None):
     """Return AQI data from Firestore, fetch from Open-Meteo if none exists"""
     try:
-        logger.info(f"[AQI] Starting get_air_quality for {location}")
-        
-        # Get reference to city's history collection
-        city_ref = db.collection("air_quality").document(location)
-        history_ref = city_ref.collection("history")
-        
-        # Get only 5 most recent documents
-        docs = list(history_ref.order_by("last_update", direction="DESCENDING")
-                   .limit(5)
-                   .stream())
-        
-        logger.info(f"[AQI] Found {len(docs)} existing records for {location}")
-        
-        # If no data exists, fetch from Open-Meteo
-        if not docs:
-            logger.info(f"No data found for {location}, fetching from Open-Meteo")
-            weather_data = await weather_api.get_air_quality(location)
+        logger.debug("[AQI] Starting get_air_quality for %s", location)
+
+        # Get only 5 most recent readings
+        refresh_planner.record_read(location)
+        data = await _read_history(db, location)
+        
+        logger.debug("[AQI] Found %s existing records for %s", len(data), location)
+        
+        # If no data exists, fetch from Open-Meteo (concurrent requests share one fetch)
+        if not data:
+            logger.info("No data found for %s, fetching from Open-Meteo", location, extra=SAMPLED)
+            weather_data = await upstream_flights.do(
+                ("fetch", location), lambda: _fetch_new_reading(db, location)
+            )
             
             if not weather_data:
                 raise HTTPException(status_code=404, detail=f"City {location} not found")
             
-            # Save the data
-            city_ref.set({
-                "name": location,
-                "last_update": weather_data["last_update"]
-            }, merge=True)
-            
-            new_doc = history_ref.document()
-            new_doc.set(weather_data)
-            
-            logger.info(f"Saved new AQI data for {location}")
-            
-            return {"location": location, "history": [weather_data]}
-        
-        # Return existing data
-        data = [doc.to_dict() for doc in docs]
-        logger.info(f"Found {len(data)} records for {location}")
+            return _history_response(request, response, location, [weather_data])
         
-        return {"location": location, "history": data}
+        # Serve stored data right away, refresh it in the background when stale
+        if STALE_WHILE_REVALIDATE and _is_stale(data, _stale_after(location)):
+            logger.info("[AQI] Data for %s is stale, refreshing in background", location, extra=SAMPLED)
+            _revalidate(db, location)
+
+        # Return existing data (304 when the client already has the newest reading)
+        return _history_response(request, response, location, data)
 
     except Exception as e:
-        logger.error(f"Error fetching data: {e}")
+        logger.error("Error fetching data: %s", e)
         logger.exception(e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
@@ -195,37 +348,23 @@ async def get_air_quality(request: Request, location: str, db=Depends(get_firest
 @limiter.limit("5/minute")
 async def set_air_quality(request: Request, location: str, data: AirQualityData, user=Depends(admin_only), db=Depends(get_firestore_client)):
     try:
-        logger.info(f"[{user['email']}] is saving AQI data for {location}")
-        logger.info(f"Saving air quality data for {location}")
+        logger.info("[%s] is saving AQI data for %s", user['email'], location, extra=SAMPLED)
+        logger.debug("Saving air quality data for %s", location)
 
-        city_ref = db.collection("air_quality").document(location)
-        
-        # Get the history collection reference
-        history_ref = city_ref.collection("history")
-        
-        # Get all documents ordered by timestamp
-        docs = history_ref.order_by("last_update", direction="DESCENDING").limit(10).stream()
-        existing_docs = list(docs)
-        
-        # Add new document
-        new_doc = history_ref.document()
-        new_doc.set({
+        # Add the reading; the ring buffer keeps only the most recent ones
+        reading = {
             "AQI": data.AQI,
             "last_update": data.last_update
-        })
-        
-        # If we have more than 10 documents after adding the new one,
-        # delete the oldest ones
-        if len(existing_docs) >= 10:
-            # Get the oldest documents (all after the first 9)
-            docs_to_delete = existing_docs[9:]
-            for doc in docs_to_delete:
-                doc.reference.delete()
+        }
+        readings = await append_readings(db, location, [reading], forecaster=build_forecast)
 
+        air_quality_cache.invalidate(location)
+        refresh_planner.record_update(location, readings)
+        await aqi_updates.publish(location, reading)
         return {"message": f"Data for {location} saved successfully"}
 
     except Exception as e:
-        logger.error(f"Error saving data: {e}")
+        logger.error("Error saving data: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # DELETE request: Usuwanie danych o jakości powietrza
@@ -236,66 +375,123 @@ async def flush_air_quality(location: str, user=Depends(admin_only), db=Depends(
         if user.get("role") != "admin":
             raise HTTPException(status_code=403, detail="Admin access required")
 
-        city_ref = db.collection("air_quality").document(location)
-        history_docs = city_ref.collection("history").stream()
-
-        for doc in history_docs:
-            doc.reference.delete()
-
-        city_ref.delete()
+        # Readings and archive are deleted in batched commits
+        await delete_city(db, location)
+        air_quality_cache.invalidate(location)
+        refresh_planner.forget(location)
 
         return {"message": f"Flushed air quality data for {location}."}
     
     except Exception as e:
-        logger.error(f"Error flushing data: {e}")
+        logger.error("Error flushing data: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# POST request: Hurtowy import odczytów (NDJSON lub tablica JSON)
+@router.post("/admin/air-quality/bulk")
+@limiter.limit("10/minute")
+async def bulk_ingest_air_quality(request: Request, user=Depends(admin_only), db=Depends(get_firestore_client)):
+    """Load many {location, AQI, last_update} rows; invalid rows are reported, the rest is stored"""
+    try:
+        readings_by_city, accepted, errors = parse_bulk_rows(
+            await request.body(), request.headers.get("content-type", "application/json")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+
+    try:
+        logger.info("[%s] is loading %s readings for %s cities", user['email'], accepted, len(readings_by_city))
+        commits, buffers = await ingest_readings(db, readings_by_city, forecaster=build_forecast)
+        for city, readings in buffers.items():
+            air_quality_cache.invalidate(city)
+            refresh_planner.record_update(city, readings)
+
+        return {
+            "accepted": accepted,
+            "rejected": len(errors),
+            "cities": len(readings_by_city),
+            "commits": commits,
+            "errors": errors
+        }
+
+    except Exception as e:
+        logger.error("Error loading bulk data: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/admin/export")
+async def export_air_quality(
+    export_format: str = Query("ndjson", alias="format"),
+    cursor: str = None,
+    archive: bool = False,
+    user=Depends(admin_only),
+    db=Depends(get_firestore_client)
+):
+    """Stream every city's readings as NDJSON, CSV or Parquet.
+
+    Cities are read page by page in id order; cursor resumes after the city
+    encoded in a token produced by the export (see export_data.py).
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, use one of: {', '.join(EXPORT_FORMATS)}")
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Parquet export requires pyarrow")
+
+    logger.info("[%s] is exporting air quality data as %s", user['email'], export_format)
+    chunks = encode_export(export_pages(db, cursor, archive=archive), export_format)
+
+    async def body():
+        async for chunk, _ in chunks:
+            if chunk:
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="air_quality.{export_format}"'}
+    )
+
+@router.get("/admin/refresh-queue")
+async def get_refresh_queue(limit: int = Query(50, ge=1, le=1000), user=Depends(admin_only)):
+    """Return the refresh planner's queue, highest priority first, its last run and this replica's leadership"""
+    return {**refresh_planner.snapshot(limit), "leader": scheduler_leader.status()}
+
+@router.get("/admin/cache-stats")
+async def get_cache_stats(user=Depends(admin_only)):
+    """Return hit/miss/eviction counters of the AQI read cache"""
+    return air_quality_cache.stats()
+
 @router.post("/user/tracked-cities/{city}")
 @limiter.limit("5/minute")
 async def track_city(request: Request, city: str, user=Depends(verify_token), db=Depends(get_firestore_client)):
     try:
-        logger.info(f"[TRACK] Starting track_city for {city}")
-        logger.info(f"[TRACK] User {user['email']} is tracking city {city}")
+        logger.debug("[TRACK] Starting track_city for %s", city)
+        logger.info("[TRACK] User %s is tracking city %s", user['email'], city, extra=SAMPLED)
         
-        # 1. Check and fetch AQI data
-        city_ref = db.collection("air_quality").document(city)
-        history_ref = city_ref.collection("history")
-        
-        # Get existing data
-        existing_data = list(history_ref.order_by("last_update", direction="DESCENDING").limit(1).stream())
-
-        # Always fetch fresh data when tracking a new city
-        logger.info(f"Fetching fresh data for {city}")
+        # 1. Always fetch fresh data when tracking a new city
+        logger.debug("Fetching fresh data for %s", city)
         weather_data = await weather_api.get_air_quality(city)
         
         if not weather_data:
             raise HTTPException(status_code=404, detail=f"City {city} not found")
             
-        # Save new AQI data and ensure we keep only 10 most recent readings
-        new_doc = history_ref.document()
-        new_doc.set(weather_data)
-        logger.info(f"Saved new AQI data for {city}: {weather_data}")
-        
-        # Cleanup old data if we have more than 10 entries
-        all_docs = list(history_ref.order_by("last_update", direction="DESCENDING").stream())
-        if len(all_docs) > 10:
-            for old_doc in all_docs[10:]:
-                old_doc.reference.delete()
-                logger.info(f"Deleted old AQI data for {city}")
+        # Save new AQI data; the ring buffer keeps only the most recent readings
+        readings = await append_readings(db, city, [weather_data], forecaster=build_forecast)
+        logger.debug("Saved new AQI data for %s", city)
+        air_quality_cache.invalidate(city)
+        refresh_planner.record_update(city, readings)
         
         # 2. Add to user's tracked cities
-        user_ref = db.collection("user_preferences").document(user["uid"])
-        doc = user_ref.get()
-        tracked_cities = []
-        if doc.exists:
-            tracked_cities = doc.to_dict().get("tracked_cities", [])
-            if any(tc.get("city") == city for tc in tracked_cities):
-                return {"message": f"City {city} is already being tracked"}
-        
-        # Add new city to tracked cities
-        tracked_city = TrackedCity(city=city).model_dump()
-        tracked_cities.append(tracked_city)
-        user_ref.set({"tracked_cities": tracked_cities}, merge=True)
+        # The subscription and the city's subscriber count are written atomically
+        if not await add_tracked_city(db, user["uid"], city, TrackedCity(city=city).model_dump()):
+            return {"message": f"City {city} is already being tracked"}
+        refresh_planner.add_tracker(city)
 
         # 3. Return both tracking confirmation and current AQI data
         latest_data = await get_air_quality(request, city, db)
@@ -305,52 +501,147 @@ async def track_city(request: Request, city: str, user=Depends(verify_token), db
         }
         
     except Exception as e:
-        logger.error(f"Error tracking city: {e}")
+        logger.error("Error tracking city: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/user/tracked-cities")
 @limiter.limit("10/minute")
 async def get_tracked_cities(
     request: Request,
+    response: Response,
     user=Depends(verify_token),
     db=Depends(get_firestore_client)
 ):
     try:
-        logger.info(f"Fetching tracked cities for user {user['email']}")
-        
-        # Get user's preferences document
-        doc = db.collection("user_preferences").document(user["uid"]).get()
+        logger.info("Fetching tracked cities for user %s", user['email'], extra=SAMPLED)
         
-        if not doc.exists:
-            return {"tracked_cities": []}
-            
-        user_data = doc.to_dict()
-        tracked_cities = user_data.get("tracked_cities", [])
+        # User's subscriptions (user_preferences/{uid}/tracked_cities)
+        tracked_cities = await list_tracked_cities(db, user["uid"])
         
-        # For each tracked city, get the AQI data using get_air_quality
+        # Read stored AQI data for all tracked cities at once
+        for tracked_city in tracked_cities:
+            refresh_planner.record_read(tracked_city["city"])
+        histories = await _read_history_many(db, [tc["city"] for tc in tracked_cities])
+        missing = [city for city, history in histories.items() if not history]
+
+        # Cities without stored data are fetched from Open-Meteo in bulk
+        if missing:
+            fresh = await weather_api.get_air_quality_many(missing)
+            await asyncio.gather(*(
+                _save_new_reading(db, city, weather_data) for city, weather_data in fresh.items()
+            ))
+            histories.update({city: [weather_data] for city, weather_data in fresh.items()})
+
         result = []
         for city_data in tracked_cities:
-            city = city_data["city"]
-            try:
-                aqi_data = await get_air_quality(request, city, db)
-                result.append({
-                    **city_data,
-                    "history": aqi_data["history"]
-                })
-            except HTTPException:
-                # If no data found, skip this city
-                logger.warning(f"No AQI data found for tracked city: {city}")
-                result.append({
-                    **city_data,
-                    "history": []
-                })
+            if not histories[city_data["city"]]:
+                logger.warning("No AQI data found for tracked city: %s", city_data['city'])
+            result.append({
+                **city_data,
+                "history": histories[city_data["city"]]
+            })
+
+        # The ETag changes when a city is (un)tracked or any returned reading changes;
+        # no Last-Modified since untracking does not move the newest date
+        etag = make_etag(user["uid"], *(
+            (city_data["city"], city_data.get("added_at"), *(
+                (reading.get("last_update"), reading.get("AQI")) for reading in city_data["history"]
+            ))
+            for city_data in result
+        ))
+        not_modified = conditional_response(request, response, etag, cache_control=PRIVATE_CACHE_CONTROL)
+        if not_modified is not None:
+            return not_modified
             
         return {"tracked_cities": result}
         
     except Exception as e:
-        logger.error(f"Error fetching tracked cities: {e}")
+        logger.error("Error fetching tracked cities: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _tracked_city_names(db, uid: str) -> list:
+    return [tc["city"] for tc in await list_tracked_cities(db, uid)]
+
+def _encode_update(message: dict) -> str:
+    """JSON of a stream message; readings may hold datetimes, hence default=str"""
+    return json.dumps(message, default=str)
+
+async def _latest_readings(db, cities) -> list:
+    """Current reading of every city as update messages (sent first on a new stream)"""
+    histories = await _read_history_many(db, cities)
+    return [{"location": city, "reading": history[0]} for city, history in histories.items() if history]
+
+@router.get("/user/tracked-cities/stream")
+async def stream_tracked_cities(
+    request: Request,
+    user=Depends(verify_token),
+    db=Depends(get_firestore_client)
+):
+    """Server-Sent Events stream of AQI updates for the user's tracked cities"""
+    cities = await _tracked_city_names(db, user["uid"])
+    # Subscribe before reading current data so no update falls in between
+    subscription = aqi_updates.subscribe(cities)
+    try:
+        latest = await _latest_readings(db, cities)
+    except Exception as e:
+        subscription.close()
+        logger.error("Error starting AQI stream: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    logger.info("User %s subscribed to AQI updates for %s cities", user['email'], len(cities), extra=SAMPLED)
+
+    async def events():
+        with subscription:
+            for message in latest:
+                yield f"event: aqi\ndata: {_encode_update(message)}\n\n"
+            while not await request.is_disconnected():
+                message = await subscription.get(timeout=STREAM_HEARTBEAT)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: aqi\ndata: {_encode_update(message)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws/tracked-cities")
+async def tracked_cities_socket(websocket: WebSocket, db=Depends(get_firestore_client)):
+    """WebSocket variant of the tracked-cities stream.
+
+    The client sends {"type": "auth", "token": "<ID token>"} as its first
+    message (within WS_AUTH_TIMEOUT seconds); the token is kept out of the
+    URL so it never reaches access logs.
+    """
+    await websocket.accept()
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), WS_AUTH_TIMEOUT)
+        if not isinstance(message, dict) or message.get("type") != "auth" or not message.get("token"):
+            raise HTTPException(status_code=401, detail="Expected an auth message")
+        # Signature checks (and certificate fetches) must not block the event loop
+        user = await run_in_threadpool(verify_token, f"Bearer {message['token']}")
+    except WebSocketDisconnect:
+        return
+    except (HTTPException, asyncio.TimeoutError, ValueError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    cities = await _tracked_city_names(db, user["uid"])
+    with aqi_updates.subscribe(cities) as subscription:
+        try:
+            for message in await _latest_readings(db, cities):
+                await websocket.send_text(_encode_update({"type": "aqi", **message}))
+            while True:
+                message = await subscription.get(timeout=STREAM_HEARTBEAT)
+                if message is None:
+                    await websocket.send_json({"type": "ping"})
+                else:
+                    await websocket.send_text(_encode_update({"type": "aqi", **message}))
+        except WebSocketDisconnect:
+            logger.info("User %s closed the AQI update socket", user['email'], extra=SAMPLED)
+
 @router.delete("/user/tracked-cities/{city}")
 @limiter.limit("5/minute")
 async def untrack_city(
@@ -360,28 +651,17 @@ async def untrack_city(
     db=Depends(get_firestore_client)
 ):
     try:
-        logger.info(f"User {user['email']} is untracking city {city}")
-        
-        # Reference to user's preferences document
-        user_ref = db.collection("user_preferences").document(user["uid"])
-        
-        # Get current tracked cities
-        doc = user_ref.get()
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="No tracked cities found")
-            
-        tracked_cities = doc.to_dict().get("tracked_cities", [])
-        
-        # Remove the city
-        tracked_cities = [tc for tc in tracked_cities if tc.get("city") != city]
+        logger.info("User %s is untracking city %s", user['email'], city, extra=SAMPLED)
         
-        # Update Firestore
-        user_ref.set({"tracked_cities": tracked_cities}, merge=True)
+        # The subscription and the city's subscriber count are removed atomically
+        if not await remove_tracked_city(db, user["uid"], city):
+            raise HTTPException(status_code=404, detail=f"City {city} is not tracked")
+        refresh_planner.add_tracker(city, -1)
         
         return {"message": f"Stopped tracking {city}"}
         
     except HTTPException as he:
         raise he
     except Exception as e:
-        logger.error(f"Error untracking city: {e}")
+        logger.error("Error untracking city: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,12 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
 from firebase_admin import auth
-from backend.air_quality_service.auth import verify_firebase_token, admin_only
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from backend.air_quality_service.auth import verify_firebase_token, admin_only, token_cache_stats, get_firebase_app
+from backend.air_quality_service.limiter import limiter
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
 
 @router.get("/protected")
 async def protected_route(user_data: dict = Depends(verify_firebase_token)):
@@ -36,12 +34,17 @@ async def get_me(request: Request, response: Response, user=Depends(verify_fireb
             headers={"Cache-Control": "private, no-cache"}
         )
 
+@router.get("/admin/token-cache-stats")
+async def get_token_cache_stats(user=Depends(admin_only)):
+    """Return hit rate of the verified-token cache"""
+    return token_cache_stats()
+
 @router.get("/admin/users")
 async def get_users(user=Depends(admin_only)):  # Use admin_only dependency
     try:
         # Pobieramy użytkowników z Firebase Authentication
         users = []
-        page = auth.list_users()  # Pobierz pierwszą stronę użytkowników
+        page = auth.list_users(app=get_firebase_app())  # Pobierz pierwszą stronę użytkowników
 
         while page:
             for firebase_user in page.users:
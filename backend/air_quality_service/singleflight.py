@@ -0,0 +1,51 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight task.
+
+    The first caller starts the work, later callers await the same task
+    until it finishes; the next call after that starts a fresh one.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def start(self, key, func) -> asyncio.Task:
+        """Return the task running func() for key, starting it if none is in flight"""
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        task = asyncio.ensure_future(func())
+        self._calls[key] = task
+        self.started += 1
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    async def do(self, key, func):
+        """Run func() once for all concurrent callers with the same key and return its result"""
+        # shield: a cancelled caller must not cancel the work the others wait for
+        return await asyncio.shield(self.start(key, func))
+
+    def in_flight(self, key) -> bool:
+        return key in self._calls
+
+    def _finish(self, key, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved when every waiter went away
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Single-flight call %r failed: %s", key, task.exception())
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "started": self.started,
+            "coalesced": self.coalesced
+        }
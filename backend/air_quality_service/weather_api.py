@@ -1,76 +1,274 @@
+import os
+import time
+import asyncio
 import httpx
 import logging
 from datetime import datetime, UTC
+from backend.air_quality_service.cache import normalize_location
+from backend.air_quality_service.metrics import UPSTREAM_REQUESTS, UPSTREAM_REQUEST_DURATION
+from backend.air_quality_service.logging_setup import SAMPLED
 
 logger = logging.getLogger(__name__)
 
+GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+
+# Ustawienia puli połączeń i timeoutów dla Open-Meteo
+WEATHER_API_TIMEOUT = float(os.environ.get("WEATHER_API_TIMEOUT") or 10)
+WEATHER_API_CONNECT_TIMEOUT = float(os.environ.get("WEATHER_API_CONNECT_TIMEOUT") or 5)
+WEATHER_API_MAX_CONNECTIONS = int(os.environ.get("WEATHER_API_MAX_CONNECTIONS") or 20)
+WEATHER_API_MAX_KEEPALIVE = int(os.environ.get("WEATHER_API_MAX_KEEPALIVE") or 10)
+# Liczba lokalizacji w jednym zapytaniu wielolokalizacyjnym
+WEATHER_API_BATCH_SIZE = int(os.environ.get("WEATHER_API_BATCH_SIZE") or 50)
+
+CURRENT_FIELDS = ["european_aqi", "us_aqi", "pm2_5", "pm10"]
+
+class GeocodeCache:
+    """City -> (lat, lon) cache, persisted in a Firestore collection when a client is given.
+
+    db_factory is called for the client on first use instead, so the cache
+    can be built at import time without connecting.
+    """
+
+    def __init__(self, db=None, collection: str = "geocode_cache", db_factory=None):
+        self.db = db
+        self.db_factory = db_factory
+        self.collection = collection
+        self._coordinates = {}
+
+    async def _client(self):
+        if self.db is None and self.db_factory is not None:
+            # Creating the client is blocking; keep it off the event loop
+            self.db = await asyncio.to_thread(self.db_factory)
+        return self.db
+
+    async def get(self, city: str):
+        key = normalize_location(city)
+        if key in self._coordinates:
+            return self._coordinates[key]
+        db = await self._client()
+        if db is None:
+            return None
+
+        try:
+            doc = await db.collection(self.collection).document(key).get()
+        except Exception as e:
+            logger.warning("Failed to read cached coordinates for %s: %s", city, e)
+            return None
+
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        coordinates = (data["latitude"], data["longitude"])
+        self._coordinates[key] = coordinates
+        return coordinates
+
+    async def set(self, city: str, lat: float, lon: float):
+        key = normalize_location(city)
+        self._coordinates[key] = (lat, lon)
+        db = await self._client()
+        if db is None:
+            return
+
+        try:
+            await db.collection(self.collection).document(key).set({
+                "name": city,
+                "latitude": lat,
+                "longitude": lon
+            })
+        except Exception as e:
+            logger.warning("Failed to persist coordinates for %s: %s", city, e)
+
 class WeatherAPI:
-    def __init__(self):
+    def __init__(self, geocode_cache: GeocodeCache = None, transport: httpx.AsyncBaseTransport = None):
         self.base_url = "https://air-quality-api.open-meteo.com/v1"
-    
+        self.geocode_cache = geocode_cache or GeocodeCache()
+        self._transport = transport
+        self._client = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(WEATHER_API_TIMEOUT, connect=WEATHER_API_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=WEATHER_API_MAX_CONNECTIONS,
+                max_keepalive_connections=WEATHER_API_MAX_KEEPALIVE
+            ),
+            transport=self._transport
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared pooled client; created lazily if start() was not called"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def start(self):
+        """Open the pooled HTTP client (called during startup warm-up)"""
+        # Building the SSL context takes ~100 ms; keep it off the event loop
+        await asyncio.to_thread(lambda: self.client)
+        logger.info("WeatherAPI HTTP client started")
+
+    async def close(self):
+        """Close the pooled HTTP client (called on application shutdown)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("WeatherAPI HTTP client closed")
+        self._client = None
+
+    async def _get(self, endpoint: str, url: str, params: dict) -> httpx.Response:
+        """GET on the pooled client, timed and counted per endpoint (geocode / air_quality)"""
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(url, params=params)
+        except Exception as e:
+            UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=type(e).__name__)
+            raise
+        finally:
+            UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint)
+        UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+        return response
+
+    async def get_coordinates(self, city: str):
+        """Return (lat, lon) for a city, geocoding it only on a cache miss"""
+        coordinates = await self.geocode_cache.get(city)
+        if coordinates is not None:
+            return coordinates
+
+        logger.debug("Fetching coordinates for %s", city)
+        geo_response = await self._get(
+            "geocode",
+            GEOCODING_URL,
+            params={
+                "name": city,
+                "count": 1,
+                "language": "en",
+                "format": "json"
+            }
+        )
+        geo_data = geo_response.json()
+
+        if not geo_data.get("results"):
+            logger.error("City not found: %s", city)
+            return None
+
+        lat = geo_data["results"][0]["latitude"]
+        lon = geo_data["results"][0]["longitude"]
+
+        logger.info("Found coordinates for %s: lat=%s, lon=%s", city, lat, lon, extra=SAMPLED)
+        await self.geocode_cache.set(city, lat, lon)
+        return lat, lon
+
     async def get_air_quality(self, city: str) -> dict:
         """Fetch air quality data for a city using Open-Meteo"""
         try:
-            # First get coordinates for the city using Open-Meteo Geocoding API
-            async with httpx.AsyncClient() as client:
-                logger.info(f"Fetching coordinates for {city}")
-                geo_response = await client.get(
-                    "https://geocoding-api.open-meteo.com/v1/search",
-                    params={
-                        "name": city,
-                        "count": 1,
-                        "language": "en",
-                        "format": "json"
-                    }
-                )
-                geo_data = geo_response.json()
-                
-                if not geo_data.get("results"):
-                    logger.error(f"City not found: {city}")
-                    return None
-                
-                lat = geo_data["results"][0]["latitude"]
-                lon = geo_data["results"][0]["longitude"]
-                
-                logger.info(f"Found coordinates for {city}: lat={lat}, lon={lon}")
-                
-                # Then get air quality data
-                aqi_response = await client.get(
-                    f"{self.base_url}/air-quality",
-                    params={
-                        "latitude": lat,
-                        "longitude": lon,
-                        "current": ["european_aqi", "us_aqi", "pm2_5", "pm10"],
-                        "domains": "cams_europe"
-                    }
-                )
-                
-                if not aqi_response.is_success:
-                    logger.error(f"Failed to fetch AQI data: {aqi_response.text}")
-                    return None
-                
-                aqi_data = aqi_response.json()
-                
-                # Get both European and US AQI
-                eu_aqi = aqi_data["current"]["european_aqi"]
-                us_aqi = aqi_data["current"]["us_aqi"]
-                pm2_5 = aqi_data["current"]["pm2_5"]
-                pm10 = aqi_data["current"]["pm10"]
-                
-                return {
-                    "AQI": us_aqi,  # Using US AQI directly instead of conversion
-                    "last_update": datetime.now(UTC).isoformat(),
-                    "source": "Open-Meteo",
-                    "raw_data": {
-                        "european_aqi": eu_aqi,
-                        "us_aqi": us_aqi,
-                        "pm2_5": pm2_5,
-                        "pm10": pm10,
-                        "latitude": lat,
-                        "longitude": lon
-                    }
+            # First get coordinates for the city (cached after the first lookup)
+            coordinates = await self.get_coordinates(city)
+            if coordinates is None:
+                return None
+            lat, lon = coordinates
+
+            # Then get air quality data
+            aqi_response = await self._get(
+                "air_quality",
+                f"{self.base_url}/air-quality",
+                params={
+                    "latitude": lat,
+                    "longitude": lon,
+                    "current": CURRENT_FIELDS,
+                    "domains": "cams_europe"
+                }
+            )
+
+            if not aqi_response.is_success:
+                logger.error("Failed to fetch AQI data: %s", aqi_response.text)
+                return None
+
+            return self._build_reading(aqi_response.json()["current"], lat, lon)
+
+        except Exception as e:
+            logger.error("Error fetching air quality data: %s", e)
+            return None
+
+    async def get_air_quality_many(self, cities) -> dict:
+        """Fetch air quality data for many cities in chunked multi-location requests.
+
+        Returns a dict city -> reading; cities that could not be geocoded or
+        fetched are left out. At most WEATHER_API_MAX_CONNECTIONS cities are
+        geocoded at once, so a cold cache does not queue every lookup on the pool.
+        """
+        cities = list(dict.fromkeys(cities))
+        semaphore = asyncio.Semaphore(WEATHER_API_MAX_CONNECTIONS)
+
+        async def locate(city):
+            async with semaphore:
+                return await self._get_coordinates_or_none(city)
+
+        coordinates = await asyncio.gather(*(locate(city) for city in cities))
+        located = [(city, coords) for city, coords in zip(cities, coordinates) if coords is not None]
+
+        chunks = [located[i:i + WEATHER_API_BATCH_SIZE] for i in range(0, len(located), WEATHER_API_BATCH_SIZE)]
+        results = {}
+        for chunk_result in await asyncio.gather(*(self._fetch_chunk(chunk) for chunk in chunks)):
+            results.update(chunk_result)
+
+        logger.info("Fetched AQI for %s/%s cities in %s requests", len(results), len(cities), len(chunks))
+        return results
+
+    async def _get_coordinates_or_none(self, city: str):
+        try:
+            return await self.get_coordinates(city)
+        except Exception as e:
+            logger.error("Error fetching coordinates for %s: %s", city, e)
+            return None
+
+    async def _fetch_chunk(self, chunk) -> dict:
+        """Fetch current AQI for a list of (city, (lat, lon)) in a single request"""
+        try:
+            aqi_response = await self._get(
+                "air_quality",
+                f"{self.base_url}/air-quality",
+                params={
+                    "latitude": ",".join(str(lat) for _, (lat, _lon) in chunk),
+                    "longitude": ",".join(str(lon) for _, (_lat, lon) in chunk),
+                    "current": CURRENT_FIELDS,
+                    "domains": "cams_europe"
                 }
-                
+            )
+
+            if not aqi_response.is_success:
+                logger.error("Failed to fetch AQI data: %s", aqi_response.text)
+                return {}
+
+            # Open-Meteo returns a list for several locations and an object for one
+            payload = aqi_response.json()
+            if isinstance(payload, dict):
+                payload = [payload]
+
+            return {
+                city: self._build_reading(item["current"], lat, lon)
+                for (city, (lat, lon)), item in zip(chunk, payload)
+            }
+
         except Exception as e:
-            logger.error(f"Error fetching air quality data: {e}")
-            return None
\ No newline at end of file
+            logger.error("Error fetching air quality data for %s cities: %s", len(chunk), e)
+            return {}
+
+    @staticmethod
+    def _build_reading(current: dict, lat: float, lon: float) -> dict:
+        # Get both European and US AQI
+        eu_aqi = current["european_aqi"]
+        us_aqi = current["us_aqi"]
+
+        return {
+            "AQI": us_aqi,  # Using US AQI directly instead of conversion
+            "last_update": datetime.now(UTC).isoformat(),
+            "source": "Open-Meteo",
+            "raw_data": {
+                "european_aqi": eu_aqi,
+                "us_aqi": us_aqi,
+                "pm2_5": current["pm2_5"],
+                "pm10": current["pm10"],
+                "latitude": lat,
+                "longitude": lon
+            }
+        }
@@ -0,0 +1,373 @@
+import copy
+import uuid
+import asyncio
+from types import SimpleNamespace
+from collections import Counter
+from datetime import datetime, UTC
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import transforms
+
+# Firestore w pamięci dla benchmarków i testów: podzbiór API AsyncClient używany
+# przez serwis (dokumenty, kolekcje, proste zapytania, batche, transakcje).
+# Każda operacja jest liczona w `ops` (round-tripy oraz odczytane/zapisane
+# dokumenty w "read"/"write"), a `latency` symuluje czas odpowiedzi.
+
+def _apply(current: dict, data: dict) -> dict:
+    """Apply field transforms (Increment, ArrayUnion, DELETE_FIELD...) to a document"""
+    result = dict(current)
+    for key, value in data.items():
+        if value is transforms.DELETE_FIELD:
+            result.pop(key, None)
+        elif isinstance(value, transforms.Increment):
+            result[key] = result.get(key, 0) + value.value
+        elif isinstance(value, transforms.ArrayUnion):
+            existing = list(result.get(key, []))
+            existing.extend(v for v in value.values if v not in existing)
+            result[key] = existing
+        elif isinstance(value, transforms.ArrayRemove):
+            result[key] = [v for v in result.get(key, []) if v not in value.values]
+        elif value is transforms.SERVER_TIMESTAMP:
+            result[key] = datetime.now(UTC)
+        else:
+            result[key] = copy.deepcopy(value)
+    return result
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+class FakeDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self._path = path
+
+    @property
+    def id(self):
+        return self._path[-1]
+
+    @property
+    def path(self):
+        return "/".join(self._path)
+
+    @property
+    def parent(self):
+        return FakeCollectionReference(self._client, self._path[:-1])
+
+    def collection(self, name):
+        return FakeCollectionReference(self._client, self._path + (name,))
+
+    def __eq__(self, other):
+        return isinstance(other, FakeDocumentReference) and other._path == self._path
+
+    def __hash__(self):
+        return hash(self._path)
+
+    async def get(self, field_paths=None, transaction=None, **kwargs):
+        await self._client._delay()
+        self._client.ops["get"] += 1
+        return FakeSnapshot(self, copy.deepcopy(self._client._docs.get(self._path)))
+
+    async def set(self, data, merge=False):
+        await self._client._delay()
+        self._client.ops["set"] += 1
+        self._client._write(self._path, data, merge)
+
+    async def update(self, data):
+        await self._client._delay()
+        self._client.ops["update"] += 1
+        self._client._update(self._path, data)
+
+    async def create(self, data):
+        await self._client._delay()
+        self._client.ops["create"] += 1
+        self._client._create(self._path, data)
+
+    async def delete(self, option=None):
+        await self._client._delay()
+        self._client.ops["delete"] += 1
+        self._client._check_exists(self._path, option)
+        self._client._docs.pop(self._path, None)
+
+class FakeQuery:
+    def __init__(self, client, path, orders=(), filters=(), limit=None, start_after=None):
+        self._client = client
+        self._path = path
+        self._orders = orders
+        self._filters = filters
+        self._limit = limit
+        self._start_after = start_after
+
+    def _copy(self, **kwargs):
+        params = dict(orders=self._orders, filters=self._filters, limit=self._limit, start_after=self._start_after)
+        params.update(kwargs)
+        return FakeQuery(self._client, self._path, **params)
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def where(self, field=None, op=None, value=None, filter=None):
+        if filter is not None:
+            field, op, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields):
+        return self._copy(start_after=document_fields)
+
+    def _sort_key(self, field, ref, data):
+        if field == "__name__":
+            return (1, ref.id)
+        value = data.get(field)
+        return (0, 0) if value is None else (1, value)
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            current = data.get(field)
+            if current is None:
+                return False
+            if op == "==" and not current == value:
+                return False
+            if op == ">" and not current > value:
+                return False
+            if op == ">=" and not current >= value:
+                return False
+            if op == "<" and not current < value:
+                return False
+            if op == "<=" and not current <= value:
+                return False
+            if op == "in" and current not in value:
+                return False
+            if op == "array_contains" and value not in current:
+                return False
+        return True
+
+    def _in_scope(self, path):
+        return len(path) == len(self._path) + 1 and path[:-1] == self._path
+
+    def _results(self):
+        rows = [
+            (FakeDocumentReference(self._client, path), data)
+            for path, data in self._client._docs.items()
+            if self._in_scope(path) and self._matches(data)
+        ]
+        orders = self._orders or (("__name__", "ASCENDING"),)
+        if all(field != "__name__" for field, _ in orders):
+            orders = orders + (("__name__", "ASCENDING"),)
+        for field, direction in reversed(orders):
+            rows = [row for row in rows if field == "__name__" or field in row[1]]
+            rows.sort(
+                key=lambda row: self._sort_key(field, row[0], row[1]),
+                reverse=str(direction).upper().endswith("DESCENDING")
+            )
+        if self._start_after is not None:
+            cursor = self._start_after
+            if isinstance(cursor, FakeSnapshot):
+                ids = [ref.id for ref, _ in rows]
+                rows = rows[ids.index(cursor.id) + 1:] if cursor.id in ids else rows
+            else:
+                field, direction = orders[0]
+                value = (1, cursor.get(field))
+                descending = str(direction).upper().endswith("DESCENDING")
+                rows = [
+                    row for row in rows
+                    if (self._sort_key(field, row[0], row[1]) < value if descending
+                        else self._sort_key(field, row[0], row[1]) > value)
+                ]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return [FakeSnapshot(ref, copy.deepcopy(data)) for ref, data in rows]
+
+    async def stream(self, transaction=None, **kwargs):
+        await self._client._delay()
+        self._client.ops["query"] += 1
+        for snapshot in self._results():
+            self._client.ops["read"] += 1
+            yield snapshot
+
+    async def get(self, transaction=None, **kwargs):
+        return [snapshot async for snapshot in self.stream()]
+
+class FakeCollectionGroup(FakeQuery):
+    """Every collection named like the group, wherever it is nested"""
+
+    def _in_scope(self, path):
+        return len(path) % 2 == 0 and path[-2] == self._path[-1]
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+
+    @property
+    def id(self):
+        return self._path[-1]
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self._client, self._path + (document_id or uuid.uuid4().hex[:20],))
+
+    async def add(self, data):
+        ref = self.document()
+        await ref.set(data)
+        return None, ref
+
+    def list_documents(self):
+        return self._list_documents()
+
+    async def _list_documents(self):
+        for snapshot in self._results():
+            yield snapshot.reference
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(("set", reference, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(("update", reference, data, False))
+
+    def create(self, reference, data):
+        self._writes.append(("create", reference, data, False))
+
+    def delete(self, reference, option=None):
+        self._writes.append(("delete", reference, option, False))
+
+    def _apply_writes(self):
+        if len(self._writes) > 500:
+            raise ValueError("A batch can contain at most 500 writes")
+        # Preconditions are checked first: a failing commit writes nothing
+        for op, reference, data, merge in self._writes:
+            if op == "create" and reference._path in self._client._docs:
+                raise AlreadyExists(f"Document already exists: {reference.path}")
+            if op == "update" and reference._path not in self._client._docs:
+                raise NotFound(f"No document to update: {reference.path}")
+            if op == "delete":
+                self._client._check_exists(reference._path, data)
+        for op, reference, data, merge in self._writes:
+            if op == "set":
+                self._client._write(reference._path, data, merge)
+            elif op == "update":
+                self._client._update(reference._path, data)
+            elif op == "create":
+                self._client._create(reference._path, data)
+            else:
+                self._client._docs.pop(reference._path, None)
+        self._client.ops["write"] += len(self._writes)
+        self._writes = []
+
+    async def commit(self):
+        await self._client._delay()
+        self._client.ops["commit"] += 1
+        self._apply_writes()
+
+class FakeTransaction(FakeWriteBatch):
+    """Duck-types AsyncTransaction closely enough for @firestore.async_transactional"""
+
+    def __init__(self, client, max_attempts=5, read_only=False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+
+    @property
+    def in_progress(self):
+        return self._id is not None
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    async def _begin(self, retry_id=None):
+        self._id = uuid.uuid4().bytes
+
+    async def _commit(self):
+        await self._client._delay()
+        self._client.ops["commit"] += 1
+        self._apply_writes()
+        self._clean_up()
+        return []
+
+    async def _rollback(self):
+        self._clean_up()
+
+    async def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, FakeDocumentReference):
+            return await ref_or_query.get()
+        return ref_or_query.stream()
+
+class FakeAsyncClient:
+    """In-memory AsyncClient; `latency` (seconds) is added to every round-trip"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.ops = Counter()
+        self._docs = {}
+
+    async def _delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _write(self, path, data, merge):
+        current = self._docs.get(path, {}) if merge else {}
+        self._docs[path] = _apply(current, data)
+
+    def _update(self, path, data):
+        if path not in self._docs:
+            raise NotFound(f"No document to update: {'/'.join(path)}")
+        self._docs[path] = _apply(self._docs[path], data)
+
+    def _create(self, path, data):
+        if path in self._docs:
+            raise AlreadyExists(f"Document already exists: {'/'.join(path)}")
+        self._docs[path] = _apply({}, data)
+
+    def _check_exists(self, path, option):
+        if getattr(option, "exists", None) and path not in self._docs:
+            raise NotFound(f"No document to delete: {'/'.join(path)}")
+
+    def collection(self, name):
+        return FakeCollectionReference(self, (name,))
+
+    def collection_group(self, name):
+        return FakeCollectionGroup(self, (name,))
+
+    @staticmethod
+    def write_option(**kwargs):
+        return SimpleNamespace(**kwargs)
+
+    def document(self, path):
+        return FakeDocumentReference(self, tuple(path.split("/")))
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return FakeTransaction(self, **kwargs)
+
+    async def get_all(self, references, field_paths=None, transaction=None, **kwargs):
+        await self._delay()
+        self.ops["get_all"] += 1
+        for reference in references:
+            self.ops["read"] += 1
+            yield FakeSnapshot(reference, copy.deepcopy(self._docs.get(reference._path)))
+
+    def close(self):
+        pass
@@ -0,0 +1,44 @@
+import asyncio
+import zlib
+import httpx
+from collections import Counter
+
+# Atrapa Open-Meteo (geokodowanie i air-quality) jako transport httpx:
+# każde zapytanie czeka `latency` sekund, a liczniki pozwalają policzyć
+# zapytania do API zewnętrznego na żądanie do serwisu.
+
+class FakeOpenMeteo:
+    """Deterministic Open-Meteo responses; pass .transport to WeatherAPI"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = Counter()
+        self.transport = httpx.MockTransport(self.handle)
+
+    @staticmethod
+    def coordinates(city: str):
+        digest = zlib.crc32(city.encode())
+        return round(40 + digest % 2000 / 100, 4), round(digest // 2000 % 3000 / 100, 4)
+
+    @staticmethod
+    def current(lat: float) -> dict:
+        us_aqi = 20 + int(lat * 100) % 130
+        return {"european_aqi": us_aqi // 2, "us_aqi": us_aqi, "pm2_5": us_aqi / 4, "pm10": us_aqi / 2}
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if request.url.host.startswith("geocoding"):
+            self.requests["geocode"] += 1
+            lat, lon = self.coordinates(request.url.params["name"])
+            return httpx.Response(200, json={"results": [{"latitude": lat, "longitude": lon}]})
+
+        self.requests["air_quality"] += 1
+        latitudes = request.url.params["latitude"].split(",")
+        longitudes = request.url.params["longitude"].split(",")
+        items = [
+            {"latitude": float(lat), "longitude": float(lon), "current": self.current(float(lat))}
+            for lat, lon in zip(latitudes, longitudes)
+        ]
+        return httpx.Response(200, json=items if len(items) > 1 else items[0])
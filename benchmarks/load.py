@@ -0,0 +1,328 @@
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+import argparse
+import subprocess
+from collections import Counter
+from datetime import datetime, timedelta, UTC
+import httpx
+from benchmarks.fake_firestore import FakeAsyncClient
+from benchmarks.fake_open_meteo import FakeOpenMeteo
+
+# Benchmark obciążeniowy bez sieci i kluczy: aplikacja działa w procesie
+# (httpx.ASGITransport), Firestore i Open-Meteo są zastąpione atrapami
+# z konfigurowalnym opóźnieniem. Wyniki (percentyle, przepustowość, operacje
+# Firestore na żądanie) trafiają do JSON-a, który można porównać z --baseline.
+#
+#   python -m benchmarks.load --output bench.json
+#   python -m benchmarks.load --baseline bench.json
+
+SCENARIOS = ["read", "track", "prediction", "refresh"]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test of the air quality service")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at once")
+    parser.add_argument("--cities", type=int, default=200, help="Cities with stored readings")
+    parser.add_argument("--users", type=int, default=50, help="Users tracking cities")
+    parser.add_argument("--miss-ratio", type=float, default=0.05, help="Share of reads for cities not stored yet")
+    parser.add_argument("--refresh-ticks", type=int, default=5, help="Maximum scheduler ticks in the refresh scenario")
+    parser.add_argument("--firestore-latency", type=float, default=0.002, help="Seconds per Firestore round-trip")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds per Open-Meteo request")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the per-route rate limits enabled")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    return parser.parse_args(argv)
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return values[max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))]
+
+def latency_summary(latencies: list) -> dict:
+    values = sorted(latency * 1000 for latency in latencies)
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3),
+        "max": round(values[-1], 3)
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Harness:
+    """The app wired to the fakes, with seeded cities and users"""
+
+    def __init__(self, args):
+        from backend.air_quality_service.main import app
+        from backend.air_quality_service import database, auth
+        from backend.air_quality_service.routes import air_quality as routes
+        from backend.air_quality_service.limiter import limiter
+
+        logging.getLogger().setLevel(args.log_level)
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.firestore = FakeAsyncClient(latency=args.firestore_latency)
+        self.open_meteo = FakeOpenMeteo(latency=args.upstream_latency)
+        self.routes = routes
+        self.auth = auth
+
+        # Every get_firestore_client() caller (routes, lease, geocode cache) gets the fake
+        database.db = self.firestore
+        routes.weather_api._transport = self.open_meteo.transport
+        routes.weather_api._client = None
+        limiter.enabled = args.rate_limit
+
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+        self.cities = [f"City-{i:04d}" for i in range(args.cities)]
+        self.stale_cities = [f"Stale-City-{i:04d}" for i in range(args.cities)]
+        # Popular cities are read much more often (Zipf-like)
+        self.weights = [1 / (rank + 1) for rank in range(len(self.cities))]
+        self.tokens = [self._login(i) for i in range(args.users)]
+        self._new_cities = 0
+
+    def _login(self, number: int) -> str:
+        """Token whose claims are already in the verified-token cache (no Firebase call)"""
+        token = f"benchmark-token-{number}"
+        self.auth._token_cache[self.auth._token_key(token)] = {
+            "uid": f"benchmark-user-{number}",
+            "email": f"user{number}@benchmark.local",
+            "role": "user",
+            "exp": time.time() + 24 * 3600
+        }
+        return token
+
+    def _readings(self, city: str, newest: datetime) -> list:
+        from backend.air_quality_service.database import HISTORY_SIZE
+
+        lat, lon = self.open_meteo.coordinates(city)
+        current = self.open_meteo.current(lat)
+        return [
+            {
+                "AQI": current["us_aqi"] + self.random.randint(-10, 10),
+                "last_update": (newest - timedelta(hours=hour)).isoformat(),
+                "source": "Open-Meteo",
+                "raw_data": {**current, "latitude": lat, "longitude": lon}
+            }
+            for hour in range(HISTORY_SIZE)
+        ]
+
+    async def seed(self):
+        from backend.air_quality_service.database import ingest_readings, add_tracked_city
+        from backend.air_quality_service.forecasting import build_forecast
+        from backend.air_quality_service.models import TrackedCity
+
+        now = datetime.now(UTC)
+        readings = {city: self._readings(city, now - timedelta(minutes=5)) for city in self.cities}
+        readings.update({city: self._readings(city, now - timedelta(days=2)) for city in self.stale_cities})
+        await ingest_readings(self.firestore, readings, forecaster=build_forecast)
+
+        # Stale cities are tracked, so the scheduler refreshes them
+        for number, city in enumerate(self.stale_cities):
+            uid = f"benchmark-user-{number % self.args.users}"
+            await add_tracked_city(self.firestore, uid, city, TrackedCity(city=city).model_dump())
+
+        # Coordinates are known, as they would be for cities already stored
+        for city in self.cities + self.stale_cities:
+            await self.routes.weather_api.geocode_cache.set(city, *self.open_meteo.coordinates(city))
+
+    def _headers(self, token: str = None) -> dict:
+        token = token or self.random.choice(self.tokens)
+        return {"Authorization": f"Bearer {token}"}
+
+    def _popular_city(self) -> str:
+        return self.random.choices(self.cities, self.weights)[0]
+
+    def read_request(self):
+        if self.random.random() < self.args.miss_ratio:
+            self._new_cities += 1
+            return "GET", f"/air-quality/New-City-{self._new_cities}", {}
+        return "GET", f"/air-quality/{self._popular_city()}", {}
+
+    def track_request(self):
+        if self.random.random() < 0.5:
+            return "POST", f"/user/tracked-cities/{self._popular_city()}", self._headers()
+        return "GET", "/user/tracked-cities", self._headers()
+
+    def prediction_request(self):
+        return "GET", f"/prediction/{self._popular_city()}", self._headers()
+
+    def _counters(self) -> tuple:
+        return Counter(self.firestore.ops), Counter(self.open_meteo.requests)
+
+    def _usage(self, before: tuple, units: int) -> dict:
+        ops = Counter(self.firestore.ops) - before[0]
+        upstream = Counter(self.open_meteo.requests) - before[1]
+        round_trips = sum(count for op, count in ops.items() if op not in ("read", "write"))
+        per_unit = lambda count: round(count / units, 3) if units else None
+        return {
+            "firestore": {
+                "ops_per_request": per_unit(round_trips),
+                "documents_read_per_request": per_unit(ops["read"] + ops["get"]),
+                "documents_written_per_request": per_unit(ops["write"] + ops["set"] + ops["update"] + ops["create"]),
+                "ops": dict(ops)
+            },
+            "upstream": {"requests_per_request": per_unit(sum(upstream.values())), "requests": dict(upstream)}
+        }
+
+    async def run_http(self, make_request) -> dict:
+        """Send --requests requests from --concurrency workers"""
+        requests = iter([make_request() for _ in range(self.args.requests)])
+        latencies = []
+        statuses = Counter()
+
+        async def worker():
+            for method, url, headers in requests:
+                started = time.perf_counter()
+                try:
+                    response = await self.client.request(method, url, headers=headers)
+                    statuses[str(response.status_code)] += 1
+                except Exception as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+        before = self._counters()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        duration = time.perf_counter() - started
+        await self._settle()
+
+        return {
+            "requests": len(latencies),
+            "concurrency": self.args.concurrency,
+            "duration_seconds": round(duration, 3),
+            "throughput_rps": round(len(latencies) / duration, 1),
+            "latency_ms": latency_summary(latencies),
+            "status_codes": dict(statuses),
+            "errors": sum(count for status, count in statuses.items() if not status.startswith(("2", "3"))),
+            **self._usage(before, len(latencies))
+        }
+
+    async def run_refresh(self) -> dict:
+        """Scheduler ticks over the stale cities; latency is per tick, usage per refreshed city"""
+        from backend.air_quality_service.refresh_planner import refresh_planner
+
+        await self.routes.scheduler_leader.campaign()
+        await refresh_planner.reload(self.firestore)
+
+        latencies = []
+        refreshed = failed = 0
+        before = self._counters()
+        started = time.perf_counter()
+        for _ in range(self.args.refresh_ticks):
+            tick_started = time.perf_counter()
+            summary = await self.routes.refresh_due_cities()
+            if not summary or not summary["total"]:
+                break
+            latencies.append(time.perf_counter() - tick_started)
+            refreshed += summary["succeeded"]
+            failed += len(summary["failed"])
+        duration = time.perf_counter() - started
+
+        return {
+            "ticks": len(latencies),
+            "cities_refreshed": refreshed,
+            "cities_failed": failed,
+            "duration_seconds": round(duration, 3),
+            "throughput_cities_per_second": round(refreshed / duration, 1) if duration else None,
+            "latency_ms": latency_summary(latencies),
+            **self._usage(before, refreshed)
+        }
+
+    async def _settle(self):
+        """Wait for background refreshes started by the requests"""
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if pending:
+            await asyncio.wait(pending, timeout=10)
+
+    async def run(self, scenarios: list) -> dict:
+        await self.seed()
+        results = {}
+        for scenario in scenarios:
+            # Every scenario starts with a cold read cache
+            self.routes.air_quality_cache.clear()
+            if scenario == "refresh":
+                results[scenario] = await self.run_refresh()
+            else:
+                results[scenario] = await self.run_http(getattr(self, f"{scenario}_request"))
+            print(f"  {scenario}: {summary_line(results[scenario])}")
+        await self.client.aclose()
+        await self.routes.weather_api.close()
+        return results
+
+def summary_line(result: dict) -> str:
+    latency = result["latency_ms"] or {}
+    throughput = result.get("throughput_rps", result.get("throughput_cities_per_second"))
+    return (
+        f"p50={latency.get('p50')}ms p95={latency.get('p95')}ms p99={latency.get('p99')}ms "
+        f"throughput={throughput}/s firestore_ops/req={result['firestore']['ops_per_request']}"
+    )
+
+COMPARED_METRICS = [
+    ("latency_ms", "p50"), ("latency_ms", "p95"), ("latency_ms", "p99"),
+    ("throughput_rps", None), ("throughput_cities_per_second", None), ("firestore", "ops_per_request")
+]
+
+def compare(baseline: dict, results: dict) -> list:
+    """(scenario, metric, baseline, current, change %) for every metric present in both runs"""
+    rows = []
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        for section, key in COMPARED_METRICS:
+            old = previous.get(section)
+            new = current.get(section)
+            if key is not None:
+                old = (old or {}).get(key)
+                new = (new or {}).get(key)
+            if old is None or new is None:
+                continue
+            change = round((new - old) / old * 100, 1) if old else None
+            rows.append((scenario, key or section, old, new, change))
+    return rows
+
+def main(args):
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    print(f"🔥 Benchmarking {', '.join(scenarios)}: {args.requests} requests x {args.concurrency} concurrent, "
+          f"Firestore {args.firestore_latency * 1000:.1f} ms, Open-Meteo {args.upstream_latency * 1000:.1f} ms\n")
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now(UTC).isoformat(),
+        "python": sys.version.split()[0],
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "scenarios": asyncio.run(Harness(args).run(scenarios))
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline} (commit {baseline.get('commit')}):")
+        for scenario, metric, old, new, change in compare(baseline, results):
+            print(f"  {scenario:<11} {metric:<28} {old:>10} -> {new:<10} ({'n/a' if change is None else f'{change:+.1f}%'})")
+    return results
+
+if __name__ == "__main__":
+    main(parse_args())
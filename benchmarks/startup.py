@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import httpx
+
+# Pomiar zimnego startu serwisu: czas importu aplikacji, czas do pierwszej
+# odpowiedzi uvicorna i czas do gotowości (/ready = 200). Rozgrzewka tworzy
+# klientów z plików kluczy (FIRESTORE_/FIREBASE_CREDENTIALS_PATH), ale nie
+# łączy się z Google, więc wystarczą dowolne poprawne klucze kont serwisowych.
+
+APP = "backend.air_quality_service.main:app"
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); "
+    "import backend.air_quality_service.main; "
+    "print(time.perf_counter() - started)"
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure air quality service startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for readiness")
+    parser.add_argument("--budget", type=float, default=1.0, help="Target seconds until ready (median)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_import() -> float:
+    result = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def measure_server(timeout: float) -> dict:
+    """Start uvicorn and poll /ready; times are seconds since the process was spawned"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", APP, "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    first_response = ready = warmup = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while time.perf_counter() - started < timeout and server.poll() is None:
+                try:
+                    response = client.get("/ready")
+                except httpx.TransportError:
+                    time.sleep(0.01)
+                    continue
+                if first_response is None:
+                    first_response = time.perf_counter() - started
+                if response.status_code == 200:
+                    ready = time.perf_counter() - started
+                    warmup = response.json().get("warmup_seconds")
+                    break
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+    return {"first_response_seconds": first_response, "ready_seconds": ready, "warmup_seconds": warmup}
+
+def summarize(values: list) -> dict:
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return {
+        "median": round(statistics.median(values), 3),
+        "min": round(min(values), 3),
+        "max": round(max(values), 3)
+    }
+
+def main(args):
+    print(f"🔥 Measuring {args.runs} cold starts of {APP}\n")
+    runs = []
+    for run in range(args.runs):
+        result = {"import_seconds": measure_import(), **measure_server(args.timeout)}
+        runs.append(result)
+        print(f"  run {run + 1}: " + ", ".join(
+            f"{name}={value:.3f}" if value is not None else f"{name}=-" for name, value in result.items()
+        ))
+
+    results = {
+        "runs": runs,
+        "summary": {name: summarize([run[name] for run in runs]) for name in runs[0]},
+        "budget_seconds": args.budget,
+        "python": sys.version.split()[0]
+    }
+    ready = results["summary"]["ready_seconds"]
+    results["within_budget"] = ready is not None and ready["median"] <= args.budget
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print("\n" + json.dumps(results["summary"], indent=2))
+    if ready is None:
+        print("❌ The service never became ready (check the credential files)")
+    else:
+        print(f"{'✅' if results['within_budget'] else '❌'} Ready in {ready['median']:.3f}s (budget {args.budget:.1f}s)")
+    return 0 if results["within_budget"] else 1
+
+if __name__ == "__main__":
+    os.environ.setdefault("PYTHONPATH", os.getcwd())
+    sys.exit(main(parse_args()))
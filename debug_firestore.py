@@ -24,6 +24,7 @@ def check_firestore():
         city_data = doc.to_dict()
         print(f"   ├── Name: {city_data.get('name', 'Not set')}")
         print(f"   ├── Last Update: {city_data.get('last_update', 'Not set')}")
+        print(f"   ├── 🔸 {len(city_data.get('readings', []))} latest AQI readings (ring buffer)")
 
         # Check history subcollection
         history_ref = (db.collection("air_quality")
@@ -33,7 +34,7 @@ def check_firestore():
                       .stream())
         
         history_docs = list(history_ref)
-        print(f"   └── 🔹 {len(history_docs)} historical AQI records:")
+        print(f"   └── 🔹 {len(history_docs)} archived AQI records:")
         
         for hist_doc in history_docs:
             data = hist_doc.to_dict()
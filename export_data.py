@@ -0,0 +1,55 @@
+import os
+import asyncio
+import argparse
+from backend.air_quality_service.database import get_firestore_client
+from backend.air_quality_service.export import export_pages, encode_export, EXPORT_FORMATS, EXPORT_PAGE_SIZE
+
+# Eksport wszystkich miast i ich odczytów do pliku NDJSON/CSV/Parquet.
+# Po każdej stronie (miast albo archiwum miasta) zapisywany jest kursor
+# (<plik>.cursor), więc przerwany eksport NDJSON/CSV można wznowić z --resume
+# bez powtarzania wierszy. Wyjątek: przerwanie między zapisem strony a zapisem
+# kursora powtórzy tę jedną stronę.
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export air quality data")
+    parser.add_argument("output", help="Output file")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--archive", action="store_true", help="Export the full history subcollections")
+    parser.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE, help="Cities per query")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted export")
+    args = parser.parse_args()
+    if args.resume and args.format == "parquet":
+        parser.error("--resume is not supported for parquet (the file footer is written at the end)")
+    return args
+
+def save_cursor(path: str, token: str):
+    with open(f"{path}.tmp", "w") as f:
+        f.write(token)
+    os.replace(f"{path}.tmp", path)
+
+async def main(args):
+    cursor_path = f"{args.output}.cursor"
+    cursor = None
+    if args.resume and os.path.exists(cursor_path):
+        with open(cursor_path) as f:
+            cursor = f.read().strip() or None
+
+    print(f"🔥 Exporting air quality data to {args.output} ({args.format})" + (" - resuming" if cursor else "") + "\n")
+    pages = export_pages(get_firestore_client(), cursor, args.page_size, args.archive)
+    chunks = encode_export(pages, args.format, header=cursor is None)
+
+    written = 0
+    with open(args.output, "ab" if cursor else "wb") as output:
+        async for chunk, token in chunks:
+            output.write(chunk)
+            output.flush()
+            written += len(chunk)
+            if token and args.format != "parquet":
+                save_cursor(cursor_path, token)
+
+    if os.path.exists(cursor_path):
+        os.remove(cursor_path)
+    print(f"✅ Exported {written} bytes")
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
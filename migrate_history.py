@@ -0,0 +1,13 @@
+import asyncio
+from backend.air_quality_service.database import get_firestore_client, migrate_history
+
+# Jednorazowa migracja: podkolekcje air_quality/{city}/history -> pole "readings"
+# w dokumencie miasta. Stare dokumenty history zostają jako archiwum.
+
+async def main():
+    print("🔥 Migrating history subcollections to readings ring buffer...\n")
+    migrated = await migrate_history(get_firestore_client())
+    print(f"✅ Migrated {migrated} cities")
+
+if __name__ == "__main__":
+    asyncio.run(main())
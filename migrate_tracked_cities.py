@@ -0,0 +1,14 @@
+import asyncio
+from backend.air_quality_service.database import get_firestore_client, migrate_tracked_cities
+
+# Jednorazowa migracja: tablice user_preferences/{uid}.tracked_cities -> dokumenty
+# user_preferences/{uid}/tracked_cities/{city} oraz liczniki w tracked_city_index.
+# Uruchomić po wdrożeniu, najlepiej gdy nikt nie zmienia śledzonych miast.
+
+async def main():
+    print("🔥 Migrating tracked cities to subscription documents...\n")
+    migrated = await migrate_tracked_cities(get_firestore_client())
+    print(f"✅ Migrated {migrated} users")
+
+if __name__ == "__main__":
+    asyncio.run(main())
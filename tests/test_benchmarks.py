@@ -0,0 +1,26 @@
+from benchmarks.load import main, parse_args, compare, percentile
+
+def test_offline_benchmark_runs_every_scenario():
+    """Test: the offline benchmark drives every scenario against the fakes without errors"""
+    args = parse_args([
+        "--requests", "40", "--concurrency", "8", "--cities", "20", "--users", "5",
+        "--firestore-latency", "0", "--upstream-latency", "0"
+    ])
+    results = main(args)
+    scenarios = results["scenarios"]
+
+    assert set(scenarios) == {"read", "track", "prediction", "refresh"}
+    for name in ("read", "track", "prediction"):
+        assert scenarios[name]["requests"] == 40
+        assert scenarios[name]["errors"] == 0
+        assert scenarios[name]["latency_ms"]["p50"] <= scenarios[name]["latency_ms"]["p99"]
+    assert scenarios["prediction"]["firestore"]["ops_per_request"] == 1.0
+    assert scenarios["refresh"]["cities_refreshed"] == 20
+    assert compare(results, results)
+
+def test_percentile_nearest_rank():
+    """Test: percentiles use the nearest-rank method"""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7], 95) == 7
@@ -0,0 +1,58 @@
+import pytest
+from backend.air_quality_service.cache import AirQualityCache
+
+class FakeTimer:
+    """Controllable clock for TTL tests"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def timer():
+    return FakeTimer()
+
+@pytest.fixture
+def cache(timer):
+    return AirQualityCache(maxsize=2, ttl=60, timer=timer)
+
+def test_cache_is_keyed_by_exact_location(cache):
+    """Test: 'Gdynia' and 'gdynia' are different documents and never share a cache entry"""
+    cache.set("Gdynia", [{"AQI": 82}])
+    cache.set("gdynia", [{"AQI": 1}])
+
+    assert cache.get("Gdynia") == [{"AQI": 82}]
+    assert cache.get("gdynia") == [{"AQI": 1}]
+    assert cache.get(" gdynia ") is None
+    assert cache.stats()["hits"] == 2
+
+def test_cache_miss_and_invalidate(cache):
+    """Test: invalidated entries count as misses"""
+    cache.set("Warsaw", [{"AQI": 42}])
+    cache.invalidate("Warsaw")
+
+    assert cache.get("Warsaw") is None
+    assert cache.stats()["misses"] == 1
+
+def test_cache_entries_expire(cache, timer):
+    """Test: entries are dropped once the TTL passes"""
+    cache.set("Warsaw", [{"AQI": 42}])
+    timer.now = 61
+
+    assert cache.get("Warsaw") is None
+    assert cache.stats()["evictions"] == 0
+
+def test_cache_evicts_least_recently_used(cache):
+    """Test: the least recently used city is evicted when the cache is full"""
+    cache.set("Warsaw", [{"AQI": 1}])
+    cache.set("Krakow", [{"AQI": 2}])
+    cache.get("Warsaw")
+    cache.set("Gdansk", [{"AQI": 3}])
+
+    assert cache.get("Krakow") is None
+    assert cache.get("Warsaw") == [{"AQI": 1}]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
@@ -25,7 +25,7 @@ class MockFirestoreClient:
     def document(self, name):
         return self  # Simulate document reference
 
-    def get(self):
+    async def get(self):
         raise Exception("🔥 Simulated Firestore failure")  # Force internal error
 
 @pytest.fixture
@@ -0,0 +1,153 @@
+import io
+import csv
+import json
+import asyncio
+import argparse
+import pytest
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from benchmarks.fake_firestore import FakeAsyncClient
+from backend.air_quality_service.database import get_firestore_client
+from backend.air_quality_service.auth import admin_only
+from backend.air_quality_service.export import export_pages, encode_export, encode_cursor, decode_cursor
+from backend.air_quality_service.routes import air_quality
+import export_data
+
+CITIES = ["Gdansk", "Krakow", "Lodz", "Poznan", "Warsaw"]
+
+def reading(aqi: int) -> dict:
+    return {
+        "AQI": aqi, "last_update": f"2026-01-01T{aqi % 24:02d}:00:00+00:00", "source": "Open-Meteo",
+        "raw_data": {"us_aqi": aqi, "pm2_5": aqi / 4, "latitude": 52.2, "longitude": 21.0}
+    }
+
+def make_db() -> FakeAsyncClient:
+    """Five cities with two readings each and three archived readings each"""
+    db = FakeAsyncClient()
+
+    async def seed():
+        for number, city in enumerate(CITIES):
+            city_ref = db.collection("air_quality").document(city)
+            await city_ref.set({"readings": [reading(number * 10 + 1), reading(number * 10)]})
+            for index in range(3):
+                await city_ref.collection("history").document(f"h{index}").set(reading(100 + number * 10 + index))
+
+    asyncio.run(seed())
+    return db
+
+def collect(db, cursor=None, page_size=2, archive=False) -> list:
+    async def run():
+        return [page async for page in export_pages(db, cursor, page_size, archive)]
+    return asyncio.run(run())
+
+def encoded(db, export_format: str) -> bytes:
+    async def run():
+        return b"".join([chunk async for chunk, _ in encode_export(export_pages(db, page_size=2), export_format)])
+    return asyncio.run(run())
+
+def test_pages_follow_page_size_and_cursor_resumes():
+    """Test: cities are read page_size at a time and each page's cursor resumes right after it"""
+    db = make_db()
+    pages = collect(db)
+
+    assert [sorted({row["location"] for row in rows}) for rows, _ in pages] == [["Gdansk", "Krakow"], ["Lodz", "Poznan"], ["Warsaw"]]
+    assert sum(len(rows) for rows, _ in pages) == 10
+    assert decode_cursor(pages[0][1]) == ("Krakow", None)
+
+    resumed = collect(db, cursor=pages[0][1])
+    assert [row for rows, _ in resumed for row in rows] == [row for rows, _ in pages[1:] for row in rows]
+
+def test_cursor_round_trip_and_malformed_token():
+    """Test: cursor tokens decode to the position they encode, garbage is a ValueError"""
+    assert decode_cursor(encode_cursor("Warsaw")) == ("Warsaw", None)
+    assert decode_cursor(encode_cursor("Warsaw", "h1")) == ("Warsaw", "h1")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_archive_resume_mid_city_repeats_no_rows():
+    """Test: resuming from a cursor inside a city's archive continues after its last exported document"""
+    db = make_db()
+    full = [row for rows, _ in collect(db, page_size=2, archive=True) for row in rows]
+    pages = collect(db, page_size=2, archive=True)
+
+    # Interrupted after the first archive page of Gdansk (h0, h1)
+    assert decode_cursor(pages[0][1]) == ("Gdansk", "h1")
+    resumed = [row for rows, _ in collect(db, cursor=pages[0][1], page_size=2, archive=True) for row in rows]
+
+    assert len(full) == 15
+    assert pages[0][0] + resumed == full
+
+def test_every_format_encodes_all_rows():
+    """Test: NDJSON, CSV and Parquet exports hold the same rows"""
+    db = make_db()
+
+    ndjson = [json.loads(line) for line in encoded(db, "ndjson").decode().splitlines()]
+    rows = list(csv.DictReader(io.StringIO(encoded(db, "csv").decode())))
+    assert len(ndjson) == len(rows) == 10
+    assert [row["location"] for row in rows] == [row["location"] for row in ndjson]
+    assert [float(row["pm2_5"]) for row in rows] == [row["pm2_5"] for row in ndjson]
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(io.BytesIO(encoded(db, "parquet")))
+    assert table.num_rows == 10
+    assert table.column("location").to_pylist() == [row["location"] for row in ndjson]
+
+def test_export_route_streams_and_validates(monkeypatch):
+    """Test: the admin route streams the export and rejects unknown formats and bad cursors"""
+    db = make_db()
+
+    @asynccontextmanager
+    async def no_lifespan(app):
+        yield
+
+    app = FastAPI()
+    app.include_router(air_quality.router)
+    app.router.lifespan_context = no_lifespan
+    app.dependency_overrides[get_firestore_client] = lambda: db
+    app.dependency_overrides[admin_only] = lambda: {"uid": "admin", "email": "admin@example.com", "role": "admin"}
+
+    with TestClient(app) as client:
+        response = client.get("/admin/export", params={"format": "csv"})
+        resumed = client.get("/admin/export", params={"cursor": encode_cursor("Poznan")})
+        bad_format = client.get("/admin/export", params={"format": "xml"})
+        bad_cursor = client.get("/admin/export", params={"cursor": "garbage"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert len(response.text.strip().splitlines()) == 11
+    assert {json.loads(line)["location"] for line in resumed.text.splitlines()} == {"Warsaw"}
+    assert bad_format.status_code == 400
+    assert bad_cursor.status_code == 400
+
+def test_export_script_resumes_an_interrupted_export(monkeypatch, tmp_path):
+    """Test: export_data.py --resume appends the rest of an interrupted archive export without duplicates"""
+    db = make_db()
+    monkeypatch.setattr(export_data, "get_firestore_client", lambda: db)
+    output = tmp_path / "export.ndjson"
+    args = argparse.Namespace(output=str(output), format="ndjson", archive=True, page_size=2, resume=False)
+
+    encode = export_data.encode_export
+
+    def interrupted(pages, export_format, header=True):
+        async def chunks():
+            written = 0
+            async for chunk, token in encode(pages, export_format, header):
+                if written == 3:
+                    raise KeyboardInterrupt
+                written += 1
+                yield chunk, token
+        return chunks()
+
+    monkeypatch.setattr(export_data, "encode_export", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        asyncio.run(export_data.main(args))
+    assert (tmp_path / "export.ndjson.cursor").exists()
+
+    monkeypatch.setattr(export_data, "encode_export", encode)
+    asyncio.run(export_data.main(argparse.Namespace(**{**vars(args), "resume": True})))
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(rows) == 15
+    assert len({(row["location"], row["AQI"]) for row in rows}) == 15
+    assert not (tmp_path / "export.ndjson.cursor").exists()
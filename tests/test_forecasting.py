@@ -0,0 +1,126 @@
+import asyncio
+import numpy as np
+import pytest
+from benchmarks.fake_firestore import FakeAsyncClient
+from backend.air_quality_service.database import append_readings, get_forecast, get_readings
+from backend.air_quality_service.forecasting import (
+    linear_forecast, build_forecast, register_model, ForecastModel, FORECAST_MODELS
+)
+
+def sklearn_reference(history):
+    """Previous per-request implementation (LinearRegression on 5 points)"""
+    LinearRegression = pytest.importorskip("sklearn.linear_model").LinearRegression
+
+    history = history[:5][::-1]
+    model = LinearRegression()
+    model.fit(np.arange(5).reshape(-1, 1), np.array(history).reshape(-1, 1))
+    predicted = model.predict([[5]])[0][0]
+    margin = (max(history) - min(history)) * 0.2
+    predicted = max(min(history) - margin, min(max(history) + margin, predicted))
+    return max(0, min(500, round(float(predicted))))
+
+def test_linear_forecast_matches_previous_model():
+    """Test: the closed-form predictor gives the same results as LinearRegression"""
+    rng = np.random.default_rng(42)
+    histories = rng.uniform(0, 300, size=(200, 5))
+
+    predicted = linear_forecast(histories)
+
+    assert list(predicted) == [sklearn_reference(list(row)) for row in histories]
+
+def test_linear_forecast_is_clamped():
+    """Test: forecasts stay within the history range +/- 20% and within 0-500"""
+    # Newest first: a steep rise past 500, a fall below 0 and a rise bounded by the margin
+    predicted = linear_forecast([[500, 400, 300, 200, 100], [0, 10, 20, 30, 40], [40, 30, 20, 10, 0]])
+
+    assert predicted[0] == 500
+    assert predicted[1] == 0
+    assert predicted[2] == 48
+
+def test_linear_forecast_uses_five_newest_values():
+    """Test: values older than the 5 newest ones are ignored"""
+    assert linear_forecast([[50, 50, 50, 50, 50, 400, 400]])[0] == 50
+
+def hourly_readings(values, start_hour=0, step_hours=6):
+    """Readings newest first, one every step_hours starting on 2026-01-01"""
+    readings = []
+    for i, value in enumerate(values):
+        hour = start_hour + i * step_hours
+        readings.append({
+            "AQI": value,
+            "last_update": f"2026-01-{1 + hour // 24:02d}T{hour % 24:02d}:00:00+00:00",
+            "raw_data": {"pm2_5": value / 4, "pm10": value / 2}
+        })
+    return readings[::-1]
+
+def test_build_forecast_needs_enough_readings():
+    """Test: no forecast is built from fewer than 3 readings"""
+    assert build_forecast(hourly_readings([50, 60])) is None
+
+def test_build_forecast_horizon_and_intervals():
+    """Test: every model forecasts 24 hourly steps with intervals around the point forecast"""
+    forecast = build_forecast(hourly_readings([40, 52, 61, 68, 83, 90]))
+
+    assert len(forecast["timestamps"]) == 24
+    assert forecast["based_on"] == "2026-01-02T06:00:00+00:00"
+    assert set(forecast["models"]) == {"linear", "exponential_smoothing", "seasonal_daily"}
+    for series in forecast["models"].values():
+        assert set(series) == {"AQI", "pm2_5", "pm10"}
+        aqi = series["AQI"]
+        assert len(aqi["values"]) == 24
+        assert all(low <= value <= high for low, value, high in zip(aqi["lower"], aqi["values"], aqi["upper"]))
+        # Intervals widen further ahead
+        assert aqi["upper"][-1] - aqi["lower"][-1] >= aqi["upper"][0] - aqi["lower"][0]
+
+    # Rising history -> rising linear forecast
+    linear = forecast["models"]["linear"]["AQI"]["values"]
+    assert linear[0] > 90 and linear[-1] >= linear[0]
+
+def test_seasonal_forecast_repeats_daily_profile():
+    """Test: the seasonal model reproduces a stable daily pattern"""
+    pattern = [30, 80, 60, 40]  # 00:00, 06:00, 12:00, 18:00
+    forecast = build_forecast(hourly_readings(pattern * 3), models=["seasonal_daily"])
+
+    seasonal = forecast["models"]["seasonal_daily"]["AQI"]
+    assert forecast["confidence"]["seasonal_daily"] == "high"
+    # Steps 6, 12, 18 and 24 hours after the last 18:00 reading
+    assert [round(seasonal["values"][i]) for i in (5, 11, 17, 23)] == [30, 80, 60, 40]
+
+def test_register_custom_model():
+    """Test: models registered by name are picked up by the engine"""
+    class ConstantModel(ForecastModel):
+        name = "constant"
+
+        def fit_predict(self, hours, values, targets, hours_of_day, target_hours_of_day):
+            return np.full(len(values), 42.0), np.full(len(targets), 42.0)
+
+    register_model(ConstantModel())
+    try:
+        forecast = build_forecast(hourly_readings([10, 20, 30]), models=["constant"])
+    finally:
+        FORECAST_MODELS.pop("constant")
+
+    assert forecast["models"]["constant"]["AQI"]["values"] == [42.0] * 24
+
+def test_model_must_implement_fit_predict():
+    """Test: the base class is abstract, a model without fit_predict cannot be created"""
+    class Incomplete(ForecastModel):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_failing_forecaster_does_not_block_the_write():
+    """Test: when the forecaster raises, the reading is still stored with forecast=None"""
+    db = FakeAsyncClient()
+
+    def broken(readings):
+        raise ValueError("Invalid isoformat string")
+
+    async def run():
+        await append_readings(db, "Warsaw", [{"AQI": 40, "last_update": "2025-01-01T00:00:00+00:00"}], forecaster=broken)
+        return await get_readings(db, "Warsaw"), await get_forecast(db, "Warsaw")
+
+    readings, forecast = asyncio.run(run())
+    assert [reading["AQI"] for reading in readings] == [40]
+    assert forecast is None
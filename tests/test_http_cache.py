@@ -0,0 +1,95 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, UTC
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+from benchmarks.fake_firestore import FakeAsyncClient
+from backend.air_quality_service.auth import admin_only
+from backend.air_quality_service.database import get_firestore_client, append_readings
+from backend.air_quality_service.http_cache import (
+    conditional_response, is_not_modified, latest_update, make_etag, PUBLIC_CACHE_CONTROL
+)
+from backend.air_quality_service.routes import air_quality
+
+def make_request(headers=None):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/air-quality/Warsaw",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    })
+
+LAST_UPDATE = "2026-01-01T12:00:00.250000+00:00"
+
+def test_etag_depends_on_latest_update():
+    """Test: the ETag is stable for one reading and changes with a newer one"""
+    assert make_etag("Warsaw", LAST_UPDATE) == make_etag("Warsaw", LAST_UPDATE)
+    assert make_etag("Warsaw", LAST_UPDATE) != make_etag("Warsaw", "2026-01-01T13:00:00+00:00")
+    assert make_etag("Warsaw", LAST_UPDATE).startswith('W/"')
+
+def test_latest_update_skips_invalid_values():
+    """Test: the newest parseable timestamp is used, naive ones as UTC"""
+    latest = latest_update([None, "garbage", "2026-01-01T10:00:00", LAST_UPDATE])
+    assert latest == datetime(2026, 1, 1, 12, 0, 0, 250000, tzinfo=UTC)
+
+def test_if_none_match_returns_304_with_validators():
+    """Test: a matching If-None-Match gets a 304 carrying the same headers"""
+    etag = make_etag("Warsaw", LAST_UPDATE)
+    request = make_request({"If-None-Match": f'"other", {etag}'})
+
+    not_modified = conditional_response(request, Response(), etag, latest_update([LAST_UPDATE]))
+
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.headers["cache-control"] == PUBLIC_CACHE_CONTROL
+    assert not_modified.headers["last-modified"] == "Thu, 01 Jan 2026 12:00:00 GMT"
+
+def test_changed_version_sets_headers_on_response():
+    """Test: a stale ETag gets the full body with validators set on the response"""
+    etag = make_etag("Warsaw", LAST_UPDATE)
+    response = Response()
+
+    assert conditional_response(make_request({"If-None-Match": '"old"'}), response, etag) is None
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"] == PUBLIC_CACHE_CONTROL
+
+def test_if_modified_since():
+    """Test: If-Modified-Since is compared with one-second resolution"""
+    etag = make_etag("Warsaw", LAST_UPDATE)
+    last_modified = latest_update([LAST_UPDATE])
+
+    assert is_not_modified(make_request({"If-Modified-Since": "Thu, 01 Jan 2026 12:00:00 GMT"}), etag, last_modified)
+    assert not is_not_modified(make_request({"If-Modified-Since": "Thu, 01 Jan 2026 11:59:59 GMT"}), etag, last_modified)
+    # If-None-Match takes precedence
+    assert not is_not_modified(
+        make_request({"If-None-Match": '"old"', "If-Modified-Since": "Thu, 01 Jan 2026 12:00:00 GMT"}),
+        etag, last_modified
+    )
+
+def test_backfilled_reading_changes_the_route_etag(monkeypatch):
+    """Test: an older reading inserted into a full buffer changes the body, so the old ETag no longer matches"""
+    db = FakeAsyncClient()
+    monkeypatch.setattr(air_quality, "STALE_WHILE_REVALIDATE", False)
+    air_quality.air_quality_cache.invalidate("Backfill")
+
+    @asynccontextmanager
+    async def no_lifespan(app):
+        yield
+
+    app = FastAPI()
+    app.include_router(air_quality.router)
+    app.router.lifespan_context = no_lifespan
+    app.dependency_overrides[get_firestore_client] = lambda: db
+    app.dependency_overrides[admin_only] = lambda: {"uid": "admin", "email": "admin@example.com", "role": "admin"}
+    readings = [{"AQI": 50 + hour, "last_update": f"2026-01-01T{hour:02d}:00:00+00:00"} for hour in range(1, 6)]
+
+    with TestClient(app) as client:
+        client.portal.call(append_readings, db, "Backfill", readings)
+        before = client.get("/air-quality/Backfill")
+        backfill = client.post("/air-quality/Backfill", json={"AQI": 499, "last_update": "2026-01-01T03:30:00+00:00"})
+        after = client.get("/air-quality/Backfill", headers={"If-None-Match": before.headers["etag"]})
+
+    assert [reading["AQI"] for reading in before.json()["history"]] == [55, 54, 53, 52, 51]
+    assert backfill.status_code == 200
+    assert after.status_code == 200
+    assert [reading["AQI"] for reading in after.json()["history"]] == [55, 54, 499, 53, 52]
+    assert after.headers["etag"] != before.headers["etag"]
@@ -0,0 +1,90 @@
+import json
+import pytest
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from benchmarks.fake_firestore import FakeAsyncClient
+from backend.air_quality_service.auth import admin_only
+from backend.air_quality_service.database import get_firestore_client
+from backend.air_quality_service.ingest import parse_bulk_rows
+from backend.air_quality_service.refresh_planner import RefreshPlanner
+from backend.air_quality_service.routes import air_quality
+
+def test_ndjson_rows_grouped_by_city():
+    """Test: NDJSON rows are validated and grouped by location"""
+    body = "\n".join(json.dumps(row) for row in [
+        {"location": "Warsaw", "AQI": 40, "last_update": "2025-01-01T00:00:00+00:00"},
+        {"location": "Krakow", "AQI": 55, "last_update": "2025-01-01T00:00:00+00:00"},
+        {"location": "Warsaw", "AQI": 42, "last_update": "2025-01-01T06:00:00+00:00"},
+    ]).encode()
+
+    readings, accepted, errors = parse_bulk_rows(body, "application/x-ndjson")
+
+    assert accepted == 3
+    assert errors == []
+    assert readings == {
+        "Warsaw": [
+            {"AQI": 40, "last_update": "2025-01-01T00:00:00+00:00"},
+            {"AQI": 42, "last_update": "2025-01-01T06:00:00+00:00"},
+        ],
+        "Krakow": [{"AQI": 55, "last_update": "2025-01-01T00:00:00+00:00"}],
+    }
+
+def test_errors_are_reported_per_row():
+    """Test: invalid JSON lines and rows failing validation are listed by row number"""
+    body = b'{"location": "Warsaw", "AQI": 40}\n\n{broken\n{"location": "Warsaw", "AQI": 501}\n{"AQI": 10}\n'
+
+    readings, accepted, errors = parse_bulk_rows(body, "application/x-ndjson")
+
+    assert accepted == 1
+    assert readings["Warsaw"][0]["last_update"]  # Filled in by the model
+    assert [error["row"] for error in errors] == [3, 4, 5]
+    assert errors[0]["error"].startswith("Invalid JSON")
+    assert "AQI" in errors[1]["error"]
+    assert "location" in errors[2]["error"]
+
+def test_json_array_body():
+    """Test: a JSON array is accepted, anything else is rejected as a whole"""
+    readings, accepted, errors = parse_bulk_rows(b'[{"location": "Gdansk", "AQI": 12}]')
+    assert accepted == 1 and list(readings) == ["Gdansk"]
+
+    with pytest.raises(ValueError):
+        parse_bulk_rows(b'{"location": "Gdansk", "AQI": 12}')
+
+def test_malformed_timestamp_is_a_row_error():
+    """Test: a last_update that is not ISO 8601 rejects only its row, so it never reaches the forecaster"""
+    body = (
+        b'{"location": "X", "AQI": 3, "last_update": "yesterday"}\n'
+        b'{"location": "X", "AQI": 4, "last_update": "2025-01-01T06:00:00+00:00"}\n'
+    )
+
+    readings, accepted, errors = parse_bulk_rows(body, "application/x-ndjson")
+
+    assert accepted == 1
+    assert readings == {"X": [{"AQI": 4, "last_update": "2025-01-01T06:00:00+00:00"}]}
+    assert errors[0]["row"] == 1
+    assert "ISO 8601" in errors[0]["error"]
+
+def test_bulk_route_stores_rows_and_updates_the_planner(monkeypatch):
+    """Test: the bulk upload reports its rows and hands each city's new buffer to the refresh planner"""
+    db = FakeAsyncClient()
+    planner = RefreshPlanner()
+    monkeypatch.setattr(air_quality, "refresh_planner", planner)
+
+    @asynccontextmanager
+    async def no_lifespan(app):
+        yield
+
+    app = FastAPI()
+    app.include_router(air_quality.router)
+    app.router.lifespan_context = no_lifespan
+    app.dependency_overrides[get_firestore_client] = lambda: db
+    app.dependency_overrides[admin_only] = lambda: {"uid": "admin", "email": "admin@example.com", "role": "admin"}
+    body = b'{"location": "Warsaw", "AQI": 40, "last_update": "2025-01-01T00:00:00+00:00"}\n{"location": "Warsaw", "AQI": 501}\n'
+
+    with TestClient(app) as client:
+        response = client.post("/admin/air-quality/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert (response.json()["accepted"], response.json()["rejected"], response.json()["cities"]) == (1, 1, 1)
+    assert [entry["city"] for entry in planner.plan()] == ["Warsaw"]
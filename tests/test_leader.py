@@ -0,0 +1,76 @@
+import asyncio
+from backend.air_quality_service.leader import LeaderElector, LocalLease
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_elector(clock, name, holder, ttl=30):
+    return LeaderElector(LocalLease(name, holder, ttl=ttl, timer=clock), heartbeat=10, timer=clock)
+
+def test_only_one_replica_leads():
+    """Test: of two replicas campaigning for the same lease only one becomes leader"""
+    clock = Clock()
+    first = make_elector(clock, "only-one", "replica-a")
+    second = make_elector(clock, "only-one", "replica-b")
+
+    async def run():
+        return await first.campaign(), await second.campaign(), await first.campaign()
+
+    assert asyncio.run(run()) == (True, False, True)
+    assert first.is_leader and not second.is_leader
+
+def test_failover_after_lease_expires():
+    """Test: when the leader stops renewing, another replica takes over after the TTL"""
+    clock = Clock()
+    leader = make_elector(clock, "failover", "replica-a")
+    follower = make_elector(clock, "failover", "replica-b")
+
+    async def run():
+        await leader.campaign()
+        clock.now += 20
+        taken_early = await follower.campaign()
+        clock.now += 15
+        return taken_early, await follower.campaign()
+
+    assert asyncio.run(run()) == (False, True)
+    assert not leader.is_leader
+    assert follower.is_leader
+
+def test_leadership_lapses_when_renewals_fail():
+    """Test: a leader that cannot reach the lease store steps down once its lease would have expired"""
+    clock = Clock()
+    elector = make_elector(clock, "unreachable", "replica-a")
+
+    async def fail():
+        raise ConnectionError("Firestore unreachable")
+
+    async def run():
+        await elector.campaign()
+        elector.lease.try_acquire = fail
+        clock.now += 10
+        still_leader = await elector.campaign()
+        clock.now += 25
+        return still_leader, await elector.campaign()
+
+    assert asyncio.run(run()) == (True, False)
+
+def test_stop_hands_lease_over():
+    """Test: stopping the leader releases the lease so a follower takes it without waiting for the TTL"""
+    clock = Clock()
+    leader = make_elector(clock, "handover", "replica-a")
+    follower = make_elector(clock, "handover", "replica-b")
+
+    async def run():
+        await leader.start()
+        await leader.start()
+        await asyncio.sleep(0)
+        was_leader = leader.is_leader
+        await leader.stop()
+        return was_leader, await follower.campaign()
+
+    assert asyncio.run(run()) == (True, True)
+    assert not leader.is_leader
@@ -0,0 +1,54 @@
+import importlib.util
+from limits.storage import MemoryStorage
+from starlette.requests import Request
+from backend.air_quality_service import limiter
+
+def make_request(forwarded=None, authorization=None) -> Request:
+    headers = []
+    if forwarded is not None:
+        headers.append((b"x-forwarded-for", forwarded.encode()))
+    if authorization is not None:
+        headers.append((b"authorization", authorization.encode()))
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "client": ("10.0.0.9", 1234)})
+
+def test_spoofed_left_most_forwarded_entry_is_ignored(monkeypatch):
+    """Test: with two trusted proxies the client is the entry the outer proxy appended, not the left-most one"""
+    monkeypatch.setattr(limiter, "TRUSTED_PROXY_COUNT", 2)
+    assert limiter.client_ip(make_request("6.6.6.6, 203.0.113.7, 10.0.0.1")) == "203.0.113.7"
+    assert limiter.client_ip(make_request("203.0.113.7, 10.0.0.1")) == "203.0.113.7"
+
+def test_missing_header_and_too_few_hops(monkeypatch):
+    """Test: without X-Forwarded-For the peer address is used, with fewer hops than proxies the first hop"""
+    monkeypatch.setattr(limiter, "TRUSTED_PROXY_COUNT", 2)
+    assert limiter.client_ip(make_request()) == "10.0.0.9"
+    assert limiter.client_ip(make_request(" , ")) == "10.0.0.9"
+    assert limiter.client_ip(make_request("203.0.113.7")) == "203.0.113.7"
+
+def test_header_is_ignored_without_trusted_proxies(monkeypatch):
+    """Test: TRUSTED_PROXY_COUNT=0 never trusts X-Forwarded-For"""
+    monkeypatch.setattr(limiter, "TRUSTED_PROXY_COUNT", 0)
+    assert limiter.client_ip(make_request("6.6.6.6")) == "10.0.0.9"
+
+def test_key_is_per_user_only_for_verified_tokens(monkeypatch):
+    """Test: a token already in the verification cache keys by uid, anything else keys by IP"""
+    monkeypatch.setattr(limiter, "TRUSTED_PROXY_COUNT", 0)
+    claims = {"known-token": {"uid": "user-1"}, "no-uid-token": {"email": "user@example.com"}}
+    monkeypatch.setattr(limiter, "cached_token_claims", claims.get)
+
+    assert limiter.rate_limit_key(make_request(authorization="Bearer known-token")) == "user:user-1"
+    assert limiter.rate_limit_key(make_request(authorization="Bearer unknown-token")) == "ip:10.0.0.9"
+    assert limiter.rate_limit_key(make_request(authorization="Bearer no-uid-token")) == "ip:10.0.0.9"
+    assert limiter.rate_limit_key(make_request(authorization="Basic known-token")) == "ip:10.0.0.9"
+    assert limiter.rate_limit_key(make_request()) == "ip:10.0.0.9"
+
+def test_storage_defaults_to_memory(monkeypatch):
+    """Test: without RATE_LIMIT_STORAGE_URI the limiter counts in memory and keeps an in-memory fallback"""
+    monkeypatch.delenv("RATE_LIMIT_STORAGE_URI", raising=False)
+    # A fresh copy of the module, so the shared limiter used by the routes stays untouched
+    spec = importlib.util.spec_from_file_location("fresh_limiter", limiter.__file__)
+    fresh = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(fresh)
+
+    assert fresh.RATE_LIMIT_STORAGE_URI == "memory://"
+    assert isinstance(fresh.limiter._storage, MemoryStorage)
+    assert fresh.limiter._in_memory_fallback_enabled
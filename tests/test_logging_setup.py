@@ -0,0 +1,83 @@
+import json
+import queue
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.air_quality_service.logging_setup import (
+    JsonFormatter, SamplingFilter, NonBlockingQueueHandler, RequestIdFilter, RequestIdMiddleware,
+    SAMPLED, parse_levels, request_id_var, redact
+)
+from backend.air_quality_service.metrics import LOG_RECORDS_DROPPED
+
+def make_record(msg, *args, level=logging.INFO, **extra):
+    record = logging.LogRecord("demo", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_json_lines_carry_request_id_and_extras():
+    """Test: a queued record is interpolated up front and rendered as one JSON object with its request id"""
+    handler = NonBlockingQueueHandler(queue.Queue())
+    handler.addFilter(RequestIdFilter())
+    items = ["Warsaw"]
+
+    token = request_id_var.set("req-1")
+    try:
+        handler.handle(make_record("Tracking %s", items, city="Warsaw"))
+    finally:
+        request_id_var.reset(token)
+    items.append("Krakow")
+
+    entry = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+    assert entry["message"] == "Tracking ['Warsaw']"
+    assert entry["request_id"] == "req-1"
+    assert entry["city"] == "Warsaw"
+    assert entry["level"] == "INFO"
+
+def test_query_string_tokens_are_redacted():
+    """Test: credentials in logged URLs (e.g. uvicorn's WebSocket line) never reach the output"""
+    handler = NonBlockingQueueHandler(queue.Queue())
+    handler.handle(make_record('%s - "WebSocket %s" [accepted]', "127.0.0.1:5000", "/ws/tracked-cities?token=eyJhbGciOi.x-y"))
+
+    assert handler.queue.get_nowait().msg == '127.0.0.1:5000 - "WebSocket /ws/tracked-cities?token=[REDACTED]" [accepted]'
+    assert redact("/air-quality/Warsaw?page=2") == "/air-quality/Warsaw?page=2"
+
+def test_sampling_keeps_every_nth_per_template():
+    """Test: sampled records pass once per N occurrences of their template, warnings always pass"""
+    sampling = SamplingFilter(every=5)
+    kept = [sampling.filter(make_record("Fetching %s", i, **SAMPLED)) for i in range(12)]
+    assert kept == [True] + [False] * 4 + [True] + [False] * 4 + [True, False]
+
+    assert sampling.filter(make_record("Other template %s", 1, **SAMPLED))
+    assert all(sampling.filter(make_record("Failed %s", i, level=logging.WARNING, **SAMPLED)) for i in range(3))
+    assert all(sampling.filter(make_record("Not sampled %s", i)) for i in range(3))
+
+def test_full_queue_drops_instead_of_blocking():
+    """Test: when the listener falls behind, records are dropped and counted"""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    before = LOG_RECORDS_DROPPED.value(reason="queue_full")
+    handler.handle(make_record("first"))
+    handler.handle(make_record("second"))
+    assert handler.queue.qsize() == 1
+    assert LOG_RECORDS_DROPPED.value(reason="queue_full") == before + 1
+
+def test_request_id_middleware_and_level_spec():
+    """Test: a valid X-Request-ID is reused and echoed, a malformed one is replaced; LOG_LEVELS parses"""
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/id")
+    async def current_id():
+        return {"request_id": request_id_var.get()}
+
+    with TestClient(app) as client:
+        reused = client.get("/id", headers={"X-Request-ID": "abc-123"})
+        replaced = client.get("/id", headers={"X-Request-ID": "bad id\nwith newline"})
+
+    assert reused.json() == {"request_id": "abc-123"}
+    assert reused.headers["x-request-id"] == "abc-123"
+    assert len(replaced.json()["request_id"]) == 32
+    assert replaced.headers["x-request-id"] == replaced.json()["request_id"]
+
+    assert parse_levels("httpx=warning, backend.air_quality_service.auth=DEBUG,,broken") == {
+        "httpx": "WARNING", "backend.air_quality_service.auth": "DEBUG"
+    }
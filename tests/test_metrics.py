@@ -0,0 +1,109 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.air_quality_service.metrics import (
+    Counter, Gauge, Histogram, Registry, MetricsMiddleware, HTTP_REQUESTS, HTTP_REQUEST_DURATION,
+    FIRESTORE_REQUESTS, FIRESTORE_REQUEST_DURATION
+)
+from backend.air_quality_service.database import instrument_firestore
+
+def test_text_exposition_format():
+    """Test: counters, gauges and histograms render in the Prometheus text format"""
+    registry = Registry()
+    requests = registry.register(Counter("demo_requests_total", "Requests", ["route"]))
+    entries = registry.register(Gauge("demo_entries", "Entries"))
+    latency = registry.register(Histogram("demo_seconds", "Latency", buckets=[0.1, 1]))
+
+    requests.inc(route='/a"b')
+    requests.inc(2, route='/a"b')
+    entries.set_function(lambda: 7)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{route="/a\\"b"} 3.0' in text
+    assert "demo_entries 7.0" in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in text
+    assert "demo_seconds_count 3" in text
+
+def test_middleware_labels_by_route_template():
+    """Test: requests are counted per route template and status, not per raw path"""
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/cities/{city}")
+    async def city(city: str):
+        return {"city": city}
+
+    before = HTTP_REQUESTS.value(method="GET", route="/cities/{city}", status="200")
+    with TestClient(app) as client:
+        client.get("/cities/Warsaw")
+        client.get("/cities/Krakow")
+        client.get("/missing")
+
+    assert HTTP_REQUESTS.value(method="GET", route="/cities/{city}", status="200") == before + 2
+    assert HTTP_REQUESTS.value(method="GET", route="unmatched", status="404") >= 1
+    assert HTTP_REQUEST_DURATION.value(method="GET", route="/cities/{city}")[0] >= 2
+
+class FakeGapicApi:
+    async def commit(self, request=None):
+        return "committed"
+
+    async def run_query(self, request=None):
+        async def stream():
+            yield 1
+            yield 2
+        return stream()
+
+    async def batch_get_documents(self, request=None):
+        raise ConnectionError("unavailable")
+
+    async def begin_transaction(self, request=None):
+        pass
+
+    async def rollback(self, request=None):
+        pass
+
+    async def run_aggregation_query(self, request=None):
+        pass
+
+    async def list_documents(self, request=None):
+        pass
+
+    async def list_collection_ids(self, request=None):
+        pass
+
+class FakeClient:
+    def __init__(self):
+        self.api = FakeGapicApi()
+
+    def _firestore_api_helper(self, *args):
+        return self.api
+
+def test_firestore_rpcs_are_counted_and_timed():
+    """Test: every RPC of the client's API object is counted per method and outcome"""
+    client = instrument_firestore(FakeClient())
+    commits = FIRESTORE_REQUESTS.value(method="commit", outcome="ok")
+    queries = FIRESTORE_REQUEST_DURATION.value(method="run_query")[0]
+    failures = FIRESTORE_REQUESTS.value(method="batch_get_documents", outcome="error")
+
+    async def run():
+        api = client._firestore_api_helper()
+        assert await api.commit() == "committed"
+        assert [item async for item in await api.run_query()] == [1, 2]
+        try:
+            await api.batch_get_documents()
+        except ConnectionError:
+            pass
+        # Wrapped once, however often the API object is fetched
+        assert client._firestore_api_helper() is api
+
+    asyncio.run(run())
+
+    assert FIRESTORE_REQUESTS.value(method="commit", outcome="ok") == commits + 1
+    assert FIRESTORE_REQUEST_DURATION.value(method="run_query")[0] == queries + 1
+    assert FIRESTORE_REQUESTS.value(method="batch_get_documents", outcome="error") == failures + 1
@@ -0,0 +1,26 @@
+import asyncio
+from benchmarks.fake_firestore import FakeAsyncClient
+from backend.air_quality_service import database
+from backend.air_quality_service.database import migrate_history, get_readings
+
+def test_migration_fills_the_buffer_without_copying_the_archive(monkeypatch):
+    """Test: legacy history documents become the ring buffer and are not archived a second time"""
+    monkeypatch.setattr(database, "ARCHIVE_HISTORY", True)
+    db = FakeAsyncClient()
+    history = [{"AQI": 40 + hour, "last_update": f"2026-01-01T{hour:02d}:00:00+00:00"} for hour in range(3)]
+
+    async def run():
+        city_ref = db.collection("air_quality").document("Warsaw")
+        await city_ref.set({"name": "Warsaw"})
+        for index, reading in enumerate(history):
+            await city_ref.collection("history").document(f"h{index}").set(reading)
+        await db.collection("air_quality").document("Empty").set({"name": "Empty"})
+
+        migrated = await migrate_history(db)
+        archived = [doc async for doc in city_ref.collection("history").stream()]
+        return migrated, await get_readings(db, "Warsaw"), len(archived)
+
+    migrated, readings, archived = asyncio.run(run())
+    assert migrated == 1
+    assert [reading["AQI"] for reading in readings] == [42, 41, 40]
+    assert archived == 3
@@ -0,0 +1,41 @@
+import asyncio
+from backend.air_quality_service.pubsub import PubSubHub, Subscription, create_hub
+
+def test_updates_reach_only_subscribed_locations():
+    """Test: a reading is delivered to subscribers of its location only"""
+    hub = PubSubHub()
+
+    async def run():
+        warsaw = hub.subscribe(["Warsaw", "Krakow"])
+        gdansk = hub.subscribe(["Gdansk"])
+        await hub.publish("Warsaw", {"AQI": 42})
+        return await warsaw.get(timeout=0.1), await gdansk.get(timeout=0.01)
+
+    received, missed = asyncio.run(run())
+
+    assert received == {"location": "Warsaw", "reading": {"AQI": 42}}
+    assert missed is None
+
+def test_closed_subscription_is_removed():
+    """Test: closing a subscription drops it from every location"""
+    hub = PubSubHub()
+
+    with hub.subscribe(["Warsaw", "Krakow"]):
+        assert hub.stats()["subscriptions"] == 1
+    assert hub.stats() == {"locations": 0, "subscriptions": 0, "published": 0}
+
+def test_slow_subscriber_drops_oldest_updates():
+    """Test: a full queue keeps the newest updates and counts the dropped ones"""
+    subscription = Subscription(PubSubHub(), ["Warsaw"], maxsize=2)
+
+    async def run():
+        for aqi in range(5):
+            subscription.deliver({"location": "Warsaw", "reading": {"AQI": aqi}})
+        return [(await subscription.get(timeout=0.01))["reading"]["AQI"] for _ in range(2)]
+
+    assert asyncio.run(run()) == [3, 4]
+    assert subscription.dropped == 3
+
+def test_memory_url_uses_local_hub():
+    """Test: memory:// selects the in-process hub"""
+    assert type(create_hub("memory://")) is PubSubHub
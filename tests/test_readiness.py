@@ -0,0 +1,49 @@
+import asyncio
+from backend.air_quality_service.readiness import Readiness
+
+def test_ready_after_all_steps():
+    """Test: readiness flips only once every warm-up step (blocking or async) has finished"""
+    readiness = Readiness()
+    calls = []
+
+    async def open_pool():
+        calls.append("pool")
+
+    readiness.add_step("client", lambda: calls.append("client"))
+    readiness.add_step("pool", open_pool)
+    assert not readiness.ready
+
+    asyncio.run(readiness.warm_up())
+
+    assert sorted(calls) == ["client", "pool"]
+    status = readiness.status()
+    assert status["ready"] and status["warmup_seconds"] is not None
+    assert all(step["done"] for step in status["steps"].values())
+
+def test_failed_step_is_retried():
+    """Test: a failing step keeps the service not ready and is retried until it succeeds"""
+    readiness = Readiness(retry_delay=0)
+    attempts = []
+    seen = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("credentials not mounted yet")
+
+    async def watch():
+        while not readiness.ready:
+            seen.append(readiness.status()["steps"]["flaky"])
+            await asyncio.sleep(0)
+
+    readiness.add_step("flaky", flaky)
+    readiness.add_step("other", lambda: None)
+
+    async def run():
+        await asyncio.gather(readiness.warm_up(), watch())
+
+    asyncio.run(run())
+
+    assert len(attempts) == 3
+    assert readiness.ready
+    assert {"done": False, "error": "credentials not mounted yet"} in seen
@@ -0,0 +1,52 @@
+import asyncio
+from backend.air_quality_service.refresh import refresh_cities
+
+def test_refresh_runs_cities_concurrently():
+    """Test: no more than `concurrency` cities are refreshed at the same time"""
+    running = 0
+    peak = 0
+
+    async def update(city):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return True
+
+    summary = asyncio.run(refresh_cities([f"city-{i}" for i in range(20)], update, concurrency=4))
+
+    assert summary["succeeded"] == 20
+    assert summary["failed"] == []
+    assert peak == 4
+
+def test_refresh_retries_failed_city():
+    """Test: a city that fails once is retried and counted as refreshed"""
+    attempts = {}
+
+    async def update(city):
+        attempts[city] = attempts.get(city, 0) + 1
+        if attempts[city] == 1:
+            raise RuntimeError("upstream error")
+        return True
+
+    summary = asyncio.run(refresh_cities(["Warsaw"], update, retries=2, backoff=0))
+
+    assert summary["succeeded"] == 1
+    assert attempts["Warsaw"] == 2
+
+def test_refresh_reports_timeouts_as_failures():
+    """Test: cities that keep timing out end up in the summary's failed list"""
+
+    async def update(city):
+        if city == "Slow":
+            await asyncio.sleep(1)
+        return True
+
+    summary = asyncio.run(
+        refresh_cities(["Warsaw", "Slow"], update, timeout=0.01, retries=1, backoff=0)
+    )
+
+    assert summary["total"] == 2
+    assert summary["succeeded"] == 1
+    assert summary["failed"] == ["Slow"]
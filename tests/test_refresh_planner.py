@@ -0,0 +1,91 @@
+from datetime import datetime, UTC
+from backend.air_quality_service.refresh_planner import (
+    RefreshPlanner, volatility, REFRESH_IDLE_INTERVAL, REFRESH_MAX_INTERVAL, REFRESH_MIN_INTERVAL
+)
+from backend.air_quality_service.routes import air_quality
+
+NOW = datetime(2026, 1, 2, tzinfo=UTC).timestamp()
+
+def readings(values, hours_ago=0):
+    """Stored readings, newest first, the newest one `hours_ago` old"""
+    last_update = datetime.fromtimestamp(NOW - hours_ago * 3600, UTC).isoformat()
+    return [{"AQI": value, "last_update": last_update} for value in values]
+
+def make_planner():
+    planner = RefreshPlanner(timer=lambda: NOW)
+    for city in ["Tracked", "Popular", "Abandoned"]:
+        planner.record_update(city, readings([50, 50, 50], hours_ago=12))
+    return planner
+
+def test_interval_depends_on_demand():
+    """Test: tracked or frequently read cities refresh sooner, abandoned ones rarely"""
+    planner = make_planner()
+    planner.add_tracker("Tracked", 3)
+    for _ in range(50):
+        planner.record_read("Popular")
+
+    assert planner.interval("Abandoned") == REFRESH_IDLE_INTERVAL
+    assert REFRESH_MIN_INTERVAL <= planner.interval("Popular") < planner.interval("Tracked") < REFRESH_MAX_INTERVAL
+
+def test_volatility_shortens_interval():
+    """Test: a city whose AQI jumps around is refreshed more often"""
+    planner = make_planner()
+    planner.record_update("Volatile", readings([10, 90, 10, 90], hours_ago=1))
+    planner.add_tracker("Volatile")
+    planner.add_tracker("Tracked")
+
+    assert volatility(readings([10, 90, 10, 90])) > 0
+    assert planner.interval("Volatile") < planner.interval("Tracked")
+
+def test_due_respects_budget_and_priority():
+    """Test: only overdue cities are returned, most overdue first, within the budget"""
+    planner = make_planner()
+    planner.add_tracker("Tracked", 3)
+    for _ in range(50):
+        planner.record_read("Popular")
+
+    assert planner.due(budget=10) == ["Popular", "Tracked"]
+    assert planner.due(budget=1) == ["Popular"]
+
+def test_failed_city_is_not_retried_immediately():
+    """Test: a city upstream had no data for waits before it is due again"""
+    planner = make_planner()
+    planner.add_tracker("Tracked")
+    planner.record_failure("Tracked")
+
+    assert "Tracked" not in planner.due()
+    assert planner.snapshot()["due"] == 0
+
+def test_failed_background_refresh_backs_off(monkeypatch):
+    """Test: stale reads stop triggering refreshes of a location whose last refresh failed, until the backoff ends"""
+    now = [NOW]
+    planner = RefreshPlanner(timer=lambda: now[0])
+    started = []
+    monkeypatch.setattr(air_quality, "refresh_planner", planner)
+    monkeypatch.setattr(air_quality.upstream_flights, "start", lambda key, factory: started.append(key))
+
+    air_quality._revalidate(None, "Warsaw")
+    planner.record_failure("Warsaw")
+    air_quality._revalidate(None, "Warsaw")
+    now[0] += REFRESH_MIN_INTERVAL + 1
+    air_quality._revalidate(None, "Warsaw")
+
+    assert started == [("refresh", "Warsaw"), ("refresh", "Warsaw")]
+
+def test_reads_revalidate_only_after_the_planned_refresh_is_missed(monkeypatch):
+    """Test: by default a read refreshes a city only once it is older than the planner's interval plus slack"""
+    planner = RefreshPlanner()
+    planner.add_tracker("Warsaw")
+    monkeypatch.setattr(air_quality, "refresh_planner", planner)
+    monkeypatch.setattr(air_quality, "STALE_AFTER", 0)
+
+    def history(seconds_ago):
+        return [{"AQI": 40, "last_update": datetime.fromtimestamp(datetime.now(UTC).timestamp() - seconds_ago, UTC).isoformat()}]
+
+    max_age = air_quality._stale_after("Warsaw")
+    assert max_age > planner.interval("Warsaw") >= REFRESH_MIN_INTERVAL
+    assert not air_quality._is_stale(history(planner.interval("Warsaw")), max_age)
+    assert air_quality._is_stale(history(max_age + 60), max_age)
+
+    monkeypatch.setattr(air_quality, "STALE_AFTER", 600)
+    assert air_quality._stale_after("Warsaw") == 600
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from backend.air_quality_service.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    """Test: concurrent callers with the same key get one shared result"""
+    flights = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"AQI": 42}
+
+    async def run():
+        return await asyncio.gather(*(flights.do("Warsaw", fetch) for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert calls == 1
+    assert results == [{"AQI": 42}] * 10
+    assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 9}
+
+def test_different_keys_and_later_calls_run_separately():
+    """Test: other keys run in parallel and a finished call is not reused"""
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch(city):
+        calls.append(city)
+        await asyncio.sleep(0.01)
+        return city
+
+    async def run():
+        await asyncio.gather(flights.do("Warsaw", lambda: fetch("Warsaw")), flights.do("Krakow", lambda: fetch("Krakow")))
+        await flights.do("Warsaw", lambda: fetch("Warsaw"))
+
+    asyncio.run(run())
+
+    assert sorted(calls) == ["Krakow", "Warsaw", "Warsaw"]
+
+def test_errors_reach_every_waiter():
+    """Test: a failing call raises in all coalesced callers and is not cached"""
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream error")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("Warsaw", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not flights.in_flight("Warsaw")
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    """Test: cancelling one caller leaves the shared call running for the others"""
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flights.do("Warsaw", fetch))
+        second = asyncio.ensure_future(flights.do("Warsaw", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
@@ -0,0 +1,113 @@
+import json
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, UTC
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from benchmarks.fake_firestore import FakeAsyncClient
+from backend.air_quality_service.database import get_firestore_client, add_tracked_city
+from backend.air_quality_service.auth import verify_firebase_token
+from backend.air_quality_service.models import TrackedCity
+from backend.air_quality_service.routes import air_quality
+
+@asynccontextmanager
+async def no_lifespan(app):
+    yield
+
+USER = {"uid": "user-1", "email": "user@example.com", "role": "user"}
+
+@pytest.fixture
+def client(monkeypatch):
+    """The AQI router on the in-process hub, with fake Firestore and auth"""
+    db = FakeAsyncClient()
+    app = FastAPI()
+    app.include_router(air_quality.router)
+    # The router's scheduler, leader election and hub hooks are not needed here
+    app.router.lifespan_context = no_lifespan
+    app.dependency_overrides[get_firestore_client] = lambda: db
+    app.dependency_overrides[verify_firebase_token] = lambda: USER
+
+    def verify(authorization):
+        if authorization != "Bearer good-token":
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return USER
+
+    monkeypatch.setattr(air_quality, "verify_token", verify)
+    monkeypatch.setattr(air_quality, "STREAM_HEARTBEAT", 0.05)
+
+    async def seed():
+        await db.collection("air_quality").document("Warsaw").set({
+            "readings": [{"AQI": 40, "last_update": "2026-01-01T00:00:00+00:00"}]
+        })
+        await add_tracked_city(db, "user-1", "Warsaw", TrackedCity(city="Warsaw").model_dump())
+
+    with TestClient(app) as test_client:
+        test_client.portal.call(seed)
+        yield test_client
+
+def publish(client, reading):
+    client.portal.call(air_quality.aqi_updates.publish, "Warsaw", reading)
+
+def test_websocket_sends_current_and_new_readings(client):
+    """Test: after the auth message the socket gets the stored reading, then published updates"""
+    with client.websocket_connect("/ws/tracked-cities") as socket:
+        socket.send_json({"type": "auth", "token": "good-token"})
+        first = socket.receive_json()
+        publish(client, {"AQI": 55, "last_update": datetime(2026, 1, 1, 1, tzinfo=UTC)})
+        update = socket.receive_json()
+        while update["type"] == "ping":
+            update = socket.receive_json()
+
+    assert first == {"type": "aqi", "location": "Warsaw", "reading": {"AQI": 40, "last_update": "2026-01-01T00:00:00+00:00"}}
+    assert update == {"type": "aqi", "location": "Warsaw", "reading": {"AQI": 55, "last_update": "2026-01-01 01:00:00+00:00"}}
+
+def test_websocket_rejects_bad_auth(client):
+    """Test: a wrong token or a first message that is not an auth message closes the socket"""
+    for message in ({"type": "auth", "token": "bad-token"}, {"type": "hello"}):
+        with client.websocket_connect("/ws/tracked-cities") as socket:
+            socket.send_json(message)
+            with pytest.raises(WebSocketDisconnect) as closed:
+                socket.receive_json()
+        assert closed.value.code == 1008
+
+def test_sse_stream_sends_current_and_new_readings(client):
+    """Test: the SSE endpoint streams the stored reading, keep-alives and published updates"""
+    app = client.app
+    chunks = []
+
+    async def stream():
+        disconnected = asyncio.Event()
+        sent = [False]
+
+        async def receive():
+            if not sent[0]:
+                sent[0] = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                chunks.append(message["status"])
+            elif message.get("body"):
+                chunks.append(message["body"].decode())
+                if "AQI\": 55" in chunks[-1]:
+                    disconnected.set()
+                elif len(chunks) == 2:
+                    await air_quality.aqi_updates.publish("Warsaw", {"AQI": 55})
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/user/tracked-cities/stream", "raw_path": b"/user/tracked-cities/stream",
+            "query_string": b"", "root_path": "", "headers": [(b"host", b"test")],
+            "client": ("127.0.0.1", 1), "server": ("test", 80)
+        }
+        await asyncio.wait_for(app(scope, receive, send), 5)
+
+    client.portal.call(stream)
+
+    assert chunks[0] == 200
+    events = [chunk for chunk in chunks[1:] if chunk.startswith("event: aqi")]
+    assert [json.loads(event.split("data: ", 1)[1])["reading"]["AQI"] for event in events] == [40, 55]
@@ -0,0 +1,107 @@
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from benchmarks.fake_firestore import FakeAsyncClient
+from backend.air_quality_service.database import (
+    get_firestore_client, add_tracked_city, remove_tracked_city, list_tracked_cities, tracked_city_counts, migrate_tracked_cities
+)
+from backend.air_quality_service.models import TrackedCity
+from backend.air_quality_service.refresh_planner import RefreshPlanner
+from backend.air_quality_service.routes import air_quality
+
+def track(db, uid, city):
+    return add_tracked_city(db, uid, city, TrackedCity(city=city).model_dump())
+
+def test_concurrent_tracking_loses_no_updates():
+    """Test: parallel track requests of one user keep every city once and count each subscriber once"""
+    db = FakeAsyncClient(latency=0.001)
+    cities = [f"City-{i}" for i in range(10)]
+
+    async def run():
+        created = await asyncio.gather(*(track(db, "user-1", city) for city in cities + cities))
+        await track(db, "user-2", "City-0")
+        return created, await list_tracked_cities(db, "user-1"), await tracked_city_counts(db)
+
+    created, tracked, counts = asyncio.run(run())
+    assert sum(created) == 10
+    assert sorted(tc["city"] for tc in tracked) == sorted(cities)
+    assert counts["City-0"] == 2
+    assert counts["City-9"] == 1
+
+def test_untracking_updates_the_index():
+    """Test: untracking decrements the count once, cities nobody tracks leave the index"""
+    db = FakeAsyncClient()
+
+    async def run():
+        await track(db, "user-1", "Warsaw")
+        await track(db, "user-2", "Warsaw")
+        await track(db, "user-1", "Krakow")
+        removed = [
+            await remove_tracked_city(db, "user-1", "Krakow"),
+            await remove_tracked_city(db, "user-1", "Krakow"),
+            await remove_tracked_city(db, "user-1", "Warsaw")
+        ]
+        return removed, await tracked_city_counts(db)
+
+    assert asyncio.run(run()) == ([True, False, True], {"Warsaw": 1})
+
+def test_migration_moves_arrays_and_counts_subscribers():
+    """Test: legacy tracked_cities arrays become subscriptions and the counts are rebuilt"""
+    db = FakeAsyncClient()
+    legacy = [TrackedCity(city="Warsaw").model_dump(), TrackedCity(city="Gdansk").model_dump()]
+
+    async def run():
+        await db.collection("user_preferences").document("legacy").set({"tracked_cities": legacy, "theme": "dark"})
+        await track(db, "user-2", "Warsaw")
+        migrated = await migrate_tracked_cities(db)
+        preferences = (await db.collection("user_preferences").document("legacy").get()).to_dict()
+        return migrated, preferences, await list_tracked_cities(db, "legacy"), await tracked_city_counts(db)
+
+    migrated, preferences, tracked, counts = asyncio.run(run())
+    assert migrated == 1
+    assert preferences == {"theme": "dark"}
+    assert [tc["city"] for tc in tracked] == ["Warsaw", "Gdansk"]
+    assert counts == {"Warsaw": 2, "Gdansk": 1}
+
+def test_planner_loads_only_tracked_and_read_cities():
+    """Test: reload plans cities from the subscriber index and recent reads, not every stored city"""
+    db = FakeAsyncClient()
+    planner = RefreshPlanner()
+    reading = {"AQI": 40, "last_update": "2026-01-01T00:00:00+00:00"}
+
+    async def run():
+        for city in ["Tracked", "Read", "Abandoned"]:
+            await db.collection("air_quality").document(city).set({"readings": [reading]})
+        await track(db, "user-1", "Tracked")
+        await track(db, "user-1", "New")
+        planner.record_read("Read")
+        planner.record_read("Unknown")
+        await planner.reload(db)
+
+    asyncio.run(run())
+    assert sorted(entry["city"] for entry in planner.plan()) == ["New", "Read", "Tracked"]
+    assert "New" in planner.due()
+
+def test_untrack_route_returns_404_for_untracked_city():
+    """Test: DELETE /user/tracked-cities/{city} removes a tracked city once, then answers 404"""
+    db = FakeAsyncClient()
+
+    @asynccontextmanager
+    async def no_lifespan(app):
+        yield
+
+    app = FastAPI()
+    app.include_router(air_quality.router)
+    app.router.lifespan_context = no_lifespan
+    app.dependency_overrides[get_firestore_client] = lambda: db
+    app.dependency_overrides[air_quality.verify_token] = lambda: {"uid": "user-1", "email": "user@example.com"}
+
+    with TestClient(app) as client:
+        client.portal.call(track, db, "user-1", "Warsaw")
+        removed = client.delete("/user/tracked-cities/Warsaw")
+        again = client.delete("/user/tracked-cities/Warsaw")
+
+    assert removed.status_code == 200
+    assert again.status_code == 404
+    assert asyncio.run(tracked_city_counts(db)) == {}
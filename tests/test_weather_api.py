@@ -0,0 +1,102 @@
+import asyncio
+import httpx
+import pytest
+from backend.air_quality_service import weather_api as weather_api_module
+from backend.air_quality_service.weather_api import WeatherAPI
+
+def open_meteo_handler(calls):
+    """Fake Open-Meteo transport that records the hosts it was asked for"""
+
+    def handler(request: httpx.Request):
+        calls.append(request.url.host)
+        if request.url.host == "geocoding-api.open-meteo.com":
+            return httpx.Response(200, json={"results": [{"latitude": 52.23, "longitude": 21.01}]})
+        return httpx.Response(200, json={
+            "current": {"european_aqi": 30, "us_aqi": 42, "pm2_5": 8.1, "pm10": 12.4}
+        })
+
+    return handler
+
+@pytest.fixture
+def calls():
+    return []
+
+@pytest.fixture
+def weather_api(calls):
+    return WeatherAPI(transport=httpx.MockTransport(open_meteo_handler(calls)))
+
+def test_geocode_is_cached_between_calls(weather_api, calls):
+    """Test: the second lookup of a city skips the geocoding request"""
+
+    async def run():
+        await weather_api.start()
+        first = await weather_api.get_air_quality("Warsaw")
+        second = await weather_api.get_air_quality("warsaw")
+        await weather_api.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first["AQI"] == 42
+    assert second["raw_data"]["latitude"] == 52.23
+    assert calls.count("geocoding-api.open-meteo.com") == 1
+    assert calls.count("air-quality-api.open-meteo.com") == 2
+
+def test_client_is_reused_until_closed(weather_api):
+    """Test: WeatherAPI keeps one pooled client between requests"""
+
+    async def run():
+        await weather_api.start()
+        client = weather_api.client
+        await weather_api.get_air_quality("Warsaw")
+        same_client = weather_api.client is client
+        await weather_api.close()
+        return same_client, client.is_closed
+
+    same_client, closed = asyncio.run(run())
+
+    assert same_client
+    assert closed
+
+def test_air_quality_many_uses_one_request_per_chunk(calls):
+    """Test: several cities are fetched in a single multi-location request"""
+
+    def handler(request: httpx.Request):
+        calls.append(request.url.host)
+        if request.url.host == "geocoding-api.open-meteo.com":
+            lat = len(request.url.params["name"])
+            return httpx.Response(200, json={"results": [{"latitude": lat, "longitude": 20.0}]})
+        latitudes = request.url.params["latitude"].split(",")
+        return httpx.Response(200, json=[
+            {"current": {"european_aqi": 30, "us_aqi": int(float(lat)), "pm2_5": 8.1, "pm10": 12.4}}
+            for lat in latitudes
+        ])
+
+    weather_api = WeatherAPI(transport=httpx.MockTransport(handler))
+    results = asyncio.run(weather_api.get_air_quality_many(["Warsaw", "Lodz", "Gdansk"]))
+
+    assert {city: reading["AQI"] for city, reading in results.items()} == {"Warsaw": 6, "Lodz": 4, "Gdansk": 6}
+    assert calls.count("air-quality-api.open-meteo.com") == 1
+
+def test_air_quality_many_bounds_geocoding_concurrency(monkeypatch):
+    """Test: a cold geocode cache is filled at most WEATHER_API_MAX_CONNECTIONS lookups at a time"""
+    monkeypatch.setattr(weather_api_module, "WEATHER_API_MAX_CONNECTIONS", 3)
+    in_flight = [0, 0]
+
+    async def handler(request: httpx.Request):
+        if request.url.host == "geocoding-api.open-meteo.com":
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return httpx.Response(200, json={"results": [{"latitude": 52.23, "longitude": 21.01}]})
+        latitudes = request.url.params["latitude"].split(",")
+        return httpx.Response(200, json=[
+            {"current": {"european_aqi": 30, "us_aqi": 42, "pm2_5": 8.1, "pm10": 12.4}} for _ in latitudes
+        ])
+
+    weather_api = WeatherAPI(transport=httpx.MockTransport(handler))
+    results = asyncio.run(weather_api.get_air_quality_many([f"City-{i}" for i in range(12)]))
+
+    assert len(results) == 12
+    assert in_flight[1] == 3